@@ -0,0 +1,83 @@
+"""
+The annual-report flow of tutorials_beginner/agent_annual_report.ipynb as a regression
+benchmark. Record it once with live OpenAI / FMP / SEC access, then replay it offline:
+LLM completions, tool results and code execution come from the recording, so the
+replayed wall-clock is the orchestration overhead (or the original run with --realtime).
+
+    cd experiments
+    PYTHONPATH=.. python annual_report_replay.py record          # needs OAI_CONFIG_LIST and config_api_keys
+    PYTHONPATH=.. python annual_report_replay.py replay [--realtime]
+"""
+
+import os
+import io
+import sys
+import time
+import logging
+import autogen
+from textwrap import dedent
+from contextlib import redirect_stdout
+from finrobot.utils import register_keys_from_json
+from finrobot.agents.workflow import SingleAssistantShadow
+from finrobot.replay import record_run, replay_run
+
+
+recording = "recordings/annual_report_msft_2023.jsonl.gz"
+work_dir = "../report"
+company = "Microsoft"
+fyear = "2023"
+message = dedent(
+    f"""
+    With the tools you've been provided, write an annual report based on {company}'s {fyear} 10-k report, format it into a pdf.
+    Pay attention to the followings:
+    - Explicitly explain your working plan before you kick off.
+    - Use tools one by one for clarity, especially when asking for instructions.
+    - All your file operations should be done in "{work_dir}".
+    - Display any image in the chat once generated.
+    - All the paragraphs should combine between 400 and 450 words, don't generate the pdf until this is explicitly fulfilled.
+"""
+)
+
+
+def run(llm_config):
+    assistant = SingleAssistantShadow(
+        "Expert_Investor",
+        llm_config,
+        max_consecutive_auto_reply=None,
+        human_input_mode="NEVER",
+    )
+    start = time.time()
+    with redirect_stdout(io.StringIO()):
+        assistant.chat(message, max_turns=50, summary_method="last_msg")
+    return time.time() - start
+
+
+if __name__ == "__main__":
+    logging.getLogger("autogen.oai.client").setLevel(logging.WARNING)
+    os.makedirs(work_dir, exist_ok=True)
+
+    if sys.argv[1:2] == ["record"]:
+        llm_config = {
+            "config_list": autogen.config_list_from_json(
+                "../OAI_CONFIG_LIST",
+                filter_dict={"model": ["gpt-4-0125-preview"]},
+            ),
+            "timeout": 120,
+            "temperature": 0.5,
+            "cache_seed": None,
+        }
+        register_keys_from_json("../config_api_keys")
+        with record_run(recording) as session:
+            elapsed = run(llm_config)
+            calls = session.recorded
+        print(f"recorded {calls} calls to {recording} in {elapsed:.1f}s")
+
+    else:
+        # completions are replayed, the client is never called
+        llm_config = {
+            "config_list": [{"model": "gpt-4-0125-preview", "api_key": "replay"}],
+            "cache_seed": None,
+        }
+        with replay_run(recording, realtime="--realtime" in sys.argv) as session:
+            elapsed = run(llm_config)
+        print(f"replayed in {elapsed:.2f}s: {session.report()}")
@@ -0,0 +1,70 @@
+"""
+Latency of the python code blocks of an analysis, executed by the workflow's user proxy
+with autogen's default (a new interpreter per block) and in a pooled kernel of the
+session (code_execution_config "kernel": True). Runs offline on synthetic prices.
+
+    cd experiments && PYTHONPATH=.. python code_execution_benchmark.py
+"""
+
+import io
+import time
+import logging
+from contextlib import redirect_stdout
+
+from finrobot.agents.workflow import SingleAssistant
+from finrobot.kernels import get_kernel_pool
+
+
+blocks = [
+    """
+import numpy as np
+import pandas as pd
+prices = pd.Series(100 * np.exp(np.cumsum(np.random.normal(0, 0.01, 500))))
+print(prices.describe())
+""",
+    """
+import numpy as np
+import pandas as pd
+prices = pd.Series(100 * np.exp(np.cumsum(np.random.normal(0, 0.01, 500))))
+returns = prices.pct_change().dropna()
+print(f"annualized volatility: {returns.std() * 252 ** 0.5:.2%}")
+""",
+    """
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+prices = pd.Series(100 * np.exp(np.cumsum(np.random.normal(0, 0.01, 500))))
+prices.plot(title="price")
+plt.savefig("price.png")
+print("saved")
+""",
+]
+
+
+def run(code_execution_config):
+    workflow = SingleAssistant(
+        {"name": "Analyst", "profile": "You are an analyst."},
+        False,  # no completions, the blocks are executed directly
+        code_execution_config=code_execution_config,
+    )
+    timings = []
+    with redirect_stdout(io.StringIO()):
+        for code in blocks:
+            start = time.perf_counter()
+            exitcode, logs = workflow.user_proxy.execute_code_blocks([("python", code)])
+            timings.append(time.perf_counter() - start)
+            assert exitcode == 0, logs
+    workflow.reset()
+    return timings
+
+
+if __name__ == "__main__":
+    logging.getLogger("autogen.oai.client").setLevel(logging.WARNING)
+    get_kernel_pool({"warm": 2}).get("warm-up").wait_ready()  # pool started with the app
+
+    for label, config in [
+        ("new interpreter per block", {"work_dir": "coding", "use_docker": False}),
+        ("session kernel", {"work_dir": "coding", "use_docker": False, "isolate": True, "kernel": True}),
+    ]:
+        timings = run(config)
+        print(f"{label:28s} " + "  ".join(f"{t * 1000:7.1f}ms" for t in timings))
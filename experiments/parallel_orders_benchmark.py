@@ -0,0 +1,125 @@
+"""
+Wall-clock of the investment-group experiment (portfolio_optimization.py) with sequential
+and parallel leader orders. LLM calls are served by a simulated client with a fixed latency,
+so the benchmark measures the orchestration and runs offline.
+
+    cd experiments && PYTHONPATH=.. python parallel_orders_benchmark.py [latency_seconds]
+"""
+
+import io
+import re
+import sys
+import time
+import copy
+import logging
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+from autogen import UserProxyAgent
+from finrobot.agents.workflow import MultiAssistantWithLeader
+from investment_group import group_config
+
+
+class SimulatedClient:
+    """Model client answering like the agents of the experiment after a fixed delay."""
+
+    latency = 1.0
+    calls = 0
+
+    def __init__(self, config, **kwargs):
+        pass
+
+    def create(self, params):
+        SimulatedClient.calls += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self._reply(params["messages"])))],
+            model="simulated",
+            cost=0,
+        )
+
+    @staticmethod
+    def _reply(messages):
+        system, last = messages[0]["content"] or "", messages[-1]["content"] or ""
+        if messages[-1]["role"] == "system" and "Summarize" in last:
+            return "Summary of the findings."
+        if "You are the leader of the following group members" not in system:
+            return (
+                "The analysis of PDD is completed. Score: 0.62 based on 120 sources. "
+                "Results are saved to results/pdd_analysis.csv. TERMINATE"
+            )
+        members = [n.strip().replace(" ", "_") for n in re.findall(r"Name: (.+)", system)]
+        ordered = {
+            name for m in messages if m["role"] == "assistant"
+            for name in members if f"[{name}]" in (m["content"] or "")
+        }
+        remaining = [name for name in members if name not in ordered]
+        if not remaining:
+            return "All tasks are completed. Final recommendation: BUY. TERMINATE"
+        if "carried out in parallel" not in system:
+            remaining = remaining[:1]
+        return "Progress summary.\n" + "\n".join(f"[{name}] Analyze PDD." for name in remaining)
+
+    def message_retrieval(self, response):
+        return [response.choices[0].message.content]
+
+    def cost(self, response):
+        return 0
+
+    @staticmethod
+    def get_usage(response):
+        return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost": 0, "model": "simulated"}
+
+
+def build_group(parallel_orders, **kwargs):
+    config = copy.deepcopy(group_config)
+    llm_config = {
+        "config_list": [{"model": "simulated", "model_client_cls": "SimulatedClient"}],
+        "cache_seed": None,
+    }
+    # as in portfolio_optimization.py, all groups share one user proxy
+    user_proxy = UserProxyAgent(
+        name="User",
+        human_input_mode="NEVER",
+        is_termination_msg=lambda x: x.get("content", "")
+        and "TERMINATE" in x.get("content", ""),
+        code_execution_config=False,
+    )
+    representatives, agents = [], []
+    for single_group_config in config["groups"].values():
+        members = single_group_config["with_leader"]
+        members["agents"] = members.pop("employees")
+        group = MultiAssistantWithLeader(
+            members,
+            llm_config=llm_config,
+            user_proxy=user_proxy,
+            parallel_orders=parallel_orders,
+            **kwargs,
+        )
+        representatives.append(group.representative)
+        agents += group.agents + [group.representative]
+    main_group = MultiAssistantWithLeader(
+        {"leader": config["CIO"], "agents": representatives},
+        llm_config=llm_config,
+        user_proxy=user_proxy,
+        parallel_orders=parallel_orders,
+        **kwargs,
+    )
+    for agent in agents + [main_group.representative]:
+        agent.register_model_client(SimulatedClient)
+    return main_group
+
+
+if __name__ == "__main__":
+    logging.getLogger("autogen.oai.client").setLevel(logging.WARNING)
+    SimulatedClient.latency = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    for parallel_orders in [False, True]:
+        group = build_group(parallel_orders)
+        SimulatedClient.calls = 0
+        start = time.time()
+        with redirect_stdout(io.StringIO()):
+            group.chat("Evaluate the investment potential of PDD.")
+        print(
+            f"parallel_orders={parallel_orders!s:<6} wall-clock {time.time() - start:6.1f}s "
+            f"llm calls {SimulatedClient.calls}"
+        )
@@ -51,6 +51,9 @@ with_leader_config = {
     "Fundamental Analysts": True,
 }
 
+# let leaders issue independent orders at once and run them concurrently
+parallel_orders = True
+
 representatives = []
 
 for group_name, single_group_config in group_config["groups"].items():
@@ -60,7 +63,10 @@ for group_name, single_group_config in group_config["groups"].items():
         group_members = single_group_config["with_leader"]
         group_members["agents"] = group_members.pop("employees")
         group = MultiAssistantWithLeader(
-            group_members, llm_config=llm_config, user_proxy=user_proxy
+            group_members,
+            llm_config=llm_config,
+            user_proxy=user_proxy,
+            parallel_orders=parallel_orders,
         )
     else:
         group_members = single_group_config["without_leader"]
@@ -83,7 +89,10 @@ for group_name, single_group_config in group_config["groups"].items():
 cio_config = group_config["CIO"]
 main_group_config = {"leader": cio_config, "agents": representatives}
 main_group = MultiAssistantWithLeader(
-    main_group_config, llm_config=llm_config, user_proxy=user_proxy
+    main_group_config,
+    llm_config=llm_config,
+    user_proxy=user_proxy,
+    parallel_orders=parallel_orders,
 )
 
 task = dedent(
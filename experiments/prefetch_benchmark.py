@@ -0,0 +1,159 @@
+"""
+LLM round trips and wall-clock of a single-ticker market analysis without prefetch and with
+the two prefetch modes (finrobot.prefetch). LLM calls and data tools are simulated with fixed
+latencies, the agent calls the four data tools one by one unless their results are already
+in the task, as instructed in the market analyst tutorials.
+
+    cd experiments && PYTHONPATH=.. python prefetch_benchmark.py [llm_latency] [tool_latency]
+"""
+
+import io
+import sys
+import json
+import time
+import logging
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from typing import Annotated
+
+from finrobot.agents.workflow import SingleAssistant
+
+
+task = (
+    "Use all the tools provided to retrieve information available for AAPL upon 2024-05-01. "
+    "Analyze the positive developments and potential concerns of AAPL with 2-4 most "
+    "important factors respectively and keep them concise."
+)
+tool_latency = 0.5
+
+
+def get_company_profile(symbol: Annotated[str, "ticker symbol"]) -> str:
+    """get a company's profile information"""
+    time.sleep(tool_latency)
+    return f"[Company Introduction]: {symbol} is a leading entity in the Technology sector."
+
+
+def get_company_news(
+    symbol: Annotated[str, "ticker symbol"],
+    start_date: Annotated[str, "start date, yyyy-mm-dd"],
+    end_date: Annotated[str, "end date, yyyy-mm-dd"],
+) -> str:
+    """retrieve market news related to designated company"""
+    time.sleep(tool_latency)
+    return f"[{end_date}] {symbol} announces a record buyback."
+
+
+def get_basic_financials(symbol: Annotated[str, "ticker symbol"]) -> str:
+    """get latest basic financials for a designated company"""
+    time.sleep(tool_latency)
+    return json.dumps({"peTTM": 28.1, "roeTTM": 154.3, "grossMargin": 0.45})
+
+
+def get_stock_data(
+    symbol: Annotated[str, "ticker symbol"],
+    start_date: Annotated[str, "start date, yyyy-mm-dd"],
+    end_date: Annotated[str, "end date, yyyy-mm-dd"],
+) -> str:
+    """retrieve stock price data for designated ticker symbol"""
+    time.sleep(tool_latency)
+    return f"{symbol} closed at 169.30 on {end_date}, +1.2% over the period."
+
+
+tools = [get_company_profile, get_company_news, get_basic_financials, get_stock_data]
+tool_args = {
+    "get_company_profile": {"symbol": "AAPL"},
+    "get_company_news": {"symbol": "AAPL", "start_date": "2024-04-03", "end_date": "2024-05-01"},
+    "get_basic_financials": {"symbol": "AAPL"},
+    "get_stock_data": {"symbol": "AAPL", "start_date": "2024-04-03", "end_date": "2024-05-01"},
+}
+
+
+class SimulatedClient:
+    """Model client calling each data tool once, skipping the ones already in the task."""
+
+    latency = 1.0
+    calls = 0
+
+    def __init__(self, config, **kwargs):
+        pass
+
+    def create(self, params):
+        SimulatedClient.calls += 1
+        time.sleep(self.latency)
+        messages = params["messages"]
+        known = "\n".join(str(m.get("content") or "") for m in messages)
+        called = {
+            c["function"]["name"] for m in messages for c in m.get("tool_calls") or []
+        }
+        for name, args in tool_args.items():
+            if name not in called and f"[{name}(" not in known:
+                call = SimpleNamespace(
+                    id=f"call_{SimulatedClient.calls}",
+                    type="function",
+                    function=SimpleNamespace(name=name, arguments=json.dumps(args)),
+                )
+                return SimpleNamespace(content=None, tool_calls=[call])
+        return SimpleNamespace(
+            content="Positive: buyback, margins. Concerns: valuation. TERMINATE",
+            tool_calls=None,
+        )
+
+    def message_retrieval(self, response):
+        if response.tool_calls:
+            return [
+                {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": c.id,
+                            "type": c.type,
+                            "function": {
+                                "name": c.function.name,
+                                "arguments": c.function.arguments,
+                            },
+                        }
+                        for c in response.tool_calls
+                    ],
+                }
+            ]
+        return [response.content]
+
+    def cost(self, response):
+        return 0
+
+    @staticmethod
+    def get_usage(response):
+        return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost": 0, "model": "simulated"}
+
+
+def run(prefetch):
+    assistant = SingleAssistant(
+        {"name": "Market_Analyst", "profile": "You are a market analyst.", "toolkits": tools},
+        {
+            "config_list": [{"model": "simulated", "model_client_cls": "SimulatedClient"}],
+            "cache_seed": None,
+        },
+        code_execution_config=False,
+        prefetch=prefetch,
+    )
+    assistant.assistant.register_model_client(SimulatedClient)
+    SimulatedClient.calls = 0
+    start = time.time()
+    with redirect_stdout(io.StringIO()):
+        assistant.chat(task)
+    return SimulatedClient.calls, time.time() - start
+
+
+if __name__ == "__main__":
+    logging.getLogger("autogen.oai.client").setLevel(logging.WARNING)
+    SimulatedClient.latency = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    tool_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    for label, prefetch in [
+        ("no prefetch", None),
+        ("prefetch, cache mode", {"mode": "cache"}),
+        ("prefetch, context mode", {"mode": "context"}),
+    ]:
+        calls, elapsed = run(prefetch)
+        print(f"{label:24s} {calls} LLM calls  {elapsed:.2f}s")
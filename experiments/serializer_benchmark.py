@@ -0,0 +1,91 @@
+"""
+Token reduction of the budgeted DataFrame serializer on outputs shaped like the existing toolkits.
+Frames are generated offline with the same layout the data sources return, so no API keys are needed.
+
+    PYTHONPATH=. python experiments/serializer_benchmark.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from finrobot.serialization import serialize_dataframe
+from finrobot.utils import count_tokens
+
+
+rng = np.random.default_rng(0)
+
+
+def ohlcv(days):
+    # YFinanceUtils.get_stock_data
+    index = pd.bdate_range("2023-01-03", periods=days, tz="America/New_York", name="Date")
+    close = 150 * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+    return pd.DataFrame(
+        {
+            "Open": close * (1 + rng.normal(0, 0.005, days)),
+            "High": close * (1 + np.abs(rng.normal(0, 0.01, days))),
+            "Low": close * (1 - np.abs(rng.normal(0, 0.01, days))),
+            "Close": close,
+            "Volume": rng.integers(40_000_000, 120_000_000, days),
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        },
+        index=index,
+    )
+
+
+def income_stmt():
+    # YFinanceUtils.get_income_stmt (rows are line items, columns are fiscal years)
+    items = [
+        "Tax Effect Of Unusual Items", "Tax Rate For Calcs", "Normalized EBITDA",
+        "Net Income From Continuing Operation Net Minority Interest", "Reconciled Depreciation",
+        "Reconciled Cost Of Revenue", "EBITDA", "EBIT", "Net Interest Income", "Interest Expense",
+        "Interest Income", "Normalized Income", "Net Income From Continuing And Discontinued Operation",
+        "Total Expenses", "Total Operating Income As Reported", "Diluted Average Shares",
+        "Basic Average Shares", "Diluted EPS", "Basic EPS", "Diluted NI Availto Com Stockholders",
+        "Net Income Common Stockholders", "Net Income", "Net Income Including Noncontrolling Interests",
+        "Net Income Continuous Operations", "Tax Provision", "Pretax Income", "Other Income Expense",
+        "Other Non Operating Income Expenses", "Net Non Operating Interest Income Expense",
+        "Interest Expense Non Operating", "Interest Income Non Operating", "Operating Income",
+        "Operating Expense", "Research And Development", "Selling General And Administration",
+        "Gross Profit", "Cost Of Revenue", "Total Revenue", "Operating Revenue",
+    ]
+    columns = pd.to_datetime(["2023-09-30", "2022-09-30", "2021-09-30", "2020-09-30"])
+    return pd.DataFrame(rng.uniform(1e9, 4e11, (len(items), 4)), index=items, columns=columns)
+
+
+def basic_financials_history():
+    # FinnHubUtils.get_basic_financials_history(freq="quarterly")
+    index = pd.Index(
+        pd.date_range("2014-03-31", periods=40, freq="3MS").strftime("%Y-%m-%d"), name="date"
+    )
+    metrics = ["bookValue", "currentRatio", "eps", "ev", "fcfMargin", "grossMargin",
+               "netMargin", "pb", "peTTM", "roeTTM", "roicTTM", "totalDebtToEquity"]
+    return pd.DataFrame(rng.normal(10, 3, (40, len(metrics))), index=index, columns=metrics)
+
+
+def company_news():
+    # FinnHubUtils.get_company_news
+    return pd.DataFrame(
+        {
+            "date": [f"2024030{i}093000" for i in range(10)],
+            "headline": ["Company beats estimates as services revenue hits record high"] * 10,
+            "summary": ["Shares rose after the company reported quarterly results above "
+                        "analyst expectations, driven by strong demand and margin expansion."] * 10,
+        }
+    )
+
+
+if __name__ == "__main__":
+    cases = {
+        "get_stock_data (1y daily)": ohlcv(252),
+        "get_stock_data (5y daily)": ohlcv(1260),
+        "get_income_stmt": income_stmt(),
+        "get_basic_financials_history": basic_financials_history(),
+        "get_company_news": company_news(),
+    }
+    print(f"{'tool output':<32}{'to_string':>10}{'csv':>8}{'markdown':>10}{'reduction':>11}")
+    for name, df in cases.items():
+        before = count_tokens(df.to_string())
+        csv = count_tokens(serialize_dataframe(df, {"format": "csv"}))
+        md = count_tokens(serialize_dataframe(df, {"format": "markdown"}))
+        print(f"{name:<32}{before:>10}{csv:>8}{md:>10}{1 - csv / before:>10.0%}")
@@ -0,0 +1,37 @@
+"""
+LLM calls spent on the investment-group experiment with each nested chat summary strategy.
+Uses the simulated client of parallel_orders_benchmark.py, so it runs offline.
+
+    cd experiments && PYTHONPATH=.. python summary_benchmark.py [latency_seconds]
+"""
+
+import io
+import sys
+import time
+import logging
+from contextlib import redirect_stdout
+
+from parallel_orders_benchmark import SimulatedClient, build_group
+
+
+if __name__ == "__main__":
+    logging.getLogger("autogen.oai.client").setLevel(logging.WARNING)
+    SimulatedClient.latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    baseline = None
+    for summary_method in [
+        "reflection_with_llm",
+        "adaptive",
+        "structured",
+        "extractive",
+        "last_msg",
+    ]:
+        group = build_group(False, summary_method=summary_method)
+        SimulatedClient.calls = 0
+        start = time.time()
+        with redirect_stdout(io.StringIO()):
+            group.chat("Evaluate the investment potential of PDD.")
+        baseline = baseline or SimulatedClient.calls
+        print(
+            f"{summary_method:<20} llm calls {SimulatedClient.calls:>3} "
+            f"(saved {baseline - SimulatedClient.calls:>2}) wall-clock {time.time() - start:5.1f}s"
+        )
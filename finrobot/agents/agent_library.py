@@ -1,7 +1,8 @@
-from finrobot.data_source import *
-from finrobot.functional import *
 from textwrap import dedent
 
+# Toolkits are referenced by dotted path and imported when an agent using them is created,
+# so importing the library does not load the data sources and their dependencies.
+
 library = [
     {
         "name": "Software_Developer",
@@ -39,10 +40,10 @@ library = [
         "name": "Market_Analyst",
         "profile": "As a Market Analyst, one must possess strong analytical and problem-solving abilities, collect necessary financial information and aggregate them based on client's requirement. For coding tasks, only use the functions you have been provided with. Reply TERMINATE when the task is done.",
         "toolkits": [
-            FinnHubUtils.get_company_profile,
-            FinnHubUtils.get_company_news,
-            FinnHubUtils.get_basic_financials,
-            YFinanceUtils.get_stock_data,
+            "finrobot.data_source.FinnHubUtils.get_company_profile",
+            "finrobot.data_source.FinnHubUtils.get_company_news",
+            "finrobot.data_source.FinnHubUtils.get_basic_financials",
+            "finrobot.data_source.YFinanceUtils.get_stock_data",
         ],
     },
     {
@@ -69,12 +70,12 @@ library = [
             """
         ),
         "toolkits": [
-            FMPUtils.get_sec_report,  # Retrieve SEC report url and filing date
-            IPythonUtils.display_image,  # Display image in IPython
-            TextUtils.check_text_length,  # Check text length
-            ReportLabUtils.build_annual_report,  # Build annual report in designed pdf format
-            ReportAnalysisUtils,  # Expert Knowledge for Report Analysis
-            ReportChartUtils,  # Expert Knowledge for Report Chart Plotting
+            "finrobot.data_source.FMPUtils.get_sec_report",  # Retrieve SEC report url and filing date
+            "finrobot.functional.IPythonUtils.display_image",  # Display image in IPython
+            "finrobot.functional.TextUtils.check_text_length",  # Check text length
+            "finrobot.functional.ReportLabUtils.build_annual_report",  # Build annual report in designed pdf format
+            "finrobot.functional.ReportAnalysisUtils",  # Expert Knowledge for Report Analysis
+            "finrobot.functional.ReportChartUtils",  # Expert Knowledge for Report Chart Plotting
         ],
     },
 ]
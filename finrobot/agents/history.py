@@ -0,0 +1,207 @@
+import json
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+
+from autogen import ConversableAgent, OpenAIWrapper
+
+from .prompts import history_summary_prompt
+from .summary import rank_sentences
+from ..replay import replay_call
+from ..ratelimit import rate_limited
+from ..utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=8192)
+def _text_tokens(text: str) -> int:
+    return count_tokens(text)
+
+
+def _message_text(message: Dict) -> str:
+    text = str(message.get("content") or "")
+    for key in ["tool_calls", "function_call"]:
+        if message.get(key):
+            text += json.dumps(message[key])
+    return text
+
+
+def _message_tokens(message: Dict) -> int:
+    return _text_tokens(_message_text(message)) + 4  # role / name overhead
+
+
+def _transcript(messages: List[Dict]) -> str:
+    return "\n".join(
+        f"{m.get('name', m.get('role', ''))}: {_message_text(m)}" for m in messages
+    )
+
+
+class HistoryCompressor:
+    """
+    Bounded prompt history for group chats.
+
+    The last `keep_last` messages are sent verbatim. Older messages are folded into a
+    summary that is updated incrementally in a background thread, so summarization never
+    blocks a speaker turn: until a fold finishes, the not yet folded messages are sent
+    verbatim. Every prompt is capped at `max_prompt_tokens` (system message included)
+    by dropping the oldest messages.
+
+    Args:
+        keep_last: number of most recent messages kept verbatim.
+        max_prompt_tokens: hard token ceiling of a prompt.
+        summary_tokens: target size of the running summary.
+        llm_config: llm config used for summarization. Without it, sentences are ranked locally.
+        summarizer: custom `summarizer(previous_summary, messages) -> str`.
+    """
+
+    max_folds = 64  # recent folds kept for agents requesting the same one
+
+    def __init__(
+        self,
+        keep_last: int = 6,
+        max_prompt_tokens: int = 8000,
+        summary_tokens: int = 500,
+        llm_config: Dict[str, Any] | None = None,
+        summarizer: Callable[[str, List[Dict]], str] | None = None,
+    ):
+        self.keep_last = keep_last
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_tokens = summary_tokens
+        self.client = OpenAIWrapper(**llm_config) if llm_config else None
+        self.summarizer = summarizer or (
+            self._llm_summarize if self.client else self._local_summarize
+        )
+        self.stats = []
+        self._states = defaultdict(
+            lambda: {"folded": 0, "summary": "", "pending": None}
+        )
+        self._folds = OrderedDict()  # identical folds requested by several agents run once
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def attach(self, agent: ConversableAgent):
+        system_tokens = _text_tokens(agent.system_message)
+        agent.register_hook(
+            "process_all_messages_before_reply",
+            lambda messages: self.compress(agent.name, messages, system_tokens),
+        )
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
+            self._folds.clear()
+
+    def _llm_summarize(self, summary: str, messages: List[Dict]) -> str:
+        prompt = history_summary_prompt.format(
+            max_words=int(self.summary_tokens * 0.75),
+            summary=summary or "(empty)",
+            transcript=_transcript(messages),
+        )
+        messages = [{"role": "user", "content": prompt}]
+
+        def completion():
+            with rate_limited("openai"):
+                response = self.client.create(messages=messages, cache=None)
+            return self.client.extract_text_or_completion_object(response)[0]
+
+        return replay_call("llm", "history_summary", messages, completion) or summary
+
+    def _local_summarize(self, summary: str, messages: List[Dict]) -> str:
+        return rank_sentences(
+            summary + "\n" + _transcript(messages), max_tokens=self.summary_tokens
+        )
+
+    def _fold(self, summary: str, messages: List[Dict]):
+        key = hash((summary, _transcript(messages)))
+        with self._lock:
+            if key not in self._folds:
+                # in the context of the run, for its replay session, budget and trace
+                self._folds[key] = self._executor.submit(
+                    contextvars.copy_context().run, self.summarizer, summary, messages
+                )
+                while len(self._folds) > self.max_folds:
+                    self._folds.popitem(last=False)
+            return self._folds[key]
+
+    def compress(
+        self, name: str, messages: List[Dict], system_tokens: int = 0
+    ) -> List[Dict]:
+        state = self._states[name]
+        if len(messages) < state["folded"]:  # conversation restarted
+            state.update(folded=0, summary="", pending=None)
+
+        pending = state["pending"]
+        if pending and pending[1].done():
+            try:
+                state["summary"] = pending[1].result()
+                state["folded"] = pending[0]
+            except Exception as e:
+                logger.warning("History summarization failed, keeping messages verbatim: %s", e)
+            state["pending"] = None
+
+        boundary = max(len(messages) - self.keep_last, 0)
+        while boundary < len(messages) and messages[boundary].get("role") == "tool":
+            boundary += 1  # keep tool responses together with their calls
+        if boundary > state["folded"] and state["pending"] is None:
+            state["pending"] = (
+                boundary,
+                self._fold(state["summary"], messages[state["folded"] : boundary]),
+            )
+
+        kept = messages[state["folded"] :]
+        prefix = []
+        if state["summary"]:
+            prefix = [
+                {
+                    "role": "user",
+                    "content": f"Summary of the earlier conversation:\n{state['summary']}",
+                }
+            ]
+
+        budget = self.max_prompt_tokens - system_tokens
+        tokens = [_message_tokens(m) for m in prefix + kept]
+        start = len(prefix)
+        while sum(tokens[start:]) + sum(tokens[: len(prefix)]) > budget and start < len(tokens) - 1:
+            start += 1
+            while start < len(tokens) - 1 and kept[start - len(prefix)].get("role") == "tool":
+                start += 1
+        kept = kept[start - len(prefix) :]
+        compressed = prefix + kept
+
+        total = sum(tokens[: len(prefix)]) + sum(tokens[start:])
+        if total > budget and kept:
+            # a single message above the ceiling, cut its text (its tool calls are kept)
+            last = dict(kept[-1])
+            others = total - tokens[-1]
+            content = str(last.get("content") or "")
+            while content and others + _message_tokens(last) > budget:
+                excess = others + _message_tokens(last) - budget
+                content = content[: -excess * 4]
+                last["content"] = content
+            compressed[-1] = last
+            total = others + _message_tokens(last)
+
+        before = system_tokens + sum(_message_tokens(m) for m in messages)
+        self.stats.append(
+            {
+                "agent": name,
+                "messages": len(messages),
+                "prompt_tokens_before": before,
+                "prompt_tokens_after": system_tokens + total,
+            }
+        )
+        return compressed
+
+    def report(self) -> str:
+        """Prompt tokens per turn before and after compression."""
+        lines = [f"{'turn':>4} {'agent':<32}{'messages':>9}{'before':>9}{'after':>9}"]
+        for i, s in enumerate(self.stats):
+            lines.append(
+                f"{i + 1:>4} {s['agent']:<32}{s['messages']:>9}"
+                f"{s['prompt_tokens_before']:>9}{s['prompt_tokens_after']:>9}"
+            )
+        return "\n".join(lines)
@@ -19,6 +19,24 @@ leader_system_message = dedent(
     Reply "TERMINATE" in the end when everything is done.
     """
 )
+parallel_leader_system_message = dedent(
+    """
+    You are the leader of the following group members:
+    
+    {group_desc}
+    
+    As a group leader, you are responsible for coordinating the team's efforts to achieve the project's objectives. You must ensure that the team is working together effectively and efficiently. 
+
+    - Summarize the status of the whole project progess each time you respond.
+    - End your response with orders to your team members to progress the project, if the objective has not been achieved yet.
+    - Orders should be follow the format: \"[<name of staff>] <order>\", one order per line.
+    - Orders need to be detailed, including necessary time period information, stock information or instruction from higher level leaders. 
+    - Tasks that do not depend on each other should be ordered in the same response, at most one order per team member. They will be carried out in parallel.
+    - After receiving feedback from team members, check the results of the tasks, and make sure they have been well completed before proceding to the next orders.
+
+    Reply "TERMINATE" in the end when everything is done.
+    """
+)
 role_system_message = dedent(
     """
     As a {title}, your reponsibilities are as follows:
@@ -39,3 +57,16 @@ order_template = dedent(
     If the task cannot be done currently or need assistance from other members, report the reasons or requirements to group leader ended with TERMINATE. 
 """
 )
+history_summary_prompt = dedent(
+    """
+    Update the summary of an ongoing group conversation with its next messages.
+    Keep the decisions made, results obtained (numbers, file paths) and open tasks, drop pleasantries.
+    Reply with the updated summary only, in less than {max_words} words.
+
+    Current summary:
+    {summary}
+
+    Next messages:
+    {transcript}
+    """
+)
@@ -0,0 +1,136 @@
+import re
+from collections import Counter
+from typing import Callable, Dict, List
+
+from autogen import ConversableAgent
+
+from ..utils import count_tokens
+
+
+_CODE_BLOCK = re.compile(r"```.*?```", re.DOTALL)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z][a-z0-9_\-]+|\d[\d,.]*%?")
+_NUMBER = re.compile(r"\d")
+_FILE_PATH = re.compile(
+    r"(?:[\w.\-]+/)*[\w.\-]+\.(?:csv|txt|json|png|jpg|jpeg|svg|pdf|md|py|xlsx|parquet|html)\b"
+)
+_STOPWORDS = set(
+    "the a an and or of to in on for with by at from as is are was were be been it its this that "
+    "these those we you i he she they will would can could should has have had not but if then so "
+    "than into about which who what when where how all any each our your their there here".split()
+)
+
+
+def _transcript(sender, recipient) -> List[str]:
+    # the first message is the order itself, the rest is the work done on it
+    messages = recipient.chat_messages_for_summary(sender)[1:]
+    contents = []
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, str) and content.strip():
+            contents.append(content.replace("TERMINATE", "").strip())
+    return contents
+
+
+def rank_sentences(text: str, max_tokens: int = 200) -> str:
+    """
+    Extractive summary: sentences are scored by how central their words are to the text,
+    with a bonus for figures and for later sentences (conclusions), and the best ones that
+    fit in `max_tokens` are returned in their original order.
+    """
+    text = _CODE_BLOCK.sub(" ", text)
+    sentences = []
+    for s in _SENTENCE_SPLIT.split(text):
+        s = s.strip(" -*#\t")
+        if len(s) > 20 and s not in sentences:
+            sentences.append(s)
+    if not sentences:
+        return text.strip()
+
+    words = [[w for w in _WORD.findall(s.lower()) if w not in _STOPWORDS] for s in sentences]
+    freq = Counter(w for ws in words for w in set(ws))
+    scores = []
+    for i, ws in enumerate(words):
+        centrality = sum(freq[w] for w in set(ws)) / (len(set(ws)) + 1) ** 0.5
+        scores.append(
+            centrality
+            + (1.0 if _NUMBER.search(sentences[i]) else 0.0)
+            + 0.5 * i / len(sentences)
+        )
+
+    chosen, used = set(), 0
+    for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        tokens = count_tokens(sentences[i])
+        if used + tokens > max_tokens and chosen:
+            continue
+        chosen.add(i)
+        used += tokens
+    return "\n".join(sentences[i] for i in sorted(chosen))
+
+
+def last_msg_summary(sender, recipient, summary_args: Dict) -> str:
+    return ConversableAgent._last_msg_as_summary(sender, recipient, summary_args)
+
+
+def reflection_summary(sender, recipient, summary_args: Dict) -> str:
+    return ConversableAgent._reflection_with_llm_as_summary(
+        sender, recipient, summary_args
+    )
+
+
+def extractive_summary(sender, recipient, summary_args: Dict) -> str:
+    """Rank the sentences of the nested chat locally, no LLM call."""
+    text = "\n".join(_transcript(sender, recipient))
+    return rank_sentences(text, summary_args.get("max_tokens", 200))
+
+
+def structured_summary(sender, recipient, summary_args: Dict) -> str:
+    """Extract the results (lines with figures), the saved file paths and the final answer."""
+    contents = _transcript(sender, recipient)
+    text = _CODE_BLOCK.sub(" ", "\n".join(contents))
+    files = list(dict.fromkeys(_FILE_PATH.findall("\n".join(contents))))
+    results = []
+    for line in text.splitlines():
+        line = line.replace("Code output:", "").strip(" -*#\t")
+        if line.startswith("exitcode:"):
+            continue
+        if _NUMBER.search(line) and re.search(r"[:=]", line) and line not in results:
+            results.append(line)
+    max_results = summary_args.get("max_results", 10)
+
+    summary = []
+    if results:
+        summary.append(
+            "Results:\n" + "\n".join(f"- {r}" for r in results[-max_results:])
+        )
+    if files:
+        summary.append("Files:\n" + "\n".join(f"- {f}" for f in files))
+    if contents:
+        summary.append("Final answer:\n" + contents[-1])
+    return "\n\n".join(summary)
+
+
+def adaptive_summary(sender, recipient, summary_args: Dict) -> str:
+    """Reflect with the LLM only when the transcript exceeds `reflection_threshold` tokens."""
+    transcript_tokens = sum(count_tokens(c) for c in _transcript(sender, recipient))
+    if transcript_tokens > summary_args.get("reflection_threshold", 1500):
+        return reflection_summary(sender, recipient, summary_args)
+    return last_msg_summary(sender, recipient, summary_args)
+
+
+summary_methods = {
+    "last_msg": last_msg_summary,
+    "reflection_with_llm": reflection_summary,
+    "extractive": extractive_summary,
+    "structured": structured_summary,
+    "adaptive": adaptive_summary,
+}
+
+
+def get_summary_method(summary_method: str | Callable) -> Callable:
+    if callable(summary_method):
+        return summary_method
+    assert (
+        summary_method in summary_methods
+    ), f"summary_method should be one of {list(summary_methods)} or a callable."
+    return summary_methods[summary_method]
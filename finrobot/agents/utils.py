@@ -1,5 +1,25 @@
+import os
 import re
+import uuid
+import asyncio
+import inspect
+import logging
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from autogen import ConversableAgent, UserProxyAgent
+from autogen.agentchat.chat import consolidate_chat_info
 from .prompts import order_template
+from .summary import get_summary_method
+from ..tracing import trace_span
+from ..replay import replay_call, checkpoint_call, a_checkpoint_call, checkpoint_run
+from ..budget import get_budget, RunBudget, BudgetExceeded, RunResult, partial_answer
+from ..prefetch import prefetch, prefetched_results
+from ..ratelimit import rate_limited
+from ..kernels import get_kernel_pool, format_cell_result, release_kernel
+
+
+logger = logging.getLogger(__name__)
 
 
 def instruction_trigger(sender):
@@ -11,9 +31,13 @@ def instruction_message(recipient, messages, sender, config):
     # Extract the path to the instruction text file from the last message
     full_order = recipient.chat_messages_for_summary(sender)[-1]["content"]
     txt_path = full_order.replace("instruction & resources saved to ", "").strip()
-    with open(txt_path, "r") as f:
-        instruction = f.read() + "\n\nReply TERMINATE at the end of your response."
-    return instruction
+
+    def read_instruction():
+        with open(txt_path, "r") as f:
+            return f.read()
+
+    instruction = replay_call("file", "instruction", txt_path, read_instruction)
+    return instruction + "\n\nReply TERMINATE at the end of your response."
 
 
 def order_trigger(sender, name, pattern):
@@ -22,6 +46,12 @@ def order_trigger(sender, name, pattern):
     return sender.name == name and pattern in sender.last_message()["content"]
 
 
+def orders_trigger(sender, name, patterns):
+    return sender.name == name and any(
+        p in sender.last_message()["content"] for p in patterns
+    )
+
+
 def order_message(pattern, recipient, messages, sender, config):
     full_order = recipient.chat_messages_for_summary(sender)[-1]["content"]
     pattern = rf"\[{pattern}\](?::)?\s*(.+?)(?=\n\[|$)"
@@ -31,3 +61,508 @@ def order_message(pattern, recipient, messages, sender, config):
     else:
         order = full_order
     return order_template.format(order=order)
+
+
+def _total_tokens(llm_client):
+    usage = llm_client.total_usage_summary or {}
+    prompt, completion = 0, 0
+    for model_usage in usage.values():
+        if isinstance(model_usage, dict):
+            prompt += model_usage.get("prompt_tokens", 0)
+            completion += model_usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+def instrument_agent(agent: ConversableAgent) -> ConversableAgent:
+    """
+    Trace every LLM completion of an agent, including reflections it runs for summaries.
+    Completions and code execution also go through finrobot.replay, to be recorded or replayed,
+    and are charged to the budget of the run (finrobot.budget).
+    """
+    if "_generate_oai_reply_from_client" in agent.__dict__:
+        return agent  # already instrumented
+    generate = agent._generate_oai_reply_from_client
+    execute_code_blocks = agent.execute_code_blocks
+
+    def traced_generate(llm_client, messages, cache):
+        def completion():
+            with rate_limited("openai"):
+                return generate(llm_client, messages, cache)
+
+        budget = get_budget()
+        if budget is not None:
+            budget.check_llm_call()
+        with trace_span("llm", agent.name, messages=len(messages)) as span:
+            if not span.recording and budget is None:
+                return replay_call("llm", agent.name, messages, completion)
+            prompt_before, completion_before = _total_tokens(llm_client)
+            reply = replay_call("llm", agent.name, messages, completion)
+            prompt_after, completion_after = _total_tokens(llm_client)
+            prompt_tokens = prompt_after - prompt_before
+            completion_tokens = completion_after - completion_before
+            if budget is not None:
+                budget.charge_llm_call(prompt_tokens + completion_tokens)
+            if span.recording:
+                span.set(
+                    prompt_chars=sum(len(str(m.get("content") or "")) for m in messages),
+                    reply_chars=len(str(reply or "")),
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                    tool_calls=(
+                        len(reply.get("tool_calls") or [])
+                        if isinstance(reply, dict)
+                        else 0
+                    ),
+                )
+        return reply
+
+    def replayable_execute_code_blocks(code_blocks):
+        budget = get_budget()
+        refusal = budget.charge_tool_call() if budget is not None else None
+        if refusal:
+            return 1, refusal
+        exitcode, logs = replay_call(
+            "code", agent.name, code_blocks, lambda: execute_code_blocks(code_blocks)
+        )
+        return exitcode, logs
+
+    agent._generate_oai_reply_from_client = traced_generate
+    agent.execute_code_blocks = replayable_execute_code_blocks
+    return agent
+
+
+_MIME_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/svg+xml": "svg"}
+
+
+def setup_code_execution(agent: ConversableAgent, session_id: str) -> ConversableAgent:
+    """
+    Apply the finrobot options of an executor's code_execution_config for a session:
+    - "isolate": True runs the code of the session in <work_dir>/<session_id>.
+    - "kernel": True (or a finrobot.kernels.DEFAULT_KERNEL_CONFIG dict, used when the
+      process-wide pool is created) runs python blocks in a warm kernel of the session,
+      keeping variables between blocks. Images it displays are saved in the work dir.
+    """
+    config = agent._code_execution_config
+    if not isinstance(config, dict) or not ({"isolate", "kernel"} & config.keys()):
+        return agent
+    config = agent._code_execution_config = dict(config)  # the default dict is shared
+    if config.pop("isolate", False):
+        config["work_dir"] = os.path.join(config.get("work_dir") or "coding", session_id)
+    kernel_config = config.pop("kernel", None)
+    if not kernel_config:
+        return agent
+
+    agent._kernel_config = kernel_config  # for executors cloned from this one
+    pool = get_kernel_pool(kernel_config if isinstance(kernel_config, dict) else None)
+    run_code = agent.run_code
+
+    def run_code_in_kernel(code, lang="python", filename=None, work_dir=None, timeout=None, **kwargs):
+        if lang != "python":
+            return run_code(code, lang=lang, work_dir=work_dir, timeout=timeout, **kwargs)
+        work_dir = work_dir or "coding"
+        if filename:
+            path = os.path.join(work_dir, filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(code)
+        result = pool.execute(session_id, code, work_dir, timeout)
+        for i, output in enumerate(result["outputs"]):
+            if output["mime"] in _MIME_EXTENSIONS:
+                name = f"output_{uuid.uuid4().hex[:8]}.{_MIME_EXTENSIONS[output['mime']]}"
+                data = output["data"]
+                with open(os.path.join(work_dir, name), "wb" if isinstance(data, bytes) else "w") as f:
+                    f.write(data)
+                result["outputs"][i] = {"mime": "text/plain", "data": f"[{output['mime']} saved to {name}]"}
+        return (0 if result["status"] == "ok" else 1), format_cell_result(result), None
+
+    agent.run_code = run_code_in_kernel
+    return agent
+
+
+# LLM completions, sync tools and code execution of async chats run here, not on the event loop
+_async_executor = ThreadPoolExecutor(max_workers=256, thread_name_prefix="finrobot")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Await a blocking call in the shared thread pool, keeping the context (trace spans, io stream)."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _async_executor, partial(context.run, func, *args, **kwargs)
+    )
+
+
+_BLOCKING_REPLY_FUNCS = [
+    ConversableAgent.generate_code_execution_reply,
+    ConversableAgent._generate_code_execution_reply_using_executor,
+]
+
+
+def enable_async(agent: ConversableAgent) -> ConversableAgent:
+    """
+    Keep the event loop free when an agent is driven by a_initiate_chat: LLM completions,
+    sync tools and code execution are awaited in a shared thread pool instead of blocking it.
+    Sync chats are not affected.
+    """
+    if getattr(agent, "_async_enabled", False):
+        return agent
+    agent._async_enabled = True
+
+    async def a_generate_oai_reply(recipient, messages=None, sender=None, config=None):
+        return await run_blocking(
+            recipient.generate_oai_reply, messages=messages, sender=sender, config=config
+        )
+
+    agent.replace_reply_func(ConversableAgent.a_generate_oai_reply, a_generate_oai_reply)
+
+    for reply_func in _BLOCKING_REPLY_FUNCS:
+        for position, entry in enumerate(agent._reply_func_list):
+            if entry["reply_func"] is not reply_func:
+                continue
+
+            async def a_reply_func(
+                recipient, messages=None, sender=None, config=None, reply_func=reply_func
+            ):
+                # when no code is found, the sync reply func after it repeats the (cheap) check
+                return await run_blocking(
+                    reply_func, recipient, messages=messages, sender=sender, config=config
+                )
+
+            agent.register_reply(
+                entry["trigger"],
+                a_reply_func,
+                position,
+                entry["init_config"],
+                entry["reset_config"],
+                ignore_async_in_sync_chat=True,
+            )
+            break
+
+    a_execute_function = agent.a_execute_function
+
+    async def a_execute_function_in_pool(func_call):
+        func = agent._function_map.get(func_call.get("name", ""))
+        if func is None or inspect.iscoroutinefunction(func):
+            return await a_execute_function(func_call)
+        return await run_blocking(agent.execute_function, func_call)
+
+    agent.a_execute_function = a_execute_function_in_pool
+    return agent
+
+
+def register_async_nested_chats(agent, chat_queue, trigger, reply_func, a_reply_func):
+    """
+    Register nested chats that run with `reply_func` in sync chats and are awaited with
+    the coroutine `a_reply_func` in async chats.
+    """
+    # kept to register the same nested chats on executors cloned from the agent
+    agent.__dict__.setdefault("_nested_chat_registrations", []).append(
+        (chat_queue, trigger, reply_func, a_reply_func)
+    )
+    agent.register_nested_chats(
+        chat_queue, trigger=trigger, reply_func_from_nested_chats=reply_func
+    )
+
+    async def a_wrapped_reply_func(recipient, messages=None, sender=None, config=None):
+        return await a_reply_func(chat_queue, recipient, messages, sender, config)
+
+    # inserted before the sync one, which is skipped once the async one replied
+    agent.register_reply(trigger, a_wrapped_reply_func, 2, ignore_async_in_sync_chat=True)
+
+
+async def cancel_on_disconnect(coro, is_disconnected=None, poll_interval: float = 0.5):
+    """
+    Await `coro` and cancel it as soon as `await is_disconnected()` returns True,
+    e.g. `request.is_disconnected` of a starlette / FastAPI request.
+    """
+    if is_disconnected is None:
+        return await coro
+    task = asyncio.ensure_future(coro)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=poll_interval)
+            if not task.done() and await is_disconnected():
+                task.cancel()
+                break
+        return await task
+    finally:
+        task.cancel()  # no-op once done, stops the conversation if we were cancelled
+
+
+def _stopped_run(sender, recipient, budget: RunBudget, reason: str) -> RunResult:
+    logger.warning("Run stopped, budget exhausted: %s", reason)
+    chat_history = list(sender.chat_messages.get(recipient, []))
+    return RunResult(
+        partial_answer(chat_history, sender.name), reason, budget.usage(), chat_history
+    )
+
+
+def _finish_checkpoint(checkpoint, result: RunResult):
+    if checkpoint is None:
+        return
+    if checkpoint.resumed:
+        logger.info(checkpoint.report())
+    if result.reason == "completed":
+        checkpoint.discard()  # a failed or stopped run keeps it, to be resumed
+
+
+def run_chat(
+    sender,
+    recipient,
+    message,
+    budget_config=None,
+    prefetch_config=None,
+    checkpoint_path=None,
+    **kwargs,
+) -> RunResult:
+    """
+    initiate_chat under a RunBudget built from `budget_config`. A run stopped by the budget
+    returns the last answer of the agents and the limit that was reached.
+    With `prefetch_config` (see finrobot.prefetch), the tools the task most likely needs are
+    called concurrently before the first completion; they are not charged to the budget.
+    With `checkpoint_path`, every step is journaled there and a run that did not complete
+    is resumed from it (see finrobot.replay.Checkpoint); it is removed once completed.
+    """
+    with checkpoint_run(checkpoint_path) as checkpoint:
+        results = {}
+        if prefetch_config is not None:
+            message, results = prefetch(message, sender.function_map, prefetch_config)
+        budget = RunBudget(**(budget_config or {}))
+        with budget.activate(), prefetched_results(results):
+            try:
+                chat = sender.initiate_chat(recipient, message=message, **kwargs)
+                result = RunResult(
+                    chat.summary,
+                    budget.reason or "completed",
+                    budget.usage(),
+                    chat.chat_history,
+                )
+            except BudgetExceeded as e:
+                result = _stopped_run(sender, recipient, budget, e.reason)
+        _finish_checkpoint(checkpoint, result)
+    return result
+
+
+async def a_run_chat(
+    sender,
+    recipient,
+    message,
+    budget_config=None,
+    is_disconnected=None,
+    prefetch_config=None,
+    checkpoint_path=None,
+    **kwargs,
+) -> RunResult:
+    """Async counterpart of run_chat, the wall-clock limit also interrupts a pending step."""
+    with checkpoint_run(checkpoint_path) as checkpoint:
+        results = {}
+        if prefetch_config is not None:
+            message, results = await run_blocking(
+                prefetch, message, sender.function_map, prefetch_config
+            )
+        budget = RunBudget(**(budget_config or {}))
+        with budget.activate(), prefetched_results(results):
+            try:
+                chat = await asyncio.wait_for(
+                    cancel_on_disconnect(
+                        sender.a_initiate_chat(recipient, message=message, **kwargs),
+                        is_disconnected,
+                    ),
+                    budget.remaining_seconds(),
+                )
+                result = RunResult(
+                    chat.summary,
+                    budget.reason or "completed",
+                    budget.usage(),
+                    chat.chat_history,
+                )
+            except BudgetExceeded as e:
+                result = _stopped_run(sender, recipient, budget, e.reason)
+            except asyncio.TimeoutError:
+                result = _stopped_run(sender, recipient, budget, "max_seconds")
+        _finish_checkpoint(checkpoint, result)
+    return result
+
+
+def traced_nested_chats(chat_queue, recipient, messages, sender, config):
+    # Reply function for register_nested_chats that wraps the built-in one in a span
+    # a completed nested chat is journaled by the checkpoint of the run, if any
+    name = ",".join(c["recipient"].name for c in chat_queue)
+
+    def run_nested_chats():
+        with trace_span("nested_chat", name, trigger=sender.name) as span:
+            _, summary = ConversableAgent._summary_from_nested_chats(
+                chat_queue, recipient, messages, sender, config
+            )
+            span.set(summary_chars=len(summary or ""))
+        return summary
+
+    request = messages[-1].get("content")
+    return True, checkpoint_call("nested", name, request, run_nested_chats)
+
+
+def traced_summary_method(summary_method):
+    """Wrap a nested chat summary_method (name from summary_methods or callable) in a span."""
+    func = get_summary_method(summary_method)
+    method_name = summary_method if isinstance(summary_method, str) else func.__name__
+
+    def summary(sender, recipient, summary_args):
+        with trace_span("summary", recipient.name, method=method_name) as span:
+            text = func(sender, recipient, summary_args)
+            span.set(
+                transcript_chars=sum(
+                    len(str(m.get("content") or ""))
+                    for m in recipient.chat_messages_for_summary(sender)
+                ),
+                summary_chars=len(text or ""),
+            )
+        return text
+
+    return summary
+
+
+async def a_traced_nested_chats(chat_queue, recipient, messages, sender, config):
+    # Async counterpart of traced_nested_chats, the chats of the queue run one after another
+    # and, like autogen's initiate_chats, carry the summaries of the finished ones over
+    chat_to_run = ConversableAgent._get_chats_to_run(
+        chat_queue, recipient, messages, sender, config
+    )
+    if not chat_to_run:
+        return True, None
+    consolidate_chat_info(chat_to_run)
+    name = ",".join(c["recipient"].name for c in chat_to_run)
+
+    async def run_nested_chats():
+        summaries = []
+        with trace_span("nested_chat", name, trigger=sender.name) as span:
+            for chat in chat_to_run:
+                chat = chat.copy()
+                carryover = chat.get("carryover", [])
+                excluded = chat.pop("finished_chat_indexes_to_exclude_from_carryover", [])
+                chat["carryover"] = ([carryover] if isinstance(carryover, str) else carryover) + [
+                    s for i, s in enumerate(summaries) if i not in excluded
+                ]
+                result = await chat.pop("sender").a_initiate_chat(**chat)
+                summaries.append(result.summary)
+            span.set(summary_chars=len(result.summary or ""))
+        return result.summary
+
+    request = messages[-1].get("content")
+    return True, await a_checkpoint_call("nested", name, request, run_nested_chats)
+
+
+def _orders_to_run(chat_queue, recipient, messages, sender, config):
+    last_msg = messages[-1].get("content") or ""
+    ordered = sorted(
+        (c for c in chat_queue if f"[{c['recipient'].name}]" in last_msg),
+        key=lambda c: last_msg.index(f"[{c['recipient'].name}]"),
+    )
+    return ConversableAgent._get_chats_to_run(
+        ordered, recipient, messages, sender, config
+    )
+
+
+def clone_executor(proxy: ConversableAgent, session_id: str) -> UserProxyAgent:
+    """
+    An executor with the tools, termination and code execution settings and the nested
+    chats (register_async_nested_chats) of `proxy` but its own state, for a nested chat
+    running next to others. Its code runs in <work_dir>/<session_id>, and in the kernel of
+    `session_id` if `proxy` uses kernels.
+    """
+    config = proxy._code_execution_config
+    if isinstance(config, dict):
+        config = dict(config)
+        config["work_dir"] = os.path.join(config.get("work_dir") or "coding", session_id)
+        if getattr(proxy, "_kernel_config", None):
+            config["kernel"] = proxy._kernel_config
+    executor = UserProxyAgent(
+        name=proxy.name,
+        is_termination_msg=proxy._is_termination_msg,
+        human_input_mode=proxy.human_input_mode,
+        max_consecutive_auto_reply=proxy._max_consecutive_auto_reply,
+        code_execution_config=config,
+        default_auto_reply=proxy._default_auto_reply,
+        llm_config=False,
+    )
+    executor.register_function(dict(proxy.function_map))
+    for registration in getattr(proxy, "_nested_chat_registrations", []):
+        register_async_nested_chats(executor, *registration)
+    setup_code_execution(executor, session_id)
+    instrument_agent(executor)
+    enable_async(executor)
+    return executor
+
+
+def _order_chat(chat):
+    """A chat of `chat_to_run` sent by its own executor, returned with the session to release."""
+    chat = chat.copy()
+    session_id = uuid.uuid4().hex[:8]
+    chat["sender"] = clone_executor(chat["sender"], session_id)
+    chat["summary_args"] = dict(chat.get("summary_args") or {})
+    return chat, session_id
+
+
+def _merge_summaries(chat_to_run, summaries):
+    return "\n\n".join(
+        f"[{c['recipient'].name}] {s}" for c, s in zip(chat_to_run, summaries)
+    )
+
+
+def parallel_nested_chats(
+    chat_queue, recipient, messages, sender, config, max_workers=None
+):
+    """
+    Reply function for register_nested_chats that runs the chats of every order found in
+    the last message concurrently, and merges their summaries in the order they were issued.
+    Every order is sent by its own clone of the executor (clone_executor), so that the
+    concurrent chats do not share the executor's state, work dir or kernel.
+    """
+    chat_to_run = _orders_to_run(chat_queue, recipient, messages, sender, config)
+    if not chat_to_run:
+        return True, None
+
+    def run_chat(chat):
+        name = chat["recipient"].name
+
+        def run_nested_chat():
+            chat_args, session_id = _order_chat(chat)
+            chat_sender = chat_args.pop("sender")
+            try:
+                with trace_span("nested_chat", name, trigger=sender.name):
+                    return chat_sender.initiate_chat(**chat_args).summary
+            finally:
+                release_kernel(session_id)
+
+        return checkpoint_call("nested", name, chat["message"], run_nested_chat)
+
+    with ThreadPoolExecutor(max_workers or len(chat_to_run)) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, run_chat, c)
+            for c in chat_to_run
+        ]
+        summaries = [f.result() for f in futures]
+
+    return True, _merge_summaries(chat_to_run, summaries)
+
+
+async def a_parallel_nested_chats(chat_queue, recipient, messages, sender, config):
+    """Async counterpart of parallel_nested_chats, the orders are gathered on the event loop."""
+    chat_to_run = _orders_to_run(chat_queue, recipient, messages, sender, config)
+    if not chat_to_run:
+        return True, None
+
+    async def run_chat(chat):
+        name = chat["recipient"].name
+
+        async def run_nested_chat():
+            chat_args, session_id = _order_chat(chat)
+            chat_sender = chat_args.pop("sender")
+            try:
+                with trace_span("nested_chat", name, trigger=sender.name):
+                    return (await chat_sender.a_initiate_chat(**chat_args)).summary
+            finally:
+                release_kernel(session_id)
+
+        return await a_checkpoint_call("nested", name, chat["message"], run_nested_chat)
+
+    summaries = await asyncio.gather(*[run_chat(c) for c in chat_to_run])
+    return True, _merge_summaries(chat_to_run, summaries)
@@ -10,13 +10,22 @@ from autogen import (
     GroupChatManager,
     register_function,
 )
+import uuid
 from collections import defaultdict
+from contextlib import nullcontext
 from functools import partial
 from abc import ABC, abstractmethod
-from ..toolkits import register_toolkits
-from ..functional.rag import get_rag_function
+from ..toolkits import register_toolkits, resolve_toolkits
+from ..tracing import trace_span
+from ..kernels import kernel_session, release_kernel
+from ..replay import run_checkpoint_path
 from .utils import *
-from .prompts import leader_system_message, role_system_message
+from .history import HistoryCompressor
+from .prompts import (
+    leader_system_message,
+    parallel_leader_system_message,
+    role_system_message,
+)
 
 
 class FinRobot(AssistantAgent):
@@ -25,7 +34,7 @@ class FinRobot(AssistantAgent):
         self,
         agent_config: str | Dict[str, Any],
         system_message: str | None = None,  # overwrites previous config
-        toolkits: List[Callable | dict | type] = [],  # overwrites previous config
+        toolkits: List[Callable | dict | type | str] = [],  # overwrites previous config
         proxy: UserProxyAgent | None = None,
         **kwargs,
     ):
@@ -46,7 +55,7 @@ class FinRobot(AssistantAgent):
         default_toolkits = agent_config.get("toolkits", [])
 
         system_message = system_message or default_system_message
-        self.toolkits = toolkits or default_toolkits
+        self.toolkits = resolve_toolkits(toolkits or default_toolkits)
 
         name = name.replace(" ", "_").strip()
 
@@ -86,7 +95,11 @@ class FinRobot(AssistantAgent):
 
         if "group_desc" in config:
             group_desc = config["group_desc"]
-            leader_prompt = leader_system_message.format(group_desc=group_desc)
+            leader_prompt = (
+                parallel_leader_system_message
+                if config.get("parallel_orders", False)
+                else leader_system_message
+            ).format(group_desc=group_desc)
 
         config["profile"] = (
             (role_prompt + "\n\n").strip()
@@ -123,6 +136,19 @@ class SingleAssistantBase(ABC):
 
 
 class SingleAssistant(SingleAssistantBase):
+    """
+    `budget` limits every run, e.g. {"max_seconds": 60, "max_tokens": 20000,
+    "max_llm_calls": 20, "max_tool_calls": 10} (see finrobot.budget.RunBudget).
+    chat / achat return a RunResult with the answer, the reason the run ended and its usage.
+    `prefetch` starts the data tools a ticker-centric task most likely needs before the first
+    completion, e.g. {"mode": "context"} (see finrobot.prefetch.DEFAULT_PREFETCH_CONFIG).
+    code_execution_config also accepts "isolate": True (a work dir per instance) and
+    "kernel": True (python blocks run in a warm kernel, see setup_code_execution).
+    With `checkpoint_dir`, every completion, tool result and nested chat of a run is journaled
+    there as it completes; running the same message (and `run_id` of chat / achat) again
+    after a failure resumes from it (see finrobot.replay.Checkpoint). A journal is used by
+    one run at a time, a concurrent run of the same message is not journaled.
+    """
 
     def __init__(
         self,
@@ -136,9 +162,15 @@ class SingleAssistant(SingleAssistantBase):
             "work_dir": "coding",
             "use_docker": False,
         },
+        budget: Dict[str, Any] | None = None,
+        prefetch: Dict[str, Any] | None = None,
+        checkpoint_dir: str | None = None,
         **kwargs,
     ):
         super().__init__(agent_config, llm_config=llm_config)
+        self.budget = budget
+        self.prefetch = prefetch
+        self.checkpoint_dir = checkpoint_dir
         self.user_proxy = UserProxyAgent(
             name="User_Proxy",
             is_termination_msg=is_termination_msg,
@@ -148,22 +180,75 @@ class SingleAssistant(SingleAssistantBase):
             **kwargs,
         )
         self.assistant.register_proxy(self.user_proxy)
+        self.session_id = uuid.uuid4().hex[:8]
+        setup_code_execution(self.user_proxy, self.session_id)
+        for agent in [self.assistant, self.user_proxy]:
+            instrument_agent(agent)
+            enable_async(agent)
+
+    def chat(self, message: str, use_cache=False, run_id: str | None = None, **kwargs):
+        with trace_span(
+            "chat", self.assistant.name, message_chars=len(message)
+        ), kernel_session(self.session_id), Cache.disk() as cache:
+            try:
+                result = run_chat(
+                    self.user_proxy,
+                    self.assistant,
+                    message,
+                    self.budget,
+                    prefetch_config=self.prefetch,
+                    checkpoint_path=self._checkpoint_path(message, run_id),
+                    cache=cache if use_cache else None,
+                    **kwargs,
+                )
+                print("Current chat finished. Resetting agents ...")
+            finally:
+                self.reset()
+        return result
 
-    def chat(self, message: str, use_cache=False, **kwargs):
-        with Cache.disk() as cache:
-            self.user_proxy.initiate_chat(
-                self.assistant,
-                message=message,
-                cache=cache if use_cache else None,
-                **kwargs,
-            )
+    async def achat(
+        self,
+        message: str,
+        use_cache=False,
+        is_disconnected=None,
+        run_id: str | None = None,
+        **kwargs,
+    ):
+        """
+        Async counterpart of chat, built on a_initiate_chat. Use one instance per conversation.
+        Cancelling the awaiting task (or `await is_disconnected()` returning True) stops the
+        conversation at its next step and resets the agents. Returns a RunResult like chat.
+        """
+        with trace_span(
+            "chat", self.assistant.name, message_chars=len(message)
+        ), kernel_session(self.session_id), (
+            Cache.disk() if use_cache else nullcontext()
+        ) as cache:
+            try:
+                result = await a_run_chat(
+                    self.user_proxy,
+                    self.assistant,
+                    message,
+                    self.budget,
+                    is_disconnected=is_disconnected,
+                    prefetch_config=self.prefetch,
+                    checkpoint_path=self._checkpoint_path(message, run_id),
+                    cache=cache,
+                    **kwargs,
+                )
+            finally:
+                self.reset()
+        return result
 
-        print("Current chat finished. Resetting agents ...")
-        self.reset()
+    def _checkpoint_path(self, message: str, run_id: str | None) -> str | None:
+        return run_checkpoint_path(
+            self.checkpoint_dir, self.assistant.name, message, run_id
+        )
 
     def reset(self):
         self.user_proxy.reset()
         self.assistant.reset()
+        release_kernel(self.session_id)
 
 
 class SingleAssistantRAG(SingleAssistant):
@@ -194,6 +279,7 @@ class SingleAssistantRAG(SingleAssistant):
             **kwargs,
         )
         assert retrieve_config, "retrieve config cannot be empty for RAG Agent."
+        from ..functional.rag import get_rag_function  # loads the retrieval dependencies
         rag_func, rag_assistant = get_rag_function(retrieve_config, rag_description)
         self.rag_assistant = rag_assistant
         register_function(
@@ -246,18 +332,23 @@ class SingleAssistantShadow(SingleAssistant):
             llm_config=llm_config,
             proxy=None,
         )
-        self.assistant.register_nested_chats(
+        instrument_agent(self.assistant_shadow)
+        enable_async(self.assistant_shadow)
+        register_async_nested_chats(
+            self.assistant,
             [
                 {
                     "sender": self.assistant,
                     "recipient": self.assistant_shadow,
                     "message": instruction_message,
-                    "summary_method": "last_msg",
+                    "summary_method": traced_summary_method("last_msg"),
                     "max_turns": 2,
                     "silent": True,  # mute the chat summary
                 }
             ],
-            trigger=instruction_trigger,
+            instruction_trigger,
+            traced_nested_chats,
+            a_traced_nested_chats,
         )
 
 
@@ -267,6 +358,10 @@ Multi Agent Workflows
 
 
 class MultiAssistantBase(ABC):
+    """
+    `budget` limits every run, `prefetch` warms the data tools and `checkpoint_dir` makes
+    runs resumable, see SingleAssistant. chat / achat return a RunResult.
+    """
 
     def __init__(
         self,
@@ -284,10 +379,17 @@ class MultiAssistantBase(ABC):
             "work_dir": "coding",
             "use_docker": False,
         },
+        budget: Dict[str, Any] | None = None,
+        prefetch: Dict[str, Any] | None = None,
+        checkpoint_dir: str | None = None,
         **kwargs,
     ):
         self.group_config = group_config
         self.llm_config = llm_config
+        self.budget = budget
+        self.prefetch = prefetch
+        self.checkpoint_dir = checkpoint_dir
+        self.session_id = uuid.uuid4().hex[:8]
         if user_proxy is None:
             self.user_proxy = UserProxyAgent(
                 name="User_Proxy",
@@ -297,6 +399,7 @@ class MultiAssistantBase(ABC):
                 code_execution_config=code_execution_config,
                 **kwargs,
             )
+            setup_code_execution(self.user_proxy, self.session_id)
         else:
             self.user_proxy = user_proxy
         self.agent_configs = agent_configs or group_config.get("agents", [])
@@ -304,6 +407,9 @@ class MultiAssistantBase(ABC):
         self.agents = []
         self._init_agents()
         self.representative = self._get_representative()
+        for agent in self.agents + [self.representative, self.user_proxy]:
+            instrument_agent(agent)
+            enable_async(agent)
 
     def _init_single_agent(self, agent_config):
         if isinstance(agent_config, ConversableAgent):
@@ -335,20 +441,69 @@ class MultiAssistantBase(ABC):
     def _get_representative(self) -> ConversableAgent:
         pass
 
-    def chat(self, message: str, use_cache=False, **kwargs):
-        with Cache.disk() as cache:
-            self.user_proxy.initiate_chat(
-                self.representative,
-                message=message,
-                cache=cache if use_cache else None,
-                **kwargs,
-            )
-        print("Current chat finished. Resetting agents ...")
-        self.reset()
+    def chat(self, message: str, use_cache=False, run_id: str | None = None, **kwargs):
+        with trace_span(
+            "chat", self.representative.name, message_chars=len(message)
+        ), kernel_session(self.session_id), Cache.disk() as cache:
+            try:
+                result = run_chat(
+                    self.user_proxy,
+                    self.representative,
+                    message,
+                    self.budget,
+                    prefetch_config=self.prefetch,
+                    checkpoint_path=self._checkpoint_path(message, run_id),
+                    cache=cache if use_cache else None,
+                    **kwargs,
+                )
+                print("Current chat finished. Resetting agents ...")
+            finally:
+                self.reset()
+        return result
+
+    async def achat(
+        self,
+        message: str,
+        use_cache=False,
+        is_disconnected=None,
+        run_id: str | None = None,
+        **kwargs,
+    ):
+        """
+        Async counterpart of chat, built on a_initiate_chat. Use one instance per conversation.
+        Cancelling the awaiting task (or `await is_disconnected()` returning True) stops the
+        conversation at its next step and resets the agents. Returns a RunResult like chat.
+        """
+        with trace_span(
+            "chat", self.representative.name, message_chars=len(message)
+        ), kernel_session(self.session_id), (
+            Cache.disk() if use_cache else nullcontext()
+        ) as cache:
+            try:
+                result = await a_run_chat(
+                    self.user_proxy,
+                    self.representative,
+                    message,
+                    self.budget,
+                    is_disconnected=is_disconnected,
+                    prefetch_config=self.prefetch,
+                    checkpoint_path=self._checkpoint_path(message, run_id),
+                    cache=cache,
+                    **kwargs,
+                )
+            finally:
+                self.reset()
+        return result
+
+    def _checkpoint_path(self, message: str, run_id: str | None) -> str | None:
+        return run_checkpoint_path(
+            self.checkpoint_dir, self.representative.name, message, run_id
+        )
 
     def reset(self):
         self.user_proxy.reset()
         self.representative.reset()
+        release_kernel(self.session_id)
         for agent in self.agents:
             agent.reset()
 
@@ -356,8 +511,32 @@ class MultiAssistantBase(ABC):
 class MultiAssistant(MultiAssistantBase):
     """
     Group Chat Workflow with multiple agents.
+
+    `history_config` enables bounded prompt history for long group chats, with the
+    arguments of HistoryCompressor, e.g. {"keep_last": 6, "max_prompt_tokens": 6000}.
+    Prompt tokens per turn before and after compression are in `self.history.report()`.
     """
 
+    def __init__(
+        self,
+        group_config: str | dict,
+        agent_configs: List[Dict[str, Any] | str | ConversableAgent] = [],
+        llm_config: Dict[str, Any] = {},
+        history_config: Dict[str, Any] | None = None,
+        **kwargs,
+    ):
+        self.history = (
+            HistoryCompressor(**history_config) if history_config is not None else None
+        )
+        super().__init__(
+            group_config, agent_configs=agent_configs, llm_config=llm_config, **kwargs
+        )
+
+    def reset(self):
+        super().reset()
+        if self.history is not None:
+            self.history.reset()
+
     def _get_representative(self):
 
         def custom_speaker_selection_func(
@@ -387,6 +566,9 @@ class MultiAssistant(MultiAssistantBase):
             speaker_selection_method=custom_speaker_selection_func,
             send_introductions=True,
         )
+        if self.history is not None:
+            for agent in self.agents:
+                self.history.attach(agent)
         manager_name = (self.group_config.get("name", "") + "_chat_manager").strip("_")
         manager = GroupChatManager(
             self.group_chat, name=manager_name, llm_config=self.llm_config
@@ -411,8 +593,37 @@ class MultiAssistantWithLeader(MultiAssistantBase):
             }, ...
         ]
     }
+
+    With `parallel_orders=True`, the leader may issue several orders in one response.
+    Their nested chats run concurrently on a pool of `max_workers` threads and the
+    summaries are merged back in the order the orders were given. Each order is executed
+    by its own clone of the user proxy, with its own work dir (and kernel).
+
+    `summary_method` selects how a nested chat is reported back to the leader, see
+    finrobot.agents.summary: "reflection_with_llm" (one extra LLM call per order),
+    "last_msg", "extractive", "structured", "adaptive" (reflection only above
+    summary_args["reflection_threshold"] tokens), or a callable.
     """
 
+    def __init__(
+        self,
+        group_config: str | dict,
+        agent_configs: List[Dict[str, Any] | str | ConversableAgent] = [],
+        llm_config: Dict[str, Any] = {},
+        parallel_orders: bool = False,
+        max_workers: int | None = None,
+        summary_method: str | Callable = "reflection_with_llm",
+        summary_args: Dict[str, Any] = {},
+        **kwargs,
+    ):
+        self.parallel_orders = parallel_orders
+        self.max_workers = max_workers
+        self.summary_method = summary_method
+        self.summary_args = summary_args
+        super().__init__(
+            group_config, agent_configs=agent_configs, llm_config=llm_config, **kwargs
+        )
+
     def _get_representative(self):
 
         assert (
@@ -445,25 +656,44 @@ class MultiAssistantWithLeader(MultiAssistantBase):
 
         self.leader_config = self.group_config["leader"]
         self.leader_config["group_desc"] = group_desc.strip()
+        self.leader_config["parallel_orders"] = self.parallel_orders
 
         # Initialize Leader
         leader = self._init_single_agent(self.leader_config)
 
-        # Register Leader - Agents connections
-        for agent in self.agents:
-            self.user_proxy.register_nested_chats(
-                [
-                    {
-                        "sender": self.user_proxy,
-                        "recipient": agent,
-                        "message": partial(order_message, agent.name),
-                        "summary_method": "reflection_with_llm",
-                        "max_turns": 10,
-                        "max_consecutive_auto_reply": 3,
-                    }
-                ],
-                trigger=partial(
-                    order_trigger, name=leader.name, pattern=f"[{agent.name}]"
+        # Register Leader - Agents connections. The chats are sent by the agent replying
+        # to the leader, the user proxy or its clone running a parallel order
+        chats = [
+            {
+                "recipient": agent,
+                "message": partial(order_message, agent.name),
+                "summary_method": traced_summary_method(self.summary_method),
+                "summary_args": dict(self.summary_args),
+                "max_turns": 10,
+                "max_consecutive_auto_reply": 3,
+            }
+            for agent in self.agents
+        ]
+        if self.parallel_orders:
+            register_async_nested_chats(
+                self.user_proxy,
+                chats,
+                partial(
+                    orders_trigger,
+                    name=leader.name,
+                    patterns=[f"[{agent.name}]" for agent in self.agents],
                 ),
+                partial(parallel_nested_chats, max_workers=self.max_workers),
+                a_parallel_nested_chats,
+            )
+            return leader
+
+        for agent, chat in zip(self.agents, chats):
+            register_async_nested_chats(
+                self.user_proxy,
+                [chat],
+                partial(order_trigger, name=leader.name, pattern=f"[{agent.name}]"),
+                traced_nested_chats,
+                a_traced_nested_chats,
             )
         return leader
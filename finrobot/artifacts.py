@@ -0,0 +1,216 @@
+import io
+import os
+import re
+import sys
+import uuid
+import logging
+import threading
+import importlib.util
+from collections import OrderedDict
+from typing import Any
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HANDLE_PATTERN = re.compile(r"^[a-z]+_[0-9a-f]{8}$")
+HANDLE_FINDER = re.compile(r"\b[a-z]+_[0-9a-f]{8}\b")
+
+
+class _ArtifactHandle:
+    def __repr__(self) -> str:
+        return "ARTIFACT_HANDLE"
+
+
+# marks the tool parameters that take artifact handles, the stored object is passed instead:
+#     stock_data: Annotated[str | None, "handle of ...", ARTIFACT_HANDLE] = None
+ARTIFACT_HANDLE = _ArtifactHandle()
+
+# the on-disk tier writes Parquet with pyarrow, it is disabled when pyarrow is not installed
+_has_pyarrow = importlib.util.find_spec("pyarrow") is not None
+
+
+def _size(obj: Any) -> int:
+    """Approximate memory taken by an artifact, in bytes."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, dict) and isinstance(obj.get("data"), bytes):  # images
+        return len(obj["data"])
+    if isinstance(obj, (bytes, str)):
+        return len(obj)
+    return sys.getsizeof(obj)
+
+
+class ArtifactStore:
+    """
+    Process-local store for large tool outputs, addressed by short handles.
+    Least recently used artifacts are evicted once `max_items` or `max_bytes` is exceeded.
+
+    With `spill_dir` (and pyarrow installed), evicted DataFrames and Series are written
+    to <spill_dir>/<handle>.parquet instead of being dropped, and read back memory-mapped
+    on access. `put(..., persist=True)` writes them right away, e.g. to share them with
+    other processes. The spilled files are bounded too, the least recently used beyond
+    `max_spill_bytes` are deleted.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 256,
+        spill_dir: str | None = None,
+        max_bytes: int | None = 512 * 1024 * 1024,
+        max_spill_bytes: int | None = 4 * 1024 * 1024 * 1024,
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.spill_dir = spill_dir if spill_dir and _has_pyarrow else None
+        if spill_dir and not _has_pyarrow:
+            print("pyarrow is not installed, artifacts are kept in memory only.")
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        self._items = OrderedDict()  # handle -> (obj, size)
+        self._bytes = 0
+        self._spilling = {}  # handle -> obj, evicted and being written
+        self._spilled = OrderedDict()  # handle -> file size, written by this store
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, handle: str) -> str:
+        return os.path.join(self.spill_dir, f"{handle}.parquet")
+
+    def _spillable(self, obj: Any) -> bool:
+        return self.spill_dir is not None and isinstance(obj, (pd.DataFrame, pd.Series))
+
+    def _spill(self, handle: str, obj: Any):
+        # called without the lock, then the file is accounted and old files are deleted
+        frame = obj.to_frame() if isinstance(obj, pd.Series) else obj
+        frame = frame.rename(columns=str)  # parquet needs string column names
+        tmp_path = f"{self._path(handle)}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            frame.to_parquet(tmp_path, engine="pyarrow")
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, self._path(handle))
+        size = os.path.getsize(self._path(handle))
+        deleted = []
+        with self._lock:
+            self._spilled_bytes += size - self._spilled.pop(handle, 0)
+            self._spilled[handle] = size
+            while self.max_spill_bytes is not None and self._spilled_bytes > self.max_spill_bytes:
+                old_handle, old_size = self._spilled.popitem(last=False)
+                self._spilled_bytes -= old_size
+                deleted.append(old_handle)
+        for old_handle in deleted:
+            try:
+                os.remove(self._path(old_handle))
+            except FileNotFoundError:
+                pass
+
+    def _try_spill(self, handle: str, obj: Any):
+        # a frame Parquet cannot hold (e.g. mixed-type object columns) must not fail the caller
+        try:
+            self._spill(handle, obj)
+        except Exception as e:
+            logger.warning("Artifact %s could not be written to %s: %s", handle, self.spill_dir, e)
+
+    def put(
+        self, obj: Any, prefix: str = "df", persist: bool = False, handle: str | None = None
+    ) -> str:
+        """Store `obj` under a new handle (or `handle`, e.g. when restoring a checkpoint)."""
+        handle = handle or f"{prefix}_{uuid.uuid4().hex[:8]}"
+        if persist and self._spillable(obj):
+            self._try_spill(handle, obj)  # kept in memory in any case
+        size = _size(obj)
+        evicted = []
+        with self._lock:
+            if handle in self._items:
+                self._bytes -= self._items.pop(handle)[1]
+            self._items[handle] = (obj, size)
+            self._bytes += size
+            while len(self._items) > 1 and (
+                len(self._items) > self.max_items
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                old_handle, (old_obj, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+                if self._spillable(old_obj) and old_handle not in self._spilled:
+                    self._spilling[old_handle] = old_obj
+                    evicted.append((old_handle, old_obj))
+        for old_handle, old_obj in evicted:  # disk writes do not block other callers
+            try:
+                self._try_spill(old_handle, old_obj)  # dropped if it cannot be written
+            finally:
+                with self._lock:
+                    self._spilling.pop(old_handle, None)
+        return handle
+
+    def get(self, handle: str) -> Any:
+        with self._lock:
+            if handle in self._items:
+                self._items.move_to_end(handle)
+                return self._items[handle][0]
+            if handle in self._spilling:
+                return self._spilling[handle]
+            if handle in self._spilled:
+                self._spilled.move_to_end(handle)
+        if self.spill_dir and os.path.exists(self._path(handle)):
+            return pd.read_parquet(self._path(handle), engine="pyarrow", memory_map=True)
+        raise KeyError(f"Artifact {handle} not found or already evicted.")
+
+    def __contains__(self, handle: str) -> bool:
+        with self._lock:
+            if handle in self._items or handle in self._spilling:
+                return True
+        return bool(self.spill_dir) and os.path.exists(self._path(handle))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory taken by the artifacts held in memory."""
+        return self._bytes
+
+    def clear(self):
+        """Drop the artifacts held in memory and delete the files spilled by this store."""
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+            spilled, self._spilled, self._spilled_bytes = list(self._spilled), OrderedDict(), 0
+        for handle in spilled:
+            try:
+                os.remove(self._path(handle))
+            except FileNotFoundError:
+                pass
+
+
+def resolve_artifact(value: Any) -> Any:
+    """The stored object if `value` is the handle of an artifact, otherwise `value` itself."""
+    if isinstance(value, str) and HANDLE_PATTERN.match(value) and value in artifact_store:
+        return artifact_store.get(value)
+    return value
+
+
+def put_image(fig, prefix: str = "img") -> str:
+    """Store a matplotlib figure as png bytes, returns its handle."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return artifact_store.put({"mime": "image/png", "data": buffer.getvalue()}, prefix)
+
+
+def image_source(value: Any) -> Any:
+    """A file-like object for a stored image (handle or resolved), a path is returned as is."""
+    value = resolve_artifact(value)
+    if isinstance(value, dict) and "data" in value:
+        value = value["data"]
+    return io.BytesIO(value) if isinstance(value, bytes) else value
+
+
+# FINROBOT_ARTIFACT_DIR=.artifacts enables the on-disk tier of the process-wide store,
+# FINROBOT_ARTIFACT_MB bounds the memory it takes (512 by default)
+artifact_store = ArtifactStore(
+    spill_dir=os.environ.get("FINROBOT_ARTIFACT_DIR"),
+    max_bytes=int(float(os.environ.get("FINROBOT_ARTIFACT_MB", 512)) * 1024 * 1024),
+)
@@ -0,0 +1,248 @@
+"""
+Run one agent workflow per input concurrently, e.g. a research report for every ticker of a
+watchlist. Results are appended to a JSON lines file as items complete; the file is also the
+checkpoint, running the same batch again only runs the items that did not complete.
+
+    python -m finrobot.batch \\
+        --task "Write an annual report based on {symbol}'s 2023 10-k report in report/{symbol}." \\
+        --inputs watchlist.txt --output results.jsonl \\
+        --agent Expert_Investor --workflow shadow --workers 4 \\
+        --oai-config OAI_CONFIG_LIST --model gpt-4-0125-preview --api-keys config_api_keys
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import redirect_stdout, nullcontext
+from typing import Any, Callable, Dict, List
+
+from .ratelimit import rate_limits
+
+
+def item_id(item: Dict[str, Any]) -> str:
+    """The "id" of an input, or a digest of its fields."""
+    if "id" in item:
+        return str(item["id"])
+    text = json.dumps(item, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def load_inputs(path: str, field: str = "symbol") -> List[Dict[str, Any]]:
+    """Inputs from a .json list, .jsonl, .csv (one dict per row) or text file (one `field` per line)."""
+    with open(path, "r") as f:
+        if path.endswith(".json"):
+            items = json.load(f)
+        elif path.endswith(".jsonl"):
+            items = [json.loads(line) for line in f if line.strip()]
+        elif path.endswith(".csv"):
+            items = list(csv.DictReader(f))
+        else:
+            items = [line.strip() for line in f if line.strip()]
+    return [item if isinstance(item, dict) else {field: item} for item in items]
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """Latest result per item id of a results file, an empty dict if it does not exist."""
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # line cut by a crash
+            results[record["id"]] = record
+    return results
+
+
+def run_batch(
+    task: str,
+    inputs: List[Dict[str, Any] | str],
+    workflow: Callable[[Dict[str, Any]], Any],
+    output_path: str,
+    max_workers: int = 4,
+    rate_limit_config: Dict[str, Dict[str, Any]] | None = None,
+    input_field: str = "symbol",
+    **chat_kwargs,
+) -> List[Dict[str, Any]]:
+    """
+    Run `workflow(item).chat(task.format(**item), **chat_kwargs)` for every input.
+
+    Args:
+        task: message template, formatted with the fields of each input.
+        inputs: dicts, or strings used as the `input_field` of the template.
+        workflow: builds a fresh workflow (e.g. SingleAssistantShadow) for an input,
+            workflows are not shared between concurrent items.
+        output_path: JSON lines results file, one record per finished item with its id,
+            input, answer, reason, usage, seconds and error. Items already completed in
+            this file are skipped, failed ones are run again.
+        max_workers: items run concurrently.
+        rate_limit_config: per-provider limits shared by all items, see
+            finrobot.ratelimit.DEFAULT_RATE_LIMITS. They replace the limits of the data
+            source clients, a request is counted once.
+
+    Returns the records of all inputs, in input order.
+    """
+    items = [item if isinstance(item, dict) else {input_field: item} for item in inputs]
+    done = {
+        id: record
+        for id, record in load_results(output_path).items()
+        if record.get("error") is None
+    }
+    pending = list(
+        {item_id(item): item for item in items if item_id(item) not in done}.values()
+    )
+    print(
+        f"{len(items)} items, {len(items) - len(pending)} already completed in {output_path}.",
+        file=sys.stderr,
+    )
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    lock = threading.Lock()
+
+    def run_item(item):
+        start = time.time()
+        record = {"id": item_id(item), "input": item}
+        try:
+            result = workflow(item).chat(task.format(**item), **chat_kwargs)
+            record.update(
+                answer=getattr(result, "answer", result),
+                reason=getattr(result, "reason", "completed"),
+                usage=getattr(result, "usage", {}),
+                error=None,
+            )
+        except Exception as e:
+            record.update(answer=None, reason="error", usage={}, error=repr(e))
+        record["seconds"] = round(time.time() - start, 3)
+        with lock, open(output_path, "a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return record
+
+    with rate_limits(rate_limit_config), ThreadPoolExecutor(max_workers) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, run_item, item)
+            for item in pending
+        ]
+        try:
+            for count, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                status = record["error"] or record["reason"]
+                print(
+                    f"[{count}/{len(pending)}] {record['id']} {status} in {record['seconds']}s",
+                    file=sys.stderr,
+                )
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            print(
+                f"Interrupted, waiting for the running items. Completed items are in {output_path}.",
+                file=sys.stderr,
+            )
+            raise
+
+    results = load_results(output_path)
+    return [results.get(item_id(item)) for item in items]
+
+
+def _workflow_factory(args) -> Callable[[Dict[str, Any]], Any]:
+    import autogen
+    from .agents.workflow import SingleAssistant, SingleAssistantShadow
+
+    llm_config = {
+        "config_list": autogen.config_list_from_json(
+            args.oai_config,
+            filter_dict={"model": [args.model]} if args.model else None,
+        ),
+        "timeout": 120,
+        "temperature": 0,
+    }
+    workflow_cls = {"single": SingleAssistant, "shadow": SingleAssistantShadow}[
+        args.workflow
+    ]
+    budget = json.loads(args.budget) if args.budget else None
+
+    def workflow(item):
+        return workflow_cls(
+            args.agent,
+            llm_config,
+            max_consecutive_auto_reply=args.max_auto_reply,
+            human_input_mode="NEVER",
+            budget=budget,
+            checkpoint_dir=args.checkpoint_dir,
+        )
+
+    return workflow
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m finrobot.batch",
+        description="Run an agent workflow for every input of a list, concurrently.",
+    )
+    task = parser.add_mutually_exclusive_group(required=True)
+    task.add_argument("--task", help="message template, e.g. 'Analyze {symbol}'")
+    task.add_argument("--task-file", help="file containing the message template")
+    parser.add_argument("--inputs", required=True, help=".json, .jsonl, .csv or text file")
+    parser.add_argument("--field", default="symbol", help="template field of text inputs")
+    parser.add_argument("--output", required=True, help="JSON lines results / checkpoint")
+    parser.add_argument("--agent", required=True, help="name in the agent library")
+    parser.add_argument("--workflow", choices=["single", "shadow"], default="single")
+    parser.add_argument("--oai-config", default="OAI_CONFIG_LIST")
+    parser.add_argument("--model", help="model of the OAI config list to use")
+    parser.add_argument("--api-keys", help="JSON file of data source API keys")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate-limits", help="JSON file of per-provider limits")
+    parser.add_argument("--budget", help='per-item budget, e.g. \'{"max_seconds": 600}\'')
+    parser.add_argument("--max-turns", type=int)
+    parser.add_argument(
+        "--max-auto-reply", type=int, default=10, help="consecutive auto replies per item"
+    )
+    parser.add_argument(
+        "--checkpoint-dir", help="journal runs there, failed items resume on the next run"
+    )
+    parser.add_argument("--quiet", action="store_true", help="hide the conversations")
+    args = parser.parse_args(argv)
+
+    if args.api_keys:
+        from .utils import register_keys_from_json
+
+        register_keys_from_json(args.api_keys)
+    rate_limit_config = None
+    if args.rate_limits:
+        with open(args.rate_limits) as f:
+            rate_limit_config = json.load(f)
+    if args.task_file:
+        with open(args.task_file) as f:
+            args.task = f.read()
+    chat_kwargs = {"max_turns": args.max_turns} if args.max_turns else {}
+
+    with open(os.devnull, "w") if args.quiet else nullcontext() as devnull, redirect_stdout(
+        devnull or sys.stdout
+    ):
+        records = run_batch(
+            args.task,
+            load_inputs(args.inputs, args.field),
+            _workflow_factory(args),
+            args.output,
+            max_workers=args.workers,
+            rate_limit_config=rate_limit_config,
+            input_field=args.field,
+            **chat_kwargs,
+        )
+    failed = sum(1 for r in records if r is None or r.get("error"))
+    print(f"{len(records) - failed} completed, {failed} failed.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
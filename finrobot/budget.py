@@ -0,0 +1,143 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+
+_current_budget = contextvars.ContextVar("finrobot_run_budget", default=None)
+
+TOOL_REFUSAL = (
+    "Not executed: the tool call budget of this run is exhausted. "
+    "Answer with the information gathered so far."
+)
+
+
+class BudgetExceeded(Exception):
+    """Raised before an LLM call once a limit of the run budget is reached."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Run budget exhausted: {reason}")
+        self.reason = reason
+
+
+class RunBudget:
+    """
+    Limits of a single workflow run. Usage is charged by the instrumented agents (LLM calls,
+    tokens) and the registered tools; all limits are optional.
+
+    - max_seconds / max_tokens / max_llm_calls: checked before every LLM call, the run is
+      stopped with BudgetExceeded once one of them is reached.
+    - max_tool_calls: further tool calls are refused and the agent is asked to answer with
+      what it has. If it keeps calling tools, the run is stopped at its next LLM call.
+    """
+
+    def __init__(
+        self,
+        max_seconds: float | None = None,
+        max_tokens: int | None = None,
+        max_llm_calls: int | None = None,
+        max_tool_calls: int | None = None,
+    ):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_llm_calls = max_llm_calls
+        self.max_tool_calls = max_tool_calls
+        self.start_time = time.monotonic()
+        self.tokens = 0
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.refused_tool_calls = 0
+        self.reason = None  # first limit reached
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self) -> float:
+        return time.monotonic() - self.start_time
+
+    def remaining_seconds(self) -> float | None:
+        if self.max_seconds is None:
+            return None
+        return max(self.max_seconds - self.seconds, 0)
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "seconds": round(self.seconds, 3),
+            "tokens": self.tokens,
+            "llm_calls": self.llm_calls,
+            "tool_calls": self.tool_calls,
+        }
+
+    def _stop(self, reason: str):
+        with self._lock:
+            self.reason = self.reason or reason
+        raise BudgetExceeded(reason)
+
+    def check_llm_call(self):
+        if self.max_seconds is not None and self.seconds >= self.max_seconds:
+            self._stop("max_seconds")
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            self._stop("max_tokens")
+        if self.max_llm_calls is not None and self.llm_calls >= self.max_llm_calls:
+            self._stop("max_llm_calls")
+        if self.refused_tool_calls > 1:
+            self._stop("max_tool_calls")
+
+    def charge_llm_call(self, tokens: int = 0):
+        with self._lock:
+            self.llm_calls += 1
+            self.tokens += tokens
+
+    def charge_tool_call(self) -> str | None:
+        """Count a tool call, or return the refusal sent back instead of running it."""
+        with self._lock:
+            if self.max_tool_calls is None or self.tool_calls < self.max_tool_calls:
+                self.tool_calls += 1
+                return None
+            self.refused_tool_calls += 1
+            self.reason = self.reason or "max_tool_calls"
+        return TOOL_REFUSAL
+
+    @contextmanager
+    def activate(self):
+        token = _current_budget.set(self)
+        try:
+            yield self
+        finally:
+            _current_budget.reset(token)
+
+
+def get_budget() -> RunBudget | None:
+    return _current_budget.get()
+
+
+@dataclass
+class RunResult:
+    """
+    Outcome of a workflow run. `reason` is "completed" or the budget limit that stopped
+    the run ("max_seconds", "max_tokens", "max_llm_calls", "max_tool_calls").
+    """
+
+    answer: str
+    reason: str
+    usage: Dict[str, Any] = field(default_factory=dict)
+    chat_history: List[Dict] = field(default_factory=list)
+
+
+def partial_answer(messages: List[Dict], user_name: str) -> str:
+    """
+    Best answer of a stopped run: the last text message of the agents in the conversation,
+    or the last tool result if they only called tools.
+    """
+    for include_tools in [False, True]:
+        for m in reversed(messages):
+            is_tool = m.get("role") == "tool"
+            if is_tool != include_tools or (m.get("name") == user_name and not is_tool):
+                continue
+            content = m.get("content")
+            if not isinstance(content, str) or TOOL_REFUSAL in content:
+                continue
+            if content.replace("TERMINATE", "").strip():
+                return content.replace("TERMINATE", "").strip()
+    return ""
@@ -1,14 +1,25 @@
+import importlib
 import importlib.util
 
-from .finnhub_utils import FinnHubUtils
-from .yfinance_utils import YFinanceUtils
-from .fmp_utils import FMPUtils
-from .sec_utils import SECUtils
-from .reddit_utils import RedditUtils
-
+# The utils are imported on first access, each of them pulls in its API client.
+_modules = {
+    "FinnHubUtils": ".finnhub_utils",
+    "YFinanceUtils": ".yfinance_utils",
+    "FMPUtils": ".fmp_utils",
+    "SECUtils": ".sec_utils",
+    "RedditUtils": ".reddit_utils",
+}
 
 __all__ = ["FinnHubUtils", "YFinanceUtils", "FMPUtils", "SECUtils"]
 
 if importlib.util.find_spec("finnlp") is not None:
-    from .finnlp_utils import FinNLPUtils
+    _modules["FinNLPUtils"] = ".finnlp_utils"
     __all__.append("FinNLPUtils")
+
+
+def __getattr__(name):
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_modules[name], __name__), name)
+    globals()[name] = value
+    return value
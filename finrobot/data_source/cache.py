@@ -0,0 +1,67 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Thread-safe cache of data source responses, bounded to `maxsize` entries (least recently
+    used first out) that expire `ttl` seconds after they were loaded.
+
+    `get_or_load` has stampede protection: concurrent callers missing the same key wait for
+    a single load instead of all calling the API. Errors are raised to every waiting caller
+    and not cached.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float | None = 900):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+        self._items = OrderedDict()  # key -> (expires, value)
+        self._loading = {}  # key -> Future of the load in progress
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._items.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            future = self._loading.get(key)
+            loading = future is None
+            if loading:
+                future = self._loading[key] = Future()
+                self.stats["misses"] += 1
+        if not loading:
+            return future.result()
+
+        try:
+            value = load()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            del self._loading[key]
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -1,13 +1,85 @@
 import os
+import time
 import finnhub
+import requests
+import threading
 import pandas as pd
 import json
 import random
 from typing import Annotated
-from collections import defaultdict
 from functools import wraps
 from datetime import datetime
 from ..utils import decorate_all_methods, save_output, SavePathType
+from ..ratelimit import get_rate_limiter, RateLimiter, DEFAULT_RATE_LIMITS
+from .cache import TTLCache
+
+
+class PooledFinnhubClient(finnhub.Client):
+    """
+    finnhub.Client for concurrent use: requests share a pool of keep-alive connections,
+    wait for a token of the plan's per-minute quota (the "finnhub" limiter of rate_limits()
+    if set, DEFAULT_RATE_LIMITS["finnhub"] otherwise), and are retried with exponential
+    backoff (or the server's Retry-After) on 429.
+    """
+
+    max_retries = 5
+
+    def __init__(self, api_key, pool_size: int = 16, **limits):
+        super().__init__(api_key)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self.limiter = RateLimiter(**limits)
+
+    def _request(self, method, path, **kwargs):
+        # one limiter per request, a batch's shared one replaces the client's own
+        limiter = get_rate_limiter("finnhub") or self.limiter
+        for attempt in range(self.max_retries + 1):
+            try:
+                with limiter.limit():
+                    return super()._request(method, path, **kwargs)
+            except finnhub.FinnhubAPIException as e:
+                if e.status_code != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = e.response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else 2**attempt
+                time.sleep(delay + random.random())
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_finnhub_client(api_key: str | None = None) -> PooledFinnhubClient:
+    """The process-wide client of an API key (FINNHUB_API_KEY by default), safe to share between threads."""
+    api_key = api_key or os.environ["FINNHUB_API_KEY"]
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = PooledFinnhubClient(api_key, **DEFAULT_RATE_LIMITS["finnhub"])
+        return _clients[api_key]
+
+
+# company_basic_financials payloads, shared by get_basic_financials and its history
+_basic_financials = TTLCache(maxsize=64, ttl=60 * 60)
+
+
+def _basic_financials_payload(symbol: str) -> dict:
+    return _basic_financials.get_or_load(
+        symbol.upper(),
+        lambda: get_finnhub_client().company_basic_financials(symbol, "all"),
+    )
+
+
+def _series_frame(series: dict) -> pd.DataFrame:
+    """Metric series of a payload ({metric: [{"period", "v"}]}) as one frame, latest period first."""
+    if not series:
+        return pd.DataFrame()
+    columns = {}
+    for metric, values in series.items():
+        column = pd.DataFrame(values, columns=["period", "v"]).set_index("period")["v"]
+        # a period reported twice (e.g. restated) keeps its last value, concat needs unique labels
+        columns[metric] = column[~column.index.duplicated(keep="last")]
+    frame = pd.concat(columns, axis=1)
+    return frame.sort_index(ascending=False)
 
 
 def init_finnhub_client(func):
@@ -20,8 +92,7 @@ def init_finnhub_client(func):
             )
             return None
         else:
-            finnhub_client = finnhub.Client(api_key=os.environ["FINNHUB_API_KEY"])
-            print("Finnhub client initialized")
+            finnhub_client = get_finnhub_client()
             return func(*args, **kwargs)
 
     # wrapper.__annotations__ = func.__annotations__
@@ -113,19 +184,15 @@ class FinnHubUtils:
         if freq not in ["annual", "quarterly"]:
             return f"Invalid reporting frequency {freq}. Please specify either 'annual' or 'quarterly'."
 
-        basic_financials = finnhub_client.company_basic_financials(symbol, "all")
+        basic_financials = _basic_financials_payload(symbol)
         if not basic_financials["series"]:
             return f"Failed to find basic financials for symbol {symbol} from finnhub! Try a different symbol."
 
-        output_dict = defaultdict(dict)
-        for metric, value_list in basic_financials["series"][freq].items():
-            if selected_columns and metric not in selected_columns:
-                continue
-            for value in value_list:
-                if value["period"] >= start_date and value["period"] <= end_date:
-                    output_dict[metric].update({value["period"]: value["v"]})
-
-        financials_output = pd.DataFrame(output_dict)
+        series = _series_frame(basic_financials["series"].get(freq, {}))
+        if selected_columns:
+            series = series.loc[:, series.columns.isin(selected_columns)]
+        in_period = (series.index >= start_date) & (series.index <= end_date)
+        financials_output = series.loc[in_period].dropna(how="all").dropna(axis=1, how="all")
         financials_output = financials_output.rename_axis(index="date")
         save_output(financials_output, "basic financials", save_path=save_path)
 
@@ -141,20 +208,18 @@ class FinnHubUtils:
         """
         get latest basic financials for a designated company
         """
-        basic_financials = finnhub_client.company_basic_financials(symbol, "all")
+        basic_financials = _basic_financials_payload(symbol)
         if not basic_financials["series"]:
             return f"Failed to find basic financials for symbol {symbol} from finnhub! Try a different symbol."
 
-        output_dict = basic_financials["metric"]
-        for metric, value_list in basic_financials["series"]["quarterly"].items():
-            value = value_list[0]
-            output_dict.update({metric: value["v"]})
-
-        for k in output_dict.keys():
-            if selected_columns and k not in selected_columns:
-                output_dict.pop(k)
+        # latest quarterly value of every series, over the current metrics
+        quarterly = _series_frame(basic_financials["series"].get("quarterly", {}))
+        latest = quarterly.bfill().iloc[0].dropna() if len(quarterly) else pd.Series()
+        output = pd.Series({**basic_financials["metric"], **latest.to_dict()}, dtype=object)
+        if selected_columns:
+            output = output[output.index.isin(selected_columns)]
 
-        return json.dumps(output_dict, indent=2)
+        return json.dumps(output.to_dict(), indent=2)
 
 
 if __name__ == "__main__":
@@ -1,26 +1,179 @@
 import os
+import time
+import random
 import requests
+import threading
+import contextvars
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from ..utils import decorate_all_methods, get_next_weekday
+from ..ratelimit import get_rate_limiter, RateLimiter, DEFAULT_RATE_LIMITS
+from .cache import TTLCache
 
 # from finrobot.utils import decorate_all_methods, get_next_weekday
 from functools import wraps
-from typing import Annotated, List
+from typing import Annotated, Any, Dict, List, Tuple
+
+
+class FMPRequestError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"Failed to retrieve data: {status_code}")
+        self.status_code = status_code
+
+
+class DateSeries:
+    """
+    Values of dated records sorted by date, for nearest-date and window lookups by binary
+    search (numpy.searchsorted) instead of scans over the records.
+    """
+
+    def __init__(self, dates: List[str], values: List[Any]):
+        dates = np.array([d[:10] for d in dates], dtype="datetime64[D]")
+        order = np.argsort(dates, kind="stable")
+        self.dates = dates[order]
+        self.values = np.array(values, dtype=object)[order]
+
+    @classmethod
+    def from_records(
+        cls, records: List[Dict[str, Any]], value_field: str, date_field: str = "date"
+    ) -> "DateSeries":
+        records = [r for r in records or [] if r.get(date_field)]
+        return cls([r[date_field] for r in records], [r.get(value_field) for r in records])
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def nearest(self, date: str) -> Any:
+        """Value of the record closest to `date` (the later one on ties), None if empty."""
+        if not len(self):
+            return None
+        date = np.datetime64(date[:10], "D")
+        after = int(np.searchsorted(self.dates, date, side="left"))
+        if after == len(self) or (
+            after > 0 and date - self.dates[after - 1] < self.dates[after] - date
+        ):
+            return self.values[after - 1]
+        return self.values[after]
+
+    def window(self, start: str, end: str) -> List[Any]:
+        """Values of the records dated from `start` to `end`, both included."""
+        first = np.searchsorted(self.dates, np.datetime64(start[:10], "D"), side="left")
+        last = np.searchsorted(self.dates, np.datetime64(end[:10], "D"), side="right")
+        return list(self.values[first:last])
+
+
+class FMPClient:
+    """
+    Client of the FMP API shared by all FMPUtils methods: one pooled session, requests
+    limited to the plan's quota (the "fmp" limiter of rate_limits() if set,
+    DEFAULT_RATE_LIMITS["fmp"] otherwise) and retried on 429, and JSON
+    responses cached per endpoint with the TTLs of ENDPOINT_TTLS. Identical requests in
+    flight at the same time are sent once, `get_many` sends independent ones concurrently.
+    """
+
+    BASE_URL = "https://financialmodelingprep.com/api"
+    # seconds, by endpoint (e.g. "income-statement" of v3/income-statement/AAPL)
+    ENDPOINT_TTLS = {
+        "price-target": 6 * 60 * 60,
+        "historical-market-capitalization": 24 * 60 * 60,
+        "sec_filings": 24 * 60 * 60,
+    }
+    DEFAULT_TTL = 12 * 60 * 60  # statements, ratios and key metrics change quarterly
+    max_retries = 3
+
+    def __init__(self, api_key: str, pool_size: int = 32, max_workers: int = 8, **limits):
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.limiter = RateLimiter(**limits)
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def _cache(self, endpoint: str) -> TTLCache:
+        with self._lock:
+            if endpoint not in self._caches:
+                ttl = self.ENDPOINT_TTLS.get(endpoint, self.DEFAULT_TTL)
+                self._caches[endpoint] = TTLCache(maxsize=256, ttl=ttl)
+            return self._caches[endpoint]
+
+    def _request(self, path: str, params: Dict[str, Any]) -> Any:
+        # one limiter per request, a batch's shared one replaces the client's own
+        limiter = get_rate_limiter("fmp") or self.limiter
+        for attempt in range(self.max_retries + 1):
+            with limiter.limit():
+                response = self.session.get(
+                    f"{self.BASE_URL}/{path}",
+                    params={**params, "apikey": self.api_key},
+                    timeout=30,
+                )
+            if response.status_code == 429 and attempt < self.max_retries:
+                time.sleep(2**attempt + random.random())
+                continue
+            if response.status_code != 200:
+                raise FMPRequestError(response.status_code)
+            return response.json()
+
+    def get(self, path: str, **params) -> Any:
+        """JSON response of `path` (e.g. "v3/key-metrics/AAPL"), cached."""
+        endpoint = path.split("/")[1] if "/" in path else path
+        key = (path, tuple(sorted(params.items())))
+        return self._cache(endpoint).get_or_load(key, lambda: self._request(path, params))
+
+    def get_series(
+        self, path: str, value_field: str, date_field: str = "date", **params
+    ) -> DateSeries:
+        """The response of `path` as a DateSeries of `value_field`, cached like the response."""
+        endpoint = path.split("/")[1] if "/" in path else path
+        key = ("series", path, value_field, date_field, tuple(sorted(params.items())))
+        return self._cache(endpoint).get_or_load(
+            key,
+            lambda: DateSeries.from_records(self.get(path, **params), value_field, date_field),
+        )
+
+    def get_many(
+        self, calls: List[Tuple[str, Dict[str, Any]]], max_workers: int | None = None
+    ) -> List[Any]:
+        """Responses of several (path, params) requests, sent concurrently."""
+        max_workers = min(max_workers or self.max_workers, self.pool_size)
+        with ThreadPoolExecutor(max(1, min(max_workers, len(calls)))) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, self.get, path, **params)
+                for path, params in calls
+            ]
+            return [f.result() for f in futures]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_fmp_client(api_key: str | None = None) -> FMPClient:
+    """The process-wide client of an API key (FMP_API_KEY by default)."""
+    api_key = api_key or os.environ["FMP_API_KEY"]
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = FMPClient(api_key, **DEFAULT_RATE_LIMITS["fmp"])
+        return _clients[api_key]
 
 
 def init_fmp_api(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        global fmp_api_key
+        global fmp_client
         if os.environ.get("FMP_API_KEY") is None:
             print("Please set the environment variable FMP_API_KEY to use the FMP API.")
             return None
         else:
-            fmp_api_key = os.environ["FMP_API_KEY"]
-            print("FMP api key found successfully.")
-            return func(*args, **kwargs)
+            fmp_client = get_fmp_client()
+            try:
+                return func(*args, **kwargs)
+            except FMPRequestError as e:
+                return str(e)
 
     return wrapper
 
@@ -33,32 +186,19 @@ class FMPUtils:
         date: Annotated[str, "date of the target price, should be 'yyyy-mm-dd'"],
     ) -> str:
         """Get the target price for a given stock on a given date"""
-        # API URL
-        url = f"https://financialmodelingprep.com/api/v4/price-target?symbol={ticker_symbol}&apikey={fmp_api_key}"
-
-        # 发送GET请求
-        price_target = "Not Given"
-        response = requests.get(url)
-
-        # 确保请求成功
-        if response.status_code == 200:
-            # 解析JSON数据
-            data = response.json()
-            est = []
-
-            date = datetime.strptime(date, "%Y-%m-%d")
-            for tprice in data:
-                tdate = tprice["publishedDate"].split("T")[0]
-                tdate = datetime.strptime(tdate, "%Y-%m-%d")
-                if abs((tdate - date).days) <= 999:
-                    est.append(tprice["priceTarget"])
-
-            if est:
-                price_target = f"{np.min(est)} - {np.max(est)} (md. {np.median(est)})"
-            else:
-                price_target = "N/A"
+        targets = fmp_client.get_series(
+            "v4/price-target", "priceTarget", "publishedDate", symbol=ticker_symbol
+        )
+        date = datetime.strptime(date, "%Y-%m-%d")
+        est = targets.window(
+            (date - timedelta(days=999)).strftime("%Y-%m-%d"),
+            (date + timedelta(days=999)).strftime("%Y-%m-%d"),
+        )
+
+        if est:
+            price_target = f"{np.min(est)} - {np.max(est)} (md. {np.median(est)})"
         else:
-            return f"Failed to retrieve data: {response.status_code}"
+            price_target = "N/A"
 
         return price_target
 
@@ -71,30 +211,20 @@ class FMPUtils:
     ) -> str:
         """Get the url and filing date of the 10-K report for a given stock and year"""
 
-        url = f"https://financialmodelingprep.com/api/v3/sec_filings/{ticker_symbol}?type=10-k&page=0&apikey={fmp_api_key}"
-
-        # 发送GET请求
-        filing_url = None
-        response = requests.get(url)
-
-        # 确保请求成功
-        if response.status_code == 200:
-            # 解析JSON数据
-            data = response.json()
-            # print(data)
-            if fyear == "latest":
-                filing_url = data[0]["finalLink"]
-                filing_date = data[0]["fillingDate"]
-            else:
-                for filing in data:
-                    if filing["fillingDate"].split("-")[0] == fyear:
-                        filing_url = filing["finalLink"]
-                        filing_date = filing["fillingDate"]
-                        break
-
-            return f"Link: {filing_url}\nFiling Date: {filing_date}"
+        filing_url = filing_date = None
+        data = fmp_client.get(f"v3/sec_filings/{ticker_symbol}", type="10-k", page=0)
+        # print(data)
+        if fyear == "latest":
+            filing_url = data[0]["finalLink"]
+            filing_date = data[0]["fillingDate"]
         else:
-            return f"Failed to retrieve data: {response.status_code}"
+            for filing in data:
+                if filing["fillingDate"].split("-")[0] == fyear:
+                    filing_url = filing["finalLink"]
+                    filing_date = filing["fillingDate"]
+                    break
+
+        return f"Link: {filing_url}\nFiling Date: {filing_date}"
 
     def get_historical_market_cap(
         ticker_symbol: Annotated[str, "ticker symbol"],
@@ -102,20 +232,15 @@ class FMPUtils:
     ) -> str:
         """Get the historical market capitalization for a given stock on a given date"""
         date = get_next_weekday(date).strftime("%Y-%m-%d")
-        url = f"https://financialmodelingprep.com/api/v3/historical-market-capitalization/{ticker_symbol}?limit=100&from={date}&to={date}&apikey={fmp_api_key}"
-
-        # 发送GET请求
-        mkt_cap = None
-        response = requests.get(url)
-
-        # 确保请求成功
-        if response.status_code == 200:
-            # 解析JSON数据
-            data = response.json()
-            mkt_cap = data[0]["marketCap"]
-            return mkt_cap
-        else:
-            return f"Failed to retrieve data: {response.status_code}"
+        # one request per symbol and year, later dates of the year are looked up locally
+        market_caps = fmp_client.get_series(
+            f"v3/historical-market-capitalization/{ticker_symbol}",
+            "marketCap",
+            limit=400,
+            **{"from": f"{date[:4]}-01-01", "to": f"{date[:4]}-12-31"},
+        )
+        mkt_cap = market_caps.nearest(date)
+        return mkt_cap if mkt_cap is not None else "N/A"
 
     def get_historical_bvps(
         ticker_symbol: Annotated[str, "ticker symbol"],
@@ -123,53 +248,37 @@ class FMPUtils:
     ) -> str:
         """Get the historical book value per share for a given stock on a given date"""
         # 从FMP API获取历史关键财务指标数据
-        url = f"https://financialmodelingprep.com/api/v3/key-metrics/{ticker_symbol}?limit=40&apikey={fmp_api_key}"
-        response = requests.get(url)
-        data = response.json()
+        bvps = fmp_client.get_series(
+            f"v3/key-metrics/{ticker_symbol}", "bookValuePerShare", limit=40
+        )
 
-        if not data:
+        if not len(bvps):
             return "No data available"
 
         # 找到最接近目标日期的数据
-        closest_data = None
-        min_date_diff = float("inf")
-        target_date = datetime.strptime(target_date, "%Y-%m-%d")
-        for entry in data:
-            date_of_data = datetime.strptime(entry["date"], "%Y-%m-%d")
-            date_diff = abs(target_date - date_of_data).days
-            if date_diff < min_date_diff:
-                min_date_diff = date_diff
-                closest_data = entry
-
-        if closest_data:
-            return closest_data.get("bookValuePerShare", "No BVPS data available")
-        else:
-            return "No close date data found"
-        
+        value = bvps.nearest(target_date)
+        return value if value is not None else "No BVPS data available"
+
     def get_financial_metrics(
         ticker_symbol: Annotated[str, "ticker symbol"],
         years: Annotated[int, "number of the years to search from, default to 4"] = 4
     ) -> pd.DataFrame:
         """Get the financial metrics for a given stock for the last 'years' years"""
-        # Base URL setup for FMP API
-        base_url = "https://financialmodelingprep.com/api/v3"
         # Create DataFrame
         df = pd.DataFrame()
 
+        # Requesting data from the API, the three endpoints concurrently. Key metrics are
+        # requested like get_historical_bvps does, so that one response serves both
+        income_data, key_metrics_data, ratios_data = fmp_client.get_many(
+            [
+                (f"v3/income-statement/{ticker_symbol}", {"limit": years}),
+                (f"v3/key-metrics/{ticker_symbol}", {"limit": max(years, 40)}),
+                (f"v3/ratios/{ticker_symbol}", {"limit": years}),
+            ]
+        )
+
         # Iterate over the last 'years' years of data
         for year_offset in range(years):
-            # Construct URL for income statement and ratios for each year
-            income_statement_url = f"{base_url}/income-statement/{ticker_symbol}?limit={years}&apikey={fmp_api_key}"
-            ratios_url = (
-                f"{base_url}/ratios/{ticker_symbol}?limit={years}&apikey={fmp_api_key}"
-            )
-            key_metrics_url = f"{base_url}/key-metrics/{ticker_symbol}?limit={years}&apikey={fmp_api_key}"
-
-            # Requesting data from the API
-            income_data = requests.get(income_statement_url).json()
-            key_metrics_data = requests.get(key_metrics_url).json()
-            ratios_data = requests.get(ratios_url).json()
-
             # Extracting needed metrics for each year
             if income_data and key_metrics_data and ratios_data:
                 metrics = {
@@ -203,48 +312,60 @@ class FMPUtils:
         years: Annotated[int, "number of the years to search from, default to 4"] = 4
     ) -> dict:
         """Get financial metrics for the company and its competitors."""
-        base_url = "https://financialmodelingprep.com/api/v3"
-        all_data = {}
-
         symbols = [ticker_symbol] + competitors  # Combine company and competitors into one list
-    
-        for symbol in symbols:
-            income_statement_url = f"{base_url}/income-statement/{symbol}?limit={years}&apikey={fmp_api_key}"
-            ratios_url = f"{base_url}/ratios/{symbol}?limit={years}&apikey={fmp_api_key}"
-            key_metrics_url = f"{base_url}/key-metrics/{symbol}?limit={years}&apikey={fmp_api_key}"
-
-            income_data = requests.get(income_statement_url).json()
-            ratios_data = requests.get(ratios_url).json()
-            key_metrics_data = requests.get(key_metrics_url).json()
-
-            metrics = {}
-
-            if income_data and ratios_data and key_metrics_data:
-                for year_offset in range(years):
-                    metrics[year_offset] = {
-                        "Revenue": round(income_data[year_offset]["revenue"] / 1e6),
-                        "Revenue Growth": (
-                            "{}%".format((round(income_data[year_offset]["revenue"] - income_data[year_offset - 1]["revenue"] / income_data[year_offset - 1]["revenue"])*100,1))
-                            if year_offset > 0 else None
-                        ),
-                        "Gross Margin": round((income_data[year_offset]["grossProfit"] / income_data[year_offset]["revenue"]),2),
-                        "EBITDA Margin": round((income_data[year_offset]["ebitdaratio"]),2),
-                        "FCF Conversion": round((
-                            key_metrics_data[year_offset]["enterpriseValue"] 
-                            / key_metrics_data[year_offset]["evToOperatingCashFlow"] 
-                            / income_data[year_offset]["netIncome"]
-                            if key_metrics_data[year_offset]["evToOperatingCashFlow"] != 0 else None
-                        ),2),
-                        "ROIC":"{}%".format(round((key_metrics_data[year_offset]["roic"])*100,1)),
-                        "EV/EBITDA": round((key_metrics_data[year_offset]["enterpriseValueOverEBITDA"]),2),
-                    }
-
-            df = pd.DataFrame.from_dict(metrics, orient='index')
-            df = df.sort_index(axis=1)
-            all_data[symbol] = df
-
-        return all_data
-
+        # all requests at once, key metrics with the limit other methods use (cached)
+        responses = fmp_client.get_many(
+            [(f"v3/income-statement/{symbol}", {"limit": years}) for symbol in symbols]
+            + [(f"v3/key-metrics/{symbol}", {"limit": max(years, 40)}) for symbol in symbols],
+            max_workers=2 * len(symbols),
+        )
+        statements = {
+            symbol: (income_data[:years], key_metrics_data[:years])
+            for symbol, income_data, key_metrics_data in zip(
+                symbols, responses[: len(symbols)], responses[len(symbols) :]
+            )
+            if income_data and key_metrics_data
+        }
+        if not statements:
+            return {symbol: pd.DataFrame() for symbol in symbols}
+
+        # one row per (symbol, year offset), 0 being the latest fiscal year
+        income = pd.concat(
+            {symbol: pd.DataFrame(data[0]) for symbol, data in statements.items()},
+            names=["symbol", "year"],
+        )
+        key_metrics = pd.concat(
+            {symbol: pd.DataFrame(data[1]) for symbol, data in statements.items()},
+            names=["symbol", "year"],
+        ).reindex(income.index)
+
+        revenue = income["revenue"]
+        # growth over the prior fiscal year (the next offset), None for the oldest year fetched
+        previous_revenue = revenue.groupby(level="symbol").shift(-1)
+        revenue_growth = ((revenue / previous_revenue - 1) * 100).round(1)
+        ev_to_ocf = key_metrics["evToOperatingCashFlow"].replace(0, np.nan)
+        roic = (key_metrics["roic"] * 100).round(1)
+        metrics = pd.DataFrame(
+            {
+                "Revenue": (revenue / 1e6).round().astype("Int64"),
+                "Revenue Growth": (revenue_growth.astype(str) + "%").where(
+                    revenue_growth.notna()
+                ),
+                "Gross Margin": (income["grossProfit"] / revenue).round(2),
+                "EBITDA Margin": income["ebitdaratio"].round(2),
+                "FCF Conversion": (
+                    key_metrics["enterpriseValue"] / ev_to_ocf / income["netIncome"]
+                ).round(2),
+                "ROIC": (roic.astype(str) + "%").where(roic.notna()),
+                "EV/EBITDA": key_metrics["enterpriseValueOverEBITDA"].round(2),
+            }
+        ).sort_index(axis=1)
+        metrics = metrics.astype(object).where(metrics.notna(), None)
+
+        return {
+            symbol: metrics.loc[symbol] if symbol in statements else pd.DataFrame()
+            for symbol in symbols
+        }
 
 
 if __name__ == "__main__":
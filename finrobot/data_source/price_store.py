@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar,
+    Holiday,
+    GoodFriday,
+    USMartinLutherKingJr,
+    USPresidentsDay,
+    USMemorialDay,
+    USLaborDay,
+    USThanksgivingDay,
+    nearest_workday,
+    sunday_to_monday,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows, only threads of one process are synchronized
+    fcntl = None
+
+
+# on-disk dtypes, prices are kept as downloaded so stored and fresh reads are identical
+_DTYPES = {"Volume": np.int64}
+_DEFAULT_DTYPE = np.float64
+_EVENTS = ["Dividends", "Stock Splits", "Capital Gains"]
+
+
+class NYSECalendar(AbstractHolidayCalendar):
+    """Regular NYSE holidays (special closures are missing, they only cause refetches)."""
+
+    rules = [
+        Holiday("New Year's Day", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-06-19", observance=nearest_workday),
+        Holiday("Independence Day", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+_NYSE_SESSIONS = pd.offsets.CustomBusinessDay(calendar=NYSECalendar())
+_WEEKDAYS = pd.offsets.BDay()
+
+
+class PriceStore:
+    """
+    Local store of daily OHLCV data, one directory per symbol with one .npy file per column
+    (dates as int64 UTC nanoseconds, prices as float64), plus a meta.json recording the
+    date ranges already fetched.
+
+    `get` fetches only the parts of the requested range that are not covered yet, merges
+    them in, and answers from memory-mapped reads of the columns. Today is never recorded
+    as covered, its bar is fetched again until the day is over. Prices are adjusted as of
+    their fetch: when a fetched gap brings a new dividend or split, the whole stored range
+    of the symbol is fetched again.
+
+    Updates write a new version directory and then swap meta.json, so readers always see a
+    complete version. A symbol is locked by its threads and, with a file lock (<symbol>/.lock),
+    by other processes, and replaced versions are only removed after `keep_versions` seconds.
+    """
+
+    keep_versions = 60 * 60
+
+    def __init__(self, root: str):
+        self.root = root
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, symbol: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    @contextmanager
+    def _locked(self, symbol: str):
+        with self._lock(symbol):
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self._dir(symbol), exist_ok=True)
+            with open(os.path.join(self._dir(symbol), ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file is closed
+                yield
+
+    def _dir(self, symbol: str) -> str:
+        return os.path.join(self.root, symbol.replace("/", "_"))
+
+    def _meta(self, symbol: str) -> dict | None:
+        path = os.path.join(self._dir(symbol), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _gaps(ranges: List[List[str]], start: str, end: str) -> List[Tuple[str, str]]:
+        """Parts of [start, end) not covered by the sorted, merged `ranges`."""
+        gaps = []
+        for covered_start, covered_end in ranges:
+            if covered_end <= start:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > start:
+                gaps.append((start, covered_start))
+            start = max(start, covered_end)
+        if start < end:
+            gaps.append((start, end))
+        return gaps
+
+    @staticmethod
+    def _merge_ranges(ranges: List[List[str]]) -> List[List[str]]:
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return merged
+
+    @classmethod
+    def _covered(cls, ranges, fetched, today: str, sessions=_WEEKDAYS) -> List[List[str]]:
+        """
+        `ranges` plus the fetched gaps, up to yesterday. A gap without bars only counts when
+        it has no `sessions` (e.g. a weekend), it may be a failed download otherwise.
+        """
+        covered = []
+        for (gap_start, gap_end), part in fetched:
+            gap_end = min(gap_end, today)
+            if gap_start >= gap_end:
+                continue
+            if len(part) or cls._no_sessions(gap_start, gap_end, sessions):
+                covered.append([gap_start, gap_end])
+        return cls._merge_ranges(ranges + covered)
+
+    @staticmethod
+    def _no_sessions(start: str, end: str, sessions) -> bool:
+        last = pd.Timestamp(end) - pd.Timedelta(days=1)
+        return len(pd.date_range(start, last, freq=sessions)) == 0
+
+    @staticmethod
+    def _new_events(stored: pd.DataFrame, new: pd.DataFrame) -> bool:
+        """Whether `new` has a dividend or split after the first stored bar that is not stored."""
+        columns = [c for c in _EVENTS if c in new.columns]
+        events = new.loc[(new[columns] != 0).any(axis=1) & (new.index > stored.index[0]), columns]
+        known = stored.reindex(index=events.index, columns=columns).fillna(0)
+        return bool((events != known).any().any())
+
+    def _read(self, symbol: str, meta: dict, start: str, end: str) -> pd.DataFrame:
+        version_dir = os.path.join(self._dir(symbol), meta["version"])
+        dates = np.load(os.path.join(version_dir, "Date.npy"), mmap_mode="r")
+        bounds = pd.to_datetime([start, end]).tz_localize(meta["tz"]).as_unit("ns")
+        first, last = np.searchsorted(dates, bounds.asi8)
+        columns = {}
+        for column in meta["columns"]:
+            values = np.load(os.path.join(version_dir, f"{column}.npy"), mmap_mode="r")
+            columns[column] = np.array(values[first:last], dtype=_DTYPES.get(column, np.float64))
+        index = pd.DatetimeIndex(
+            np.array(dates[first:last]).view("datetime64[ns]"), tz="UTC", name="Date"
+        ).tz_convert(meta["tz"])
+        return pd.DataFrame(columns, index=index)
+
+    def _write_meta(self, symbol: str, meta: dict):
+        path = os.path.join(self._dir(symbol), "meta.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def _write(self, symbol: str, data: pd.DataFrame, ranges: List[List[str]], tz: str):
+        symbol_dir = self._dir(symbol)
+        version = uuid.uuid4().hex[:8]
+        version_dir = os.path.join(symbol_dir, version)
+        os.makedirs(version_dir)
+        dates = data.index.as_unit("ns").asi8 if len(data) else np.array([], np.int64)
+        np.save(os.path.join(version_dir, "Date.npy"), dates)
+        for column in data.columns:
+            values = data[column].to_numpy(dtype=_DTYPES.get(column, _DEFAULT_DTYPE))
+            np.save(os.path.join(version_dir, f"{column}.npy"), values)
+        self._write_meta(
+            symbol,
+            {"version": version, "tz": tz, "columns": list(data.columns), "ranges": ranges},
+        )
+        self._remove_versions(symbol, keep=version)
+
+    def _remove_versions(self, symbol: str, keep: str, min_age: float | None = None):
+        """Remove version directories other than `keep` older than `min_age` seconds."""
+        min_age = self.keep_versions if min_age is None else min_age
+        symbol_dir = self._dir(symbol)
+        for name in os.listdir(symbol_dir):
+            path = os.path.join(symbol_dir, name)
+            if name == keep or not os.path.isdir(path):
+                continue
+            if time.time() - os.path.getmtime(path) >= min_age:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def get(
+        self, symbol: str, start: str, end: str, fetch: Callable[[str, str], pd.DataFrame]
+    ) -> pd.DataFrame:
+        """
+        Daily bars of `symbol` in [start, end) (YYYY-mm-dd), calling `fetch(start, end)`
+        (e.g. yf.Ticker.history) for the parts that are not stored yet.
+        """
+        symbol = symbol.upper()
+        start, end = (pd.Timestamp(d).strftime("%Y-%m-%d") for d in (start, end))
+        today = date.today().isoformat()
+        sessions = _WEEKDAYS if "." in symbol else _NYSE_SESSIONS  # suffixed, not a US listing
+        with self._locked(symbol):
+            meta = self._meta(symbol)
+            ranges = meta["ranges"] if meta else []
+            gaps = self._gaps(ranges, start, end)
+            if not gaps:
+                return self._read(symbol, meta, start, end)
+
+            stored = self._read(symbol, meta, "1900-01-01", "2100-01-01") if meta else None
+            fetched = [(gap, fetch(*gap)) for gap in gaps]
+            frames = [data for _, data in fetched if len(data)]
+            if not frames:  # weekends and holidays, or a failed download
+                if meta is None:
+                    return fetched[0][1]
+                meta["ranges"] = self._covered(ranges, fetched, today, sessions)
+                self._write_meta(symbol, meta)
+                return self._read(symbol, meta, start, end)
+            new = pd.concat(frames)
+            if stored is not None and len(stored) and self._new_events(stored, new):
+                # the new dividend or split re-adjusts the stored history
+                full_start = min(start, ranges[0][0])
+                full_end = max(end, ranges[-1][1])
+                stored, ranges = None, []
+                new = fetch(full_start, full_end)
+                fetched = [((full_start, full_end), new)]
+            data = pd.concat([stored, new]) if stored is not None else new
+            data = data[~data.index.duplicated(keep="last")].sort_index()
+            events = [c for c in data.columns if c in _EVENTS or c == "Volume"]
+            data[events] = data[events].fillna(0)
+
+            ranges = self._covered(ranges, fetched, today, sessions)
+            tz = str(data.index.tz) if data.index.tz is not None else "UTC"
+            if data.index.tz is None:
+                data.index = data.index.tz_localize("UTC")
+            self._write(symbol, data, ranges, tz)
+            return self._read(symbol, self._meta(symbol), start, end)
+
+    def gc(self, min_age: float | None = None):
+        """Remove replaced versions of all symbols older than `min_age` (keep_versions) seconds."""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            meta = self._meta(name)
+            if meta is not None:
+                with self._locked(name):
+                    self._remove_versions(name, self._meta(name)["version"], min_age)
+
+    def clear(self, symbol: str | None = None):
+        """Remove the stored data of `symbol`, or of all symbols."""
+        shutil.rmtree(self._dir(symbol.upper()) if symbol else self.root, ignore_errors=True)
+
+
+_price_store = None
+_price_store_lock = threading.Lock()
+
+
+def get_price_store() -> PriceStore | None:
+    """
+    The process-wide store in FINROBOT_PRICE_STORE (e.g. ~/.cache/finrobot/prices), None when
+    it is not set: prices are then always downloaded.
+    """
+    global _price_store
+    root = os.environ.get("FINROBOT_PRICE_STORE")
+    if not root:
+        return None
+    root = os.path.expanduser(root)
+    with _price_store_lock:
+        if _price_store is None or _price_store.root != root:
+            _price_store = PriceStore(root)
+        return _price_store
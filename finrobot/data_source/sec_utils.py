@@ -1,16 +1,53 @@
 import os
 import requests
+import threading
 from sec_api import ExtractorApi, QueryApi, RenderApi
 from functools import wraps
 from typing import Annotated
 from ..utils import SavePathType, decorate_all_methods
+from ..ratelimit import rate_limited
 from ..data_source import FMPUtils
+from .cache import TTLCache
+from .section_cache import get_section_cache
 
 
-CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
 PDF_GENERATOR_API = "https://api.sec-api.io/filing-reader"
 
 
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_sec_clients(api_key: str | None = None) -> tuple:
+    """The process-wide (ExtractorApi, QueryApi, RenderApi) of an API key (SEC_API_KEY by default)."""
+    api_key = api_key or os.environ["SEC_API_KEY"]
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = (ExtractorApi(api_key), QueryApi(api_key), RenderApi(api_key))
+        return _clients[api_key]
+
+
+# 10-K urls by (ticker, fyear), resolved with FMPUtils.get_sec_report
+_filing_urls = TTLCache(maxsize=256, ttl=24 * 60 * 60)
+
+
+class FilingNotFound(Exception):
+    pass
+
+
+def _filing_url(ticker_symbol: str, fyear: str) -> str:
+    def load():
+        report = FMPUtils.get_sec_report(ticker_symbol, fyear)
+        if not isinstance(report, str) or not report.startswith("Link: "):
+            raise FilingNotFound(report)  # debug info, not cached
+        url = report[len("Link: ") :].split()[0]
+        if url == "None":
+            raise FilingNotFound(f"No 10-K report found for {ticker_symbol} in {fyear}")
+        return url
+
+    return _filing_urls.get_or_load((ticker_symbol.upper(), str(fyear)), load)
+
+
 def init_sec_api(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -19,11 +56,9 @@ def init_sec_api(func):
             print("Please set the environment variable SEC_API_KEY to use sec_api.")
             return None
         else:
-            extractor_api = ExtractorApi(os.environ["SEC_API_KEY"])
-            query_api = QueryApi(os.environ["SEC_API_KEY"])
-            render_api = RenderApi(os.environ["SEC_API_KEY"])
-            print("Sec Api initialized")
-            return func(*args, **kwargs)
+            extractor_api, query_api, render_api = get_sec_clients()
+            with rate_limited("sec"):
+                return func(*args, **kwargs)
 
     return wrapper
 
@@ -169,28 +204,19 @@ class SECUtils:
 
         # report_name = f"{self.project_dir}/10k/section_{section}.txt"
 
-        # if USE_CACHE and os.path.exists(report_name):
-        #     with open(report_name, "r") as f:
-        #         section_text = f.read()
-        # else:
-        if report_address is None:
-            report_address = FMPUtils.get_sec_report(ticker_symbol, fyear)
-            if report_address.startswith("Link: "):
-                report_address = report_address.lstrip("Link: ").split()[0]
-            else:
-                return report_address  # debug info
-
-        cache_path = os.path.join(
-            CACHE_PATH, f"sec_utils/{ticker_symbol}_{fyear}_{section}.txt"
-        )
-        if os.path.exists(cache_path):
-            with open(cache_path, "r") as f:
-                section_text = f.read()
-        else:
+        # the cache is checked first, a cached section needs no request at all
+        section_cache = get_section_cache()
+        cache_key = f"{ticker_symbol.upper()}_{fyear}_{section}"
+        section_text = section_cache.get(cache_key) if section_cache is not None else None
+        if section_text is None:
+            if report_address is None:
+                try:
+                    report_address = _filing_url(ticker_symbol, fyear)
+                except FilingNotFound as e:
+                    return str(e)  # debug info
             section_text = extractor_api.get_section(report_address, section, "text")
-            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-            with open(cache_path, "w") as f:
-                f.write(section_text)
+            if section_cache is not None:
+                section_cache.put(cache_key, section_text)
 
         if save_path:
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
@@ -0,0 +1,266 @@
+"""
+Content-addressed cache of extracted filing sections (SECUtils.get_10k_section).
+
+    python -m finrobot.data_source.section_cache stats
+    python -m finrobot.data_source.section_cache gc --max-mb 256
+"""
+
+import os
+import time
+import zlib
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import threading
+import importlib.util
+from typing import Any, Dict, List
+
+# entries are compressed with zstd when zstandard is installed, with zlib otherwise
+if importlib.util.find_spec("zstandard") is not None:
+    import zstandard
+else:
+    zstandard = None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, digest TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access);
+"""
+
+
+def _compress(data: bytes) -> tuple:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed, the entry cannot be read.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class SectionCache:
+    """
+    Texts by key (e.g. "AAPL_2023_7"), stored once per content under <root>/objects/ as
+    compressed files named by their sha256, with a sqlite index (<root>/index.sqlite) of
+    keys, sizes and last accesses.
+
+    Files are written to a temporary name and renamed, index updates are sqlite
+    transactions, so concurrent threads and processes can share a cache. Once the
+    compressed size exceeds `max_bytes`, the least recently used contents are evicted.
+    """
+
+    access_resolution = 60  # seconds, reads update the last access at most this often
+
+    def __init__(self, root: str, max_bytes: int | None = 512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0}
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per thread, sqlite locks the index between processes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    def get(self, key: str) -> str | None:
+        """The text stored under `key`, None if there is none."""
+        db = self._connect()
+        row = db.execute(
+            "SELECT digest, codec, last_access FROM entries JOIN blobs USING (digest)"
+            " WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is not None:
+            digest, codec, last_access = row
+            try:
+                with open(self._path(digest), "rb") as f:
+                    text = _decompress(codec, f.read()).decode("utf-8")
+            except FileNotFoundError:  # evicted by another process in the meantime
+                text = None
+            if text is not None:
+                if time.time() - last_access > self.access_resolution:
+                    with db:
+                        db.execute(
+                            "UPDATE blobs SET last_access = ? WHERE digest = ?",
+                            (time.time(), digest),
+                        )
+                self.stats["hits"] += 1
+                return text
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, text: str):
+        """Store `text` under `key`, then evict old contents beyond the size cap."""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        db = self._connect()
+        stored = db.execute(
+            "SELECT codec, stored_size FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone()
+        if stored is None or not os.path.exists(path):
+            codec, compressed = _compress(data)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+            stored = (codec, len(compressed))
+        codec, stored_size = stored
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                (digest, codec, len(data), stored_size, time.time()),
+            )
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?)", (key, digest))
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def evict(self, max_bytes: int) -> int:
+        """Remove least recently used contents until they take `max_bytes` at most, returns the bytes freed."""
+        db = self._connect()
+        with db:
+            total = db.execute("SELECT COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+            evicted, freed = [], 0
+            for digest, stored_size in db.execute(
+                "SELECT digest, stored_size FROM blobs ORDER BY last_access"
+            ):
+                if total - freed <= max_bytes:
+                    break
+                evicted.append(digest)
+                freed += stored_size
+            db.executemany("DELETE FROM entries WHERE digest = ?", [(d,) for d in evicted])
+            db.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in evicted])
+        for digest in evicted:  # after the commit, readers find no entry or a missing file
+            try:
+                os.remove(self._path(digest))
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def gc(self, max_bytes: int | None = None) -> Dict[str, int]:
+        """
+        Evict down to `max_bytes` (the cap of the cache by default), drop index rows whose file
+        is missing and remove files that are not indexed, e.g. left by interrupted writes.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        result = {"evicted_bytes": self.evict(max_bytes) if max_bytes is not None else 0}
+        db = self._connect()
+        digests = {d for (d,) in db.execute("SELECT digest FROM blobs")}
+        missing = [d for d in digests if not os.path.exists(self._path(d))]
+        with db:
+            db.executemany("DELETE FROM entries WHERE digest = ?", [(d,) for d in missing])
+            db.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in missing])
+        orphans = 0
+        objects = os.path.join(self.root, "objects")
+        for prefix in os.listdir(objects):
+            for name in os.listdir(os.path.join(objects, prefix)):
+                path = os.path.join(objects, prefix, name)
+                if prefix + name in digests:
+                    continue
+                if time.time() - os.path.getmtime(path) < 60 * 60:
+                    continue  # may be a write in progress, not indexed yet
+                os.remove(path)
+                orphans += 1
+        result.update({"missing_files": len(missing), "removed_files": orphans})
+        return result
+
+    def info(self) -> Dict[str, Any]:
+        """Number of keys and contents, sizes, and hits and misses of this process."""
+        entries, blobs, size, stored_size = self._connect().execute(
+            "SELECT (SELECT COUNT(*) FROM entries), COUNT(*), COALESCE(SUM(size), 0),"
+            " COALESCE(SUM(stored_size), 0) FROM blobs"
+        ).fetchone()
+        return {
+            "root": self.root,
+            "entries": entries,
+            "contents": blobs,
+            "bytes": size,
+            "stored_bytes": stored_size,
+            "max_bytes": self.max_bytes,
+            "compression": "zstd" if zstandard is not None else "zlib",
+            **self.stats,
+        }
+
+    def clear(self):
+        """Remove all keys and contents."""
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM blobs")
+        objects = os.path.join(self.root, "objects")
+        shutil.rmtree(objects, ignore_errors=True)
+        os.makedirs(objects, exist_ok=True)
+
+
+_section_cache = None
+_section_cache_lock = threading.Lock()
+
+
+def get_section_cache() -> SectionCache | None:
+    """
+    The process-wide cache, in FINROBOT_SECTION_CACHE (.cache/sec_sections by default, an
+    empty value disables it) capped at FINROBOT_SECTION_CACHE_MB megabytes (512).
+    """
+    global _section_cache
+    root = os.environ.get("FINROBOT_SECTION_CACHE", os.path.join(".cache", "sec_sections"))
+    if not root:
+        return None
+    with _section_cache_lock:
+        if _section_cache is None or _section_cache.root != root:
+            max_mb = float(os.environ.get("FINROBOT_SECTION_CACHE_MB", 512))
+            _section_cache = SectionCache(root, int(max_mb * 1024 * 1024))
+        return _section_cache
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Statistics and cleanup of the section cache.")
+    parser.add_argument("command", choices=["stats", "gc", "clear"])
+    parser.add_argument("--root", help="cache directory, FINROBOT_SECTION_CACHE by default")
+    parser.add_argument("--max-mb", type=float, help="size to evict down to (gc)")
+    args = parser.parse_args(argv)
+
+    if args.root:
+        os.environ["FINROBOT_SECTION_CACHE"] = args.root
+    cache = get_section_cache()
+    if cache is None:
+        print("The section cache is disabled (FINROBOT_SECTION_CACHE is empty).")
+        return
+    if args.command == "gc":
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+        for name, value in cache.gc(max_bytes).items():
+            print(f"{name}: {value}")
+    elif args.command == "clear":
+        cache.clear()
+    for name, value in cache.info().items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,63 @@
+import inspect
+import logging
 import yfinance as yf
-from typing import Annotated, Callable, Any, Optional
-from pandas import DataFrame
+from typing import Annotated, Callable, Any, List, Optional
+import numpy as np
+from pandas import DataFrame, DatetimeIndex, concat
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 
 from ..utils import save_output, SavePathType, decorate_all_methods
+from .cache import TTLCache
+from .price_store import get_price_store
+
+logger = logging.getLogger(__name__)
+
+
+# yf.Ticker objects and the fundamentals fetched through them, shared by the tools of a
+# report (e.g. .info is read by the analyzer, the charts and the report builder)
+_tickers = TTLCache(maxsize=64, ttl=15 * 60)
+_properties = TTLCache(maxsize=512, ttl=15 * 60)
+
+
+# concurrent downloads of get_stock_data_multi, a Dow 30 panel takes one round
+MAX_DOWNLOADS = 32
+
+
+def get_ticker(symbol: str) -> yf.Ticker:
+    """The cached yf.Ticker of a symbol."""
+    symbol = symbol.strip().upper()
+    return _tickers.get_or_load(symbol, lambda: yf.Ticker(symbol))
+
+
+def ticker_property(ticker: yf.Ticker, name: str) -> Any:
+    """A (network) property of a Ticker such as info or financials, fetched once per TTL."""
+    value = _properties.get_or_load((ticker.ticker, name), lambda: getattr(ticker, name))
+    # callers get their own copy, the cached one is shared
+    return value.copy() if hasattr(value, "copy") else value
+
+
+def clear_ticker_cache():
+    _tickers.clear()
+    _properties.clear()
 
 
 def init_ticker(func: Callable) -> Callable:
     """Decorator to initialize yf.Ticker and pass it to the function."""
 
+    # the first parameter, "symbol" or "symbols", positional or by keyword as autogen calls tools
+    name = next(iter(inspect.signature(func).parameters))
+
     @wraps(func)
-    def wrapper(symbol: Annotated[str, "ticker symbol"], *args, **kwargs) -> Any:
-        ticker = yf.Ticker(symbol)
+    def wrapper(*args, **kwargs) -> Any:
+        if args:
+            symbol, args = args[0], args[1:]
+        else:
+            symbol = kwargs.pop(name)
+        if isinstance(symbol, str):
+            ticker = get_ticker(symbol)
+        else:  # list of symbols
+            ticker = [get_ticker(s) for s in symbol]
         return func(ticker, *args, **kwargs)
 
     return wrapper
@@ -32,16 +78,75 @@ class YFinanceUtils:
     ) -> DataFrame:
         """retrieve stock price data for designated ticker symbol"""
         ticker = symbol
-        stock_data = ticker.history(start=start_date, end=end_date)
+        store = get_price_store()
+        if store is None:
+            stock_data = ticker.history(start=start_date, end=end_date)
+        else:  # only the dates not stored locally yet are downloaded
+            stock_data = store.get(
+                ticker.ticker,
+                start_date,
+                end_date,
+                lambda start, end: ticker.history(start=start, end=end),
+            )
         save_output(stock_data, f"Stock data for {ticker.ticker}", save_path)
         return stock_data
 
+    def get_stock_data_multi(
+        symbols: Annotated[List[str], "ticker symbols"],
+        start_date: Annotated[
+            str, "start date for retrieving stock price data, YYYY-mm-dd"
+        ],
+        end_date: Annotated[
+            str, "end date for retrieving stock price data, YYYY-mm-dd"
+        ],
+        fields: Annotated[
+            Optional[List[str]],
+            "price fields, e.g. ['Close'] (default) or ['Open', 'Close', 'Volume']",
+        ] = None,
+        save_path: SavePathType = None,
+    ) -> DataFrame:
+        """retrieve an aligned table of stock prices (dates x symbols) for several ticker symbols"""
+        tickers = symbols
+        fields = fields or ["Close"]
+        if not tickers:
+            return DataFrame(index=DatetimeIndex([], name="Date"))
+
+        def fetch(ticker):
+            try:
+                return YFinanceUtils.get_stock_data(ticker.ticker, start_date, end_date)
+            except Exception as e:
+                logger.warning("Failed to retrieve stock data for %s: %s", ticker.ticker, e)
+                return DataFrame(index=DatetimeIndex([], tz="UTC"))
+
+        with ThreadPoolExecutor(min(MAX_DOWNLOADS, len(tickers))) as pool:
+            frames = list(pool.map(fetch, tickers))
+
+        # trading days of any symbol, as dates since exchanges have different time zones
+        days = [f.index.tz_localize(None).normalize() for f in frames]
+        dates = DatetimeIndex(np.unique(np.concatenate([d.values for d in days])), name="Date")
+        names = [t.ticker for t in tickers]
+        panels = []
+        for field in fields:
+            # one contiguous block per field, NaN where a symbol has no bar
+            values = np.full((len(dates), len(names)), np.nan)
+            for j, (frame, day) in enumerate(zip(frames, days)):
+                if field in frame.columns:
+                    values[dates.get_indexer(day), j] = frame[field].to_numpy()
+            panels.append(DataFrame(values, index=dates, columns=names))
+        panel = (
+            panels[0]
+            if len(fields) == 1
+            else concat(panels, axis=1, keys=fields, names=["Field", "Symbol"])
+        )
+        save_output(panel, f"Stock data for {', '.join(t.ticker for t in tickers)}", save_path)
+        return panel
+
     def get_stock_info(
         symbol: Annotated[str, "ticker symbol"],
     ) -> dict:
         """Fetches and returns latest stock information."""
         ticker = symbol
-        stock_info = ticker.info
+        stock_info = ticker_property(ticker, "info")
         return stock_info
 
     def get_company_info(
@@ -50,7 +155,7 @@ class YFinanceUtils:
     ) -> DataFrame:
         """Fetches and returns company information as a DataFrame."""
         ticker = symbol
-        info = ticker.info
+        info = ticker_property(ticker, "info")
         company_info = {
             "Company Name": info.get("shortName", "N/A"),
             "Industry": info.get("industry", "N/A"),
@@ -70,7 +175,7 @@ class YFinanceUtils:
     ) -> DataFrame:
         """Fetches and returns the latest dividends data as a DataFrame."""
         ticker = symbol
-        dividends = ticker.dividends
+        dividends = ticker_property(ticker, "dividends")
         if save_path:
             dividends.to_csv(save_path)
             print(f"Dividends for {ticker.ticker} saved to {save_path}")
@@ -79,25 +184,25 @@ class YFinanceUtils:
     def get_income_stmt(symbol: Annotated[str, "ticker symbol"]) -> DataFrame:
         """Fetches and returns the latest income statement of the company as a DataFrame."""
         ticker = symbol
-        income_stmt = ticker.financials
+        income_stmt = ticker_property(ticker, "financials")
         return income_stmt
 
     def get_balance_sheet(symbol: Annotated[str, "ticker symbol"]) -> DataFrame:
         """Fetches and returns the latest balance sheet of the company as a DataFrame."""
         ticker = symbol
-        balance_sheet = ticker.balance_sheet
+        balance_sheet = ticker_property(ticker, "balance_sheet")
         return balance_sheet
 
     def get_cash_flow(symbol: Annotated[str, "ticker symbol"]) -> DataFrame:
         """Fetches and returns the latest cash flow statement of the company as a DataFrame."""
         ticker = symbol
-        cash_flow = ticker.cashflow
+        cash_flow = ticker_property(ticker, "cashflow")
         return cash_flow
 
     def get_analyst_recommendations(symbol: Annotated[str, "ticker symbol"]) -> tuple:
         """Fetches the latest analyst recommendations and returns the most common recommendation and its count."""
         ticker = symbol
-        recommendations = ticker.recommendations
+        recommendations = ticker_property(ticker, "recommendations")
         if recommendations.empty:
             return None, 0  # No recommendations available
 
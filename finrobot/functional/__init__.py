@@ -1,7 +1,24 @@
-from .analyzer import ReportAnalysisUtils
-from .charting import MplFinanceUtils, ReportChartUtils
-from .coding import CodingUtils, IPythonUtils
-from .quantitative import BackTraderUtils
-from .reportlab import ReportLabUtils
-from .text import TextUtils
-from .rag import get_rag_function
+import importlib
+
+# The utils are imported on first access (matplotlib, backtrader, reportlab, ...).
+_modules = {
+    "ReportAnalysisUtils": ".analyzer",
+    "MplFinanceUtils": ".charting",
+    "ReportChartUtils": ".charting",
+    "CodingUtils": ".coding",
+    "IPythonUtils": ".coding",
+    "BackTraderUtils": ".quantitative",
+    "ReportLabUtils": ".reportlab",
+    "TextUtils": ".text",
+    "get_rag_function": ".rag",
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name):
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_modules[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -1,5 +1,7 @@
 import os
+import contextvars
 from textwrap import dedent
+from concurrent.futures import ThreadPoolExecutor
 from typing import Annotated, List
 from datetime import timedelta, datetime
 from ..data_source import YFinanceUtils, SECUtils, FMPUtils
@@ -356,6 +358,18 @@ class ReportAnalysisUtils:
         start = (filing_date - timedelta(weeks=52)).strftime("%Y-%m-%d")
         end = filing_date.strftime("%Y-%m-%d")
 
+        # the FMP data points are independent, fetched while the price data is processed
+        pool = ThreadPoolExecutor(3)
+        fmp_data = [
+            pool.submit(contextvars.copy_context().run, func, ticker_symbol, end)
+            for func in [
+                FMPUtils.get_target_price,
+                FMPUtils.get_historical_market_cap,
+                FMPUtils.get_historical_bvps,
+            ]
+        ]
+        pool.shutdown(wait=False)
+
         hist = YFinanceUtils.get_stock_data(ticker_symbol, start, end)
 
         # 获取其他相关信息
@@ -386,7 +400,7 @@ class ReportAnalysisUtils:
         # Print the result
         # print(f"Over the past 6 months, the average daily trading volume for {ticker_symbol} was: {avg_daily_volume_6m:.2f}")
         rating, _ = YFinanceUtils.get_analyst_recommendations(ticker_symbol)
-        target_price = FMPUtils.get_target_price(ticker_symbol, filing_date)
+        target_price, market_cap, bvps = [f.result() for f in fmp_data]
         result = {
             "Rating": rating,
             "Target Price": target_price,
@@ -395,13 +409,13 @@ class ReportAnalysisUtils:
             ),
             f"Closing Price ({info['currency']})": "{:.2f}".format(close_price),
             f"Market Cap ({info['currency']}mn)": "{:.2f}".format(
-                FMPUtils.get_historical_market_cap(ticker_symbol, filing_date) / 1e6
+                market_cap / 1e6
             ),
             f"52 Week Price Range ({info['currency']})": "{:.2f} - {:.2f}".format(
                 fiftyTwoWeekLow, fiftyTwoWeekHigh
             ),
             f"BVPS ({info['currency']})": "{:.2f}".format(
-                FMPUtils.get_historical_bvps(ticker_symbol, filing_date)
+                bvps
             ),
         }
         return result
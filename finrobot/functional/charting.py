@@ -8,6 +8,7 @@ from pandas import DateOffset
 from datetime import datetime, timedelta
 
 from ..data_source.yfinance_utils import YFinanceUtils
+from ..artifacts import put_image, resolve_artifact, ARTIFACT_HANDLE
 
 
 class MplFinanceUtils:
@@ -22,7 +23,10 @@ class MplFinanceUtils:
         end_date: Annotated[
             str, "End date of the historical data in 'YYYY-MM-DD' format"
         ],
-        save_path: Annotated[str, "File path where the plot should be saved"],
+        save_path: Annotated[
+            str | None,
+            "File path where the plot should be saved. If None, the chart is kept as an artifact.",
+        ] = None,
         verbose: Annotated[
             str, "Whether to print stock data to console. Default to False."
         ] = False,
@@ -41,13 +45,20 @@ class MplFinanceUtils:
         show_nontrading: Annotated[
             bool, "Whether to show non-trading days on the chart. Default to False."
         ] = False,
+        stock_data: Annotated[
+            str | None,
+            "Handle of the stock data artifact returned by get_stock_data, fetched if None.",
+            ARTIFACT_HANDLE,
+        ] = None,
     ) -> str:
         """
         Plot a stock price chart using mplfinance for the specified stock and time period,
         and save the plot to a file.
         """
-        # Fetch historical data
-        stock_data = YFinanceUtils.get_stock_data(ticker_symbol, start_date, end_date)
+        # Fetch historical data, unless the tool got it by handle
+        stock_data = resolve_artifact(stock_data)
+        if stock_data is None:
+            stock_data = YFinanceUtils.get_stock_data(ticker_symbol, start_date, end_date)
         if verbose:
             print(stock_data.to_string())
 
@@ -61,11 +72,17 @@ class MplFinanceUtils:
             "mav": mav,
             "show_nontrading": show_nontrading,
             "savefig": save_path,
+            "returnfig": save_path is None,
         }
         # Using dictionary comprehension to filter out None values (MplFinance does not accept None values)
         filtered_params = {k: v for k, v in params.items() if v is not None}
 
         # Plot chart
+        if save_path is None:
+            fig, _ = mpf.plot(stock_data, **filtered_params)
+            handle = put_image(fig)
+            plt.close(fig)
+            return f"{type} chart stored as <img {handle}>"
         mpf.plot(stock_data, **filtered_params)
 
         return f"{type} chart saved to <img {save_path}>"
@@ -78,21 +95,21 @@ class ReportChartUtils:
             str, "Ticker symbol of the stock (e.g., 'AAPL' for Apple)"
         ],
         filing_date: Annotated[str | datetime, "filing date in 'YYYY-MM-DD' format"],
-        save_path: Annotated[str, "File path where the plot should be saved"],
+        save_path: Annotated[
+            str | None,
+            "File path where the plot should be saved. If None, the chart is kept as an artifact.",
+        ] = None,
     ) -> str:
         """Plot the stock performance of a company compared to the S&P 500 over the past year."""
         if isinstance(filing_date, str):
             filing_date = datetime.strptime(filing_date, "%Y-%m-%d")
 
-        def fetch_stock_data(ticker):
-            start = (filing_date - timedelta(days=365)).strftime("%Y-%m-%d")
-            end = filing_date.strftime("%Y-%m-%d")
-            historical_data = YFinanceUtils.get_stock_data(ticker, start, end)
-            # hist = stock.history(period=period)
-            return historical_data["Close"]
-
-        target_close = fetch_stock_data(ticker_symbol)
-        sp500_close = fetch_stock_data("^GSPC")
+        start = (filing_date - timedelta(days=365)).strftime("%Y-%m-%d")
+        end = filing_date.strftime("%Y-%m-%d")
+        # both downloaded concurrently, on the same dates
+        close = YFinanceUtils.get_stock_data_multi([ticker_symbol, "^GSPC"], start, end)
+        target_close = close.iloc[:, 0].dropna()
+        sp500_close = close.iloc[:, 1].dropna()
         info = YFinanceUtils.get_stock_info(ticker_symbol)
 
         # 计算变化率
@@ -140,6 +157,10 @@ class ReportChartUtils:
         plt.grid(True)
         plt.tight_layout()
         # plt.show()
+        if save_path is None:
+            handle = put_image(plt.gcf())
+            plt.close()
+            return f"last year stock performance chart stored as <img {handle}>"
         plot_path = (
             f"{save_path}/stock_performance.png"
             if os.path.isdir(save_path)
@@ -155,7 +176,10 @@ class ReportChartUtils:
         ],
         filing_date: Annotated[str | datetime, "filing date in 'YYYY-MM-DD' format"],
         years: Annotated[int, "number of years to search from, default to 4"] = 4,
-        save_path: Annotated[str, "File path where the plot should be saved"] = None,
+        save_path: Annotated[
+            str | None,
+            "File path where the plot should be saved. If None, the chart is kept as an artifact.",
+        ] = None,
     ) -> str:
         """Plot the PE ratio and EPS performance of a company over the past n years."""
         if isinstance(filing_date, str):
@@ -219,6 +243,10 @@ class ReportChartUtils:
 
         plt.tight_layout()
         # plt.show()
+        if save_path is None:
+            handle = put_image(fig)
+            plt.close()
+            return f"pe performance chart stored as <img {handle}>"
         plot_path = (
             f"{save_path}/pe_performance.png" if os.path.isdir(save_path) else save_path
         )
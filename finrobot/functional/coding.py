@@ -1,17 +1,43 @@
 import os
 from typing_extensions import Annotated
 from IPython import get_ipython
+from ..artifacts import artifact_store
+from ..kernels import get_kernel_pool, get_kernel_session, format_cell_result
 
 default_path = "coding/"
 
 
+def _exec_in_kernel(cell: str) -> str:
+    """Run a cell in the pooled kernel of the current session, images go to the artifact store."""
+    result = get_kernel_pool().execute(get_kernel_session(), cell, os.getcwd())
+    images = []
+    for i, output in enumerate(result["outputs"]):
+        if output["mime"].startswith("image/"):
+            handle = artifact_store.put(output, prefix="img")
+            images.append(f"{output['mime']}, {len(output['data'])} bytes, artifact {handle}")
+            result["outputs"][i] = {"mime": "text/plain", "data": f"[{handle}]"}
+    if result["status"] == "ok" and not result["stdout"] and result["result"] is None:
+        if images:  # display_image
+            return "Image displayed successfully (" + "; ".join(images) + ")"
+        return ""
+    return format_cell_result(result)
+
+
 class IPythonUtils:
+    """
+    Run cells in the IPython shell of the notebook. Without a live shell (scripts, API
+    servers) cells run in the pooled background kernel of the current session
+    (finrobot.kernels), which keeps its state between calls; images are kept as bytes
+    in the artifact store.
+    """
 
     def exec_python(cell: Annotated[str, "Valid Python cell to execute."]) -> str:
         """
         run cell in ipython and return the execution result.
         """
         ipython = get_ipython()
+        if ipython is None:
+            return _exec_in_kernel(cell)
         result = ipython.run_cell(cell)
         log = str(result.result)
         if result.error_before_exec is not None:
@@ -1,7 +1,7 @@
 import os
 import json
 import importlib
-import yfinance as yf
+from ..data_source.yfinance_utils import YFinanceUtils
 import backtrader as bt
 from backtrader.strategies import SMA_CrossOver
 from typing import Annotated, List, Tuple
@@ -97,9 +97,8 @@ class BackTraderUtils:
         cerebro.addstrategy(strategy_class, **strategy_params)
 
         # Create a data feed
-        data = bt.feeds.PandasData(
-            dataname=yf.download(ticker_symbol, start_date, end_date, auto_adjust=True)
-        )
+        stock_data = YFinanceUtils.get_stock_data(ticker_symbol, start_date, end_date)
+        data = bt.feeds.PandasData(dataname=stock_data.tz_localize(None))
         cerebro.adddata(data)  # Add the data feed
         # Set our desired cash start
         cerebro.broker.setcash(cash)
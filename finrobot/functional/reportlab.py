@@ -21,6 +21,7 @@ from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
 
 from ..data_source import FMPUtils, YFinanceUtils
 from .analyzer import ReportAnalysisUtils
+from ..artifacts import image_source
 from typing import Annotated
 
 
@@ -50,10 +51,10 @@ class ReportLabUtils:
             "a paragraph of text: the company's competitors analysis from its financial report and competitors' financial report",
         ],
         share_performance_image_path: Annotated[
-            str, "path to the share performance image"
+            str, "path to the share performance image, or its artifact handle"
         ],
         pe_eps_performance_image_path: Annotated[
-            str, "path to the PE and EPS performance image"
+            str, "path to the PE and EPS performance image, or its artifact handle"
         ],
         filing_date: Annotated[str, "filing date of the analyzed financial report"],
     ) -> str:
@@ -274,7 +275,7 @@ class ReportLabUtils:
             plot_path = share_performance_image_path
             width = right_column_width
             height = width // 2
-            content.append(Image(plot_path, width=width, height=height))
+            content.append(Image(image_source(plot_path), width=width, height=height))
 
             # 历史PE和EPS
             data = [["PE & EPS"]]
@@ -286,7 +287,7 @@ class ReportLabUtils:
             plot_path = pe_eps_performance_image_path
             width = right_column_width
             height = width // 2
-            content.append(Image(plot_path, width=width, height=height))
+            content.append(Image(image_source(plot_path), width=width, height=height))
 
             # # 开始新的一页
             content.append(NextPageTemplate("OneCol"))
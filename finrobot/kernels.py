@@ -0,0 +1,427 @@
+import io
+import os
+import ast
+import base64
+import sys
+import time
+import atexit
+import threading
+import json
+import queue
+import pickle
+import logging
+import traceback
+import subprocess
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+from typing import Any, Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_KERNEL_CONFIG = {
+    "preload": ["numpy", "pandas", "matplotlib", "matplotlib.pyplot"],
+    "warm": 2,  # idle kernels kept started for new sessions
+    "max_sessions": 8,  # kernels assigned to sessions, the least recently used is shut down
+    "max_idle": 900,  # seconds before the kernel of an inactive session is shut down
+    "timeout": 120,  # seconds per cell, the kernel is restarted on timeout
+    "max_memory_mb": 4096,  # address space limit of a kernel, None for no limit
+}
+
+
+# ---- kernel process ----
+
+
+def _display_outputs(obj) -> List[Dict[str, Any]]:
+    """Rich representations of an object as {"mime", "data"} dicts."""
+    for mime, method in [
+        ("image/png", "_repr_png_"),
+        ("image/jpeg", "_repr_jpeg_"),
+        ("image/svg+xml", "_repr_svg_"),
+    ]:
+        if hasattr(obj, method):
+            data = getattr(obj, method)()
+            if isinstance(data, tuple):  # (data, metadata)
+                data = data[0]
+            if isinstance(data, str) and mime != "image/svg+xml":
+                data = base64.b64decode(data)  # IPython.display.Image gives base64
+            if data is not None:
+                return [{"mime": mime, "data": data}]
+    if hasattr(obj, "savefig"):  # matplotlib figure
+        buffer = io.BytesIO()
+        obj.savefig(buffer, format="png", bbox_inches="tight")
+        return [{"mime": "image/png", "data": buffer.getvalue()}]
+    return [{"mime": "text/plain", "data": repr(obj)}]
+
+
+def _figure_outputs() -> List[Dict[str, Any]]:
+    """Open matplotlib figures of the cell as png outputs, closing them."""
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is None:
+        return []
+    outputs = []
+    for num in plt.get_fignums():
+        outputs += _display_outputs(plt.figure(num))
+    plt.close("all")
+    return outputs
+
+
+def _run_cell(code: str, namespace: dict, outputs: list) -> Dict[str, Any]:
+    stdout, stderr = io.StringIO(), io.StringIO()
+    result, error = None, None
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            tree = ast.parse(code)
+            last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+            exec(compile(tree, "<cell>", "exec"), namespace)
+            if last is not None:
+                value = eval(compile(ast.Expression(last.value), "<cell>", "eval"), namespace)
+                if value is not None:
+                    namespace["_"] = value
+                    result = repr(value)
+    except BaseException as e:
+        tb = e.__traceback__  # drop the frames of the kernel itself
+        while tb is not None and tb.tb_frame.f_code.co_filename != "<cell>":
+            tb = tb.tb_next
+        error = "".join(traceback.format_exception(type(e), e, tb))
+    outputs += _figure_outputs()
+    return {
+        "status": "error" if error else "ok",
+        "stdout": stdout.getvalue() + stderr.getvalue(),
+        "result": result,
+        "error": error,
+        "outputs": outputs,
+    }
+
+
+def _kernel_main(preload: List[str], max_memory_mb: int | None):
+    # messages are pickled over the original stdout, fd 1 is pointed at stderr so that
+    # output of subprocesses started by cells does not corrupt them
+    requests = sys.stdin.buffer
+    replies = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    errors = {}
+    for module in preload:
+        try:
+            __import__(module)
+        except Exception as e:  # not installed, or broken
+            errors[module] = f"{type(e).__name__}: {e}"
+    # the limit is for the cells, the preloaded libraries are imported before it applies
+    if resource is not None and max_memory_mb:
+        limit = max_memory_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as e:
+            errors["max_memory_mb"] = f"{type(e).__name__}: {e}"
+
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    outputs = []
+
+    def display(*objs, **kwargs):
+        for obj in objs:
+            outputs.extend(_display_outputs(obj))
+
+    namespace["display"] = display
+    try:
+        import IPython.display
+
+        IPython.display.display = display  # "from IPython.display import display" in cells
+    except ImportError:
+        pass
+
+    pickle.dump(("ready", errors), replies)
+    replies.flush()
+    while True:
+        try:
+            message = pickle.load(requests)
+        except EOFError:
+            break
+        if message is None:
+            break
+        code, work_dir = message
+        outputs.clear()
+        if work_dir:
+            os.makedirs(work_dir, exist_ok=True)
+            os.chdir(work_dir)
+        pickle.dump(_run_cell(code, namespace, outputs), replies)
+        replies.flush()
+
+
+# ---- client side ----
+
+
+class Kernel:
+    """
+    A long-lived Python process running cells in a persistent namespace, like a Jupyter
+    kernel. Cells run in the work dir they are given, their stdout, last expression value,
+    errors and rich outputs (display() and open matplotlib figures, as bytes) are returned.
+    """
+
+    def __init__(self, preload: List[str] | None = None, max_memory_mb: int | None = None):
+        self.preload = preload or []
+        self.max_memory_mb = max_memory_mb
+        self.cells = 0
+        self.last_used = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._start()
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), json.dumps(self.preload), json.dumps(self.max_memory_mb)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self._replies = queue.Queue()
+        threading.Thread(
+            target=self._read_replies, args=(self._process.stdout, self._replies), daemon=True
+        ).start()
+        self._ready = False
+        self.preload_errors = {}  # module (or "max_memory_mb") -> error, once ready
+        self.cells = 0
+
+    @staticmethod
+    def _read_replies(stream, replies: queue.Queue):
+        while True:
+            try:
+                replies.put(pickle.load(stream))
+            except Exception:  # EOF, the kernel exited
+                replies.put(None)
+                return
+
+    def _reply(self, timeout: float | None):
+        try:
+            return self._replies.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError
+
+    def _wait_ready(self, timeout: float | None = None) -> bool:
+        if not self._ready:
+            reply = self._reply(timeout)
+            self._ready = isinstance(reply, tuple) and reply[0] == "ready"
+            if self._ready:
+                self.preload_errors = reply[1]
+                for name, error in reply[1].items():
+                    logger.warning("Kernel setup failed for %s: %s", name, error)
+        return self._ready
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Wait until the kernel has imported the preloaded libraries."""
+        with self._lock:
+            try:
+                return self._wait_ready(timeout)
+            except TimeoutError:
+                return False
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    @property
+    def busy(self) -> bool:
+        """Whether a cell is running."""
+        return self._lock.locked()
+
+    def restart(self):
+        self._process.kill()
+        self._process.wait()
+        self._start()
+
+    def execute(
+        self, code: str, work_dir: str | None = None, timeout: float | None = None
+    ) -> Dict[str, Any]:
+        """
+        Run a cell. Returns a dict with status ("ok" or "error"), stdout, result (repr of the
+        last expression), error (traceback) and outputs ([{"mime", "data"}]).
+        On timeout or crash the kernel is restarted and its state is lost.
+        """
+        with self._lock:
+            self.last_used = time.monotonic()
+            if self._closed:  # not restarted, the pool no longer tracks it
+                return {
+                    "status": "error",
+                    "stdout": "",
+                    "result": None,
+                    "error": "The kernel was shut down.",
+                    "outputs": [],
+                }
+            if not self.alive:
+                self.restart()
+            work_dir = os.path.abspath(work_dir) if work_dir else None
+            error = "The kernel died (out of memory?), it was restarted and its state lost."
+            try:
+                if self._wait_ready():
+                    pickle.dump((code, work_dir), self._process.stdin)
+                    self._process.stdin.flush()
+                    reply = self._reply(timeout)
+                    if reply is not None:
+                        self.cells += 1
+                        return reply
+            except TimeoutError:
+                error = f"Timeout: the cell did not finish within {timeout}s, the kernel was restarted and its state lost."
+            except OSError:
+                pass
+            self.restart()
+            return {"status": "error", "stdout": "", "result": None, "error": error, "outputs": []}
+
+    def shutdown(self):
+        """Stop the kernel, after the running cell if any."""
+        with self._lock:
+            self._closed = True
+            try:
+                pickle.dump(None, self._process.stdin)
+                self._process.stdin.close()
+                self._process.wait(1)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+
+
+class KernelPool:
+    """
+    Kernels assigned to sessions (e.g. one workflow conversation), plus `warm` started ones,
+    so the first cell of a session does not wait for the interpreter and its imports.
+    Kernels are not shared between sessions. Released, idle and least recently used ones
+    are shut down and replaced by fresh warm kernels. See DEFAULT_KERNEL_CONFIG.
+    """
+
+    def __init__(self, config: Dict[str, Any] | None = None):
+        self.config = {**DEFAULT_KERNEL_CONFIG, **(config or {})}
+        self._sessions = OrderedDict()
+        self._warm = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._refill()
+
+    def _new_kernel(self) -> Kernel:
+        return Kernel(self.config["preload"], self.config["max_memory_mb"])
+
+    def _refill(self):
+        def refill():
+            while True:
+                with self._lock:
+                    if self._closed or len(self._warm) >= self.config["warm"]:
+                        return
+                kernel = self._new_kernel()
+                with self._lock:
+                    if self._closed:
+                        kernel.shutdown()
+                        return
+                    self._warm.append(kernel)
+
+        threading.Thread(target=refill, daemon=True).start()
+
+    def get(self, session_id: str) -> Kernel:
+        """The kernel of a session, assigning a warm one on first use."""
+        expired = []
+        with self._lock:
+            kernel = self._sessions.get(session_id)
+            if kernel is not None:
+                self._sessions.move_to_end(session_id)
+                return kernel
+            now = time.monotonic()
+            # kernels running a cell are not evicted, the pool may exceed max_sessions meanwhile
+            for id, k in list(self._sessions.items()):
+                if now - k.last_used > self.config["max_idle"] and not k.busy:
+                    expired.append(self._sessions.pop(id))
+            for id, k in list(self._sessions.items()):
+                if len(self._sessions) < self.config["max_sessions"]:
+                    break
+                if not k.busy:
+                    expired.append(self._sessions.pop(id))
+            kernel = self._warm.pop(0) if self._warm else self._new_kernel()
+            self._sessions[session_id] = kernel
+        for k in expired:
+            k.shutdown()
+        self._refill()
+        return kernel
+
+    def execute(
+        self,
+        session_id: str,
+        code: str,
+        work_dir: str | None = None,
+        timeout: float | None = None,
+    ) -> Dict[str, Any]:
+        return self.get(session_id).execute(
+            code, work_dir, timeout or self.config["timeout"]
+        )
+
+    def release(self, session_id: str):
+        """Shut down the kernel of a finished session."""
+        with self._lock:
+            kernel = self._sessions.pop(session_id, None)
+        if kernel is not None:
+            kernel.shutdown()
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            kernels = list(self._sessions.values()) + self._warm
+            self._sessions, self._warm = OrderedDict(), []
+        for kernel in kernels:
+            kernel.shutdown()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_kernel_pool(config: Dict[str, Any] | None = None) -> KernelPool:
+    """The process-wide kernel pool, created with `config` on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = KernelPool(config)
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def release_kernel(session_id: str):
+    """Shut down the kernel of a finished session, if the pool has one."""
+    if _pool is not None:
+        _pool.release(session_id)
+
+
+_current_session = contextvars.ContextVar("finrobot_kernel_session", default="default")
+
+
+@contextmanager
+def kernel_session(session_id: str):
+    """Run the cells of tools called in the block (IPythonUtils) in the kernel of `session_id`."""
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def get_kernel_session() -> str:
+    return _current_session.get()
+
+
+def format_cell_result(result: Dict[str, Any]) -> str:
+    """Text of a cell result for an agent: output, last value, error, and a note per rich output."""
+    log = result["stdout"]
+    if result["result"] is not None:
+        log += result["result"] + "\n"
+    if result["error"]:
+        log += result["error"]
+    for output in result["outputs"]:
+        if output["mime"] != "text/plain":
+            log += f"<{output['mime']} output, {len(output['data'])} bytes>\n"
+        else:
+            log += output["data"] + "\n"
+    return log
+
+
+if __name__ == "__main__":
+    sys.path[0] = ""  # the work dir, like an interactive interpreter, not finrobot/
+    _kernel_main(json.loads(sys.argv[1]), json.loads(sys.argv[2]))
@@ -0,0 +1,194 @@
+import re
+import json
+import inspect
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+from .utils import count_tokens
+
+
+DEFAULT_PREFETCH_CONFIG = {
+    "mode": "context",  # "context": wait and add the results to the task, "cache": only warm the tool cache
+    # tools likely called first for a ticker, with their arguments
+    "tools": [
+        {"name": "get_company_profile", "args": {"symbol": "{symbol}"}},
+        {
+            "name": "get_company_news",
+            "args": {
+                "symbol": "{symbol}",
+                "start_date": "{start_date}",
+                "end_date": "{end_date}",
+            },
+        },
+        {"name": "get_basic_financials", "args": {"symbol": "{symbol}"}},
+        {
+            "name": "get_stock_data",
+            "args": {
+                "symbol": "{symbol}",
+                "start_date": "{start_date}",
+                "end_date": "{end_date}",
+            },
+        },
+    ],
+    "max_tickers": 3,
+    "default_days": 28,  # date range when the task does not give one
+    "timeout": 15,  # seconds the first completion waits for the results in context mode
+    "max_tokens": 800,  # per result injected in the task
+    "max_workers": 8,
+}
+
+# not preceded by a hyphen either, "10-K" and "10-Q" are filings, not tickers K and Q
+_TICKER = re.compile(r"(?<![\w.\-])\$?([A-Z]{1,5}(?:\.[A-Z]{1,2})?)(?![\w])")
+_NOT_TICKERS = set(
+    "A I AI CEO CFO CIO CTO COO USD EUR GBP CNY JPY US USA UK EU PDF CSV JSON API LLM ETF IPO "
+    "ESG EPS PE ROE ROA EBIT EBITDA GDP CPI YOY QOQ TTM SEC SMA EMA RSI MACD OHLC OHLCV NYSE "
+    "NASDAQ AM PM OK TBD FAQ Q1 Q2 Q3 Q4 FY AND OR THE FOR NOT TO IN OF ON BY AT IS IT BE AS "
+    "BUY SELL HOLD TERMINATE NOTE ROI ROIC ROCE EV FCF DCF CAGR KPI EBT DPS BPS BVPS NAV NPV "
+    "IRR WACC CAPEX OPEX COGS SGA PEG PB PS YTD MTD QTD LTM NTM AUM ARR MRR LTV CAC FX IR "
+    "HTML URL HTTP HTTPS XML PNG SVG ML NLP GPU CPU".split()
+)
+_ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_RELATIVE = re.compile(
+    r"\b(?:past|last|previous|recent)\s+(\d+)?\s*(day|week|month|year)s?\b", re.IGNORECASE
+)
+_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+
+def detect_tickers(text: str, max_tickers: int = 3) -> List[str]:
+    """Ticker symbols in a task, e.g. "AAPL", "$TSLA", "BRK.B", in order of appearance."""
+    tickers = []
+    for symbol in _TICKER.findall(text):
+        if symbol not in _NOT_TICKERS and symbol not in tickers:
+            tickers.append(symbol)
+    return tickers[:max_tickers]
+
+
+def detect_date_range(text: str, default_days: int = 28) -> Tuple[str, str]:
+    """(start_date, end_date) from ISO dates or phrases like "past 3 months", else the last `default_days`."""
+    dates = sorted(_ISO_DATE.findall(text))
+    if len(dates) >= 2:
+        return dates[0], dates[-1]
+    end = date.fromisoformat(dates[0]) if dates else date.today()
+    match = _RELATIVE.search(text)
+    days = (
+        int(match.group(1) or 1) * _DAYS[match.group(2).lower()]
+        if match
+        else default_days
+    )
+    return (end - timedelta(days=days)).isoformat(), end.isoformat()
+
+
+def _call_key(func: Callable, args: tuple, kwargs: dict) -> Tuple | None:
+    """Identify a tool call by the original function and its bound arguments (defaults applied)."""
+    func = inspect.unwrap(func)
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+    except TypeError:
+        return None
+    bound.apply_defaults()
+    return func, json.dumps(bound.arguments, sort_keys=True, default=str)
+
+
+_prefetched = contextvars.ContextVar("finrobot_prefetched", default=None)
+
+
+@contextmanager
+def prefetched_results(results: Dict[Tuple, Any] | None):
+    """Serve tool calls of the block from prefetched results (futures keyed by _call_key)."""
+    token = _prefetched.set(results)
+    try:
+        yield
+    finally:
+        _prefetched.reset(token)
+
+
+def lookup_prefetched(func: Callable, args: tuple, kwargs: dict) -> str | None:
+    """Output of an identical prefetched call, waiting for it if it is still running."""
+    results = _prefetched.get()
+    if not results:
+        return None
+    future = results.get(_call_key(func, args, kwargs))
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception:
+        return None  # the prefetch failed, make the call
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    return text[: max_tokens * 4] + "\n[...truncated]"
+
+
+def prefetch(
+    task: str,
+    function_map: Dict[str, Callable],
+    config: Dict[str, Any] | None = None,
+) -> Tuple[str, Dict[Tuple, Any]]:
+    """
+    Start the tool calls a ticker-centric task will most likely need, concurrently.
+    Only tools registered in `function_map` (the executor's) are called.
+
+    Returns the task, with the finished results appended in context mode, and the
+    prefetched futures to serve later identical tool calls from.
+    """
+    config = {**DEFAULT_PREFETCH_CONFIG, **(config or {})}
+    tickers = detect_tickers(task, config["max_tickers"])
+    if not tickers:
+        return task, {}
+    start_date, end_date = detect_date_range(task, config["default_days"])
+
+    calls = []
+    for symbol in tickers:
+        for tool in config["tools"]:
+            if tool["name"] not in function_map:
+                continue
+            kwargs = {
+                k: v.format(symbol=symbol, start_date=start_date, end_date=end_date)
+                if isinstance(v, str)
+                else v
+                for k, v in tool.get("args", {}).items()
+            }
+            calls.append((tool["name"], kwargs))
+    if not calls:
+        return task, {}
+
+    pool = ThreadPoolExecutor(min(config["max_workers"], len(calls)))
+    futures = {}
+    for name, kwargs in calls:
+        func = function_map[name]
+        key = _call_key(func, (), kwargs)
+        if key is not None:
+            context = contextvars.copy_context()
+            futures[key] = (name, kwargs, pool.submit(context.run, func, **kwargs))
+    pool.shutdown(wait=False)
+    results = {key: future for key, (_, _, future) in futures.items()}
+
+    if config["mode"] != "context":
+        return task, results
+
+    wait([f for _, _, f in futures.values()], timeout=config["timeout"])
+    sections = []
+    for name, kwargs, future in futures.values():
+        if not future.done() or future.exception() is not None:
+            continue
+        output = str(future.result())
+        if not output.strip() or output.strip() == "None":
+            continue
+        arguments = ", ".join(f"{k}={v!r}" for k, v in kwargs.items())
+        sections.append(
+            f"[{name}({arguments})]\n{_truncate(output, config['max_tokens'])}"
+        )
+    if not sections:
+        return task, results
+    context = (
+        "\n\nPrefetched data, retrieved with your tools on "
+        f"{datetime.now().strftime('%Y-%m-%d')}. Use it instead of calling these tools "
+        "again with the same arguments:\n\n" + "\n\n".join(sections)
+    )
+    return task + context, results
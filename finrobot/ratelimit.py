@@ -0,0 +1,96 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict
+
+
+# Requests per minute and concurrent requests of the providers, adjust them to your plans.
+DEFAULT_RATE_LIMITS = {
+    "openai": {"per_minute": 500, "concurrency": 16},
+    "finnhub": {"per_minute": 60},  # free tier
+    "fmp": {"per_minute": 300, "burst": 30},  # starter plan, the quota is per minute
+    "sec": {"per_minute": 600},  # 10 requests per second
+}
+
+
+class RateLimiter:
+    """
+    Token bucket of `per_minute` requests, allowing bursts of `burst` requests (one second
+    worth by default), with an optional cap on the requests in flight. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        per_minute: float | None = None,
+        burst: float | None = None,
+        concurrency: int | None = None,
+    ):
+        self.rate = per_minute / 60 if per_minute else None
+        self.burst = burst or max(1.0, self.rate or 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+        self._held = threading.local()
+
+    def acquire(self):
+        """Wait for a token. Tokens are reserved in order, so waiting callers are not starved."""
+        if self.rate is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+    @contextmanager
+    def limit(self):
+        # nested calls of the same thread (e.g. SECUtils methods calling each other) are
+        # part of the outer call, they use its slot and token instead of taking new ones
+        held = getattr(self._held, "depth", 0)
+        if self._slots is not None and not held:
+            self._slots.acquire()
+        self._held.depth = held + 1
+        try:
+            if not held:
+                self.acquire()
+            yield
+        finally:
+            self._held.depth = held
+            if self._slots is not None and not held:
+                self._slots.release()
+
+
+_rate_limits = contextvars.ContextVar("finrobot_rate_limits", default=None)
+
+
+@contextmanager
+def rate_limits(config: Dict[str, Dict[str, Any]] | None = None):
+    """
+    Apply per-provider limits to the LLM completions and data source calls of the block,
+    including the threads it starts with a copied context. `config` maps a provider
+    ("openai", "finnhub", "fmp", "sec") to RateLimiter arguments, DEFAULT_RATE_LIMITS by default.
+    """
+    config = DEFAULT_RATE_LIMITS if config is None else config
+    token = _rate_limits.set(
+        {provider: RateLimiter(**limits) for provider, limits in config.items()}
+    )
+    try:
+        yield _rate_limits.get()
+    finally:
+        _rate_limits.reset(token)
+
+
+def get_rate_limiter(provider: str) -> RateLimiter | None:
+    """The limiter of `provider` set by rate_limits(), None outside it."""
+    return (_rate_limits.get() or {}).get(provider)
+
+
+def rate_limited(provider: str):
+    """Context manager holding a request slot of `provider`, a no-op outside rate_limits()."""
+    limiter = get_rate_limiter(provider)
+    return limiter.limit() if limiter is not None else nullcontext()
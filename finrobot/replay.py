@@ -0,0 +1,445 @@
+import os
+import gzip
+import json
+import time
+import pickle
+import atexit
+import shutil
+import asyncio
+import hashlib
+import logging
+import threading
+import contextvars
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+from .artifacts import artifact_store, HANDLE_FINDER
+
+try:
+    import fcntl
+except ImportError:  # Windows, journals are not locked
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _request_hash(request: Any) -> str:
+    text = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class Recorder:
+    """
+    Capture LLM completions, tool results and code execution of a run.
+    Records are appended to `path` as gzipped JSON lines as they happen, so a crashed or
+    interrupted run keeps its recording up to the last call.
+    """
+
+    mode = "record"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.recorded = 0
+        self._file = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def call(self, kind: str, name: str, request: Any, func: Callable[[], Any]):
+        start = time.perf_counter()
+        output = func()
+        self._add(kind, name, request, output, time.perf_counter() - start)
+        return output
+
+    async def a_call(self, kind: str, name: str, request: Any, func: Callable[[], Any]):
+        start = time.perf_counter()
+        output = await func()
+        self._add(kind, name, request, output, time.perf_counter() - start)
+        return output
+
+    def _add(self, kind, name, request, output, duration):
+        record = {
+            "k": kind,
+            "n": name,
+            "h": _request_hash(request),
+            "d": round(duration, 4),
+            "o": output,
+        }
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if self._file is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = gzip.open(self.path, "wt")
+            self._file.write(line + "\n")
+            self._file.flush()  # a sync flush, the file is readable up to here
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Replayer:
+    """
+    Feed back the records of a recording instead of calling LLMs, tools and code execution.
+
+    A call is answered by the next unused record with the same kind, name and request.
+    When the request differs from the recorded one, the next unused record of the same
+    kind and name is used, so runs with small prompt changes still replay in order.
+
+    Args:
+        path: file written by Recorder.
+        realtime: sleep for the recorded duration of every call, otherwise reply immediately.
+        strict: raise KeyError when no record is left, otherwise make the call for real.
+    """
+
+    mode = "replay"
+
+    def __init__(self, path: str, realtime: bool = False, strict: bool = True):
+        self.path = path
+        self.realtime = realtime
+        self.strict = strict
+        self.records = []
+        with gzip.open(path, "rt") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        self.records.append(json.loads(line))
+            except (EOFError, json.JSONDecodeError):
+                pass  # recording of a crashed run, cut in its last record
+        self.stats = {"hits": 0, "fallbacks": 0, "misses": 0}
+        self._by_request = defaultdict(deque)
+        self._by_name = defaultdict(deque)
+        for i, r in enumerate(self.records):
+            self._by_request[(r["k"], r["n"], r["h"])].append(i)
+            self._by_name[(r["k"], r["n"])].append(i)
+        self._used = set()
+        self._lock = threading.Lock()
+
+    def _take(self, kind: str, name: str, request: Any) -> Dict | None:
+        queues = [
+            self._by_request[(kind, name, _request_hash(request))],
+            self._by_name[(kind, name)],
+        ]
+        with self._lock:
+            for stat, queue in zip(["hits", "fallbacks"], queues):
+                while queue:
+                    i = queue.popleft()
+                    if i not in self._used:
+                        self._used.add(i)
+                        self.stats[stat] += 1
+                        return self.records[i]
+            self.stats["misses"] += 1
+        if self.strict:
+            raise KeyError(f"No recorded {kind} call left for {name} in {self.path}.")
+        print(f"No recorded {kind} call left for {name}, calling it.")
+        return None
+
+    def call(self, kind: str, name: str, request: Any, func: Callable[[], Any]):
+        record = self._take(kind, name, request)
+        if record is None:
+            return func()
+        if self.realtime:
+            time.sleep(record["d"])
+        return record["o"]
+
+    async def a_call(self, kind: str, name: str, request: Any, func: Callable[[], Any]):
+        record = self._take(kind, name, request)
+        if record is None:
+            return await func()
+        if self.realtime:
+            await asyncio.sleep(record["d"])
+        return record["o"]
+
+    def close(self):
+        pass
+
+    def report(self) -> str:
+        unused = len(self.records) - len(self._used)
+        return (
+            f"{self.stats['hits']} exact, {self.stats['fallbacks']} in order, "
+            f"{self.stats['misses']} missing, {unused} unused of {len(self.records)} records"
+        )
+
+
+class CheckpointInUse(Exception):
+    pass
+
+
+class Checkpoint:
+    """
+    Journal of a single run that can be resumed after a crash or a restart. Every LLM
+    completion, tool result, code execution and nested chat summary is appended to a
+    JSON lines file as soon as it completes, with the artifacts its output refers to
+    (pickled in <path>.artifacts/).
+
+    Running the same task again with the same journal answers the calls it already made
+    from it, as long as their requests are identical, and continues live from the first
+    new one. Code blocks are executed again (their recorded output is kept) so the files
+    and kernel variables they created exist when the run continues.
+
+    A journal is used by one run at a time: it is locked (<path>.lock) until closed, and
+    CheckpointInUse is raised while another run, in this or another process, holds it.
+    """
+
+    mode = "checkpoint"
+    rerun_kinds = {"code"}
+
+    def __init__(self, path: str):
+        self.path = path
+        self.artifact_dir = path + ".artifacts"
+        self._lock_file = self._acquire(path + ".lock")
+        self.records = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        self.records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        pass  # line cut by a crash
+        self._by_request = defaultdict(deque)
+        for r in self.records:
+            self._by_request[(r["k"], r["n"], r["h"])].append(r)
+        self._saved = set()
+        if os.path.isdir(self.artifact_dir):
+            for file_name in os.listdir(self.artifact_dir):
+                handle = file_name.rsplit(".", 1)[0]
+                with open(os.path.join(self.artifact_dir, file_name), "rb") as f:
+                    artifact_store.put(pickle.load(f), handle=handle)
+                self._saved.add(handle)
+        self.resumed = len(self.records)
+        self.stats = {"resumed": 0, "live": 0}
+        self._file = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _acquire(lock_path: str):
+        if fcntl is None:
+            return None
+        if os.path.dirname(lock_path):
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        lock_file = open(lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise CheckpointInUse(f"Checkpoint {lock_path[:-5]} is used by another run.")
+        return lock_file
+
+    def _take(self, kind: str, name: str, request: Any) -> Dict | None:
+        with self._lock:
+            queue = self._by_request[(kind, name, _request_hash(request))]
+            if queue:
+                self.stats["resumed"] += 1
+                return queue.popleft()
+            self.stats["live"] += 1
+        return None
+
+    def _save_artifacts(self, text: str):
+        for handle in set(HANDLE_FINDER.findall(text)) - self._saved:
+            if handle in artifact_store:
+                os.makedirs(self.artifact_dir, exist_ok=True)
+                with open(os.path.join(self.artifact_dir, handle + ".pkl"), "wb") as f:
+                    pickle.dump(artifact_store.get(handle), f)
+                self._saved.add(handle)
+
+    def _append(self, kind, name, request, output, duration):
+        record = {
+            "k": kind,
+            "n": name,
+            "h": _request_hash(request),
+            "d": round(duration, 4),
+            "o": output,
+        }
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._save_artifacts(line)
+            if self._file is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a")
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def call(self, kind: str, name: str, request: Any, func: Callable[[], Any]):
+        record = self._take(kind, name, request)
+        if record is not None:
+            if kind in self.rerun_kinds:
+                func()
+            return record["o"]
+        start = time.perf_counter()
+        output = func()
+        self._append(kind, name, request, output, time.perf_counter() - start)
+        return output
+
+    async def a_call(self, kind: str, name: str, request: Any, func: Callable[[], Any]):
+        record = self._take(kind, name, request)
+        if record is not None:
+            if kind in self.rerun_kinds:
+                await func()
+            return record["o"]
+        start = time.perf_counter()
+        output = await func()
+        self._append(kind, name, request, output, time.perf_counter() - start)
+        return output
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:  # closing releases the lock
+                self._lock_file.close()
+                self._lock_file = None
+
+    def discard(self):
+        """Remove the journal and its artifacts, e.g. once the run completed."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if os.path.exists(self.path):  # still locked, no other run starts on it meanwhile
+            os.remove(self.path)
+        shutil.rmtree(self.artifact_dir, ignore_errors=True)
+        self.close()
+
+    def report(self) -> str:
+        return (
+            f"{self.stats['resumed']} calls resumed from the checkpoint, "
+            f"{self.stats['live']} made live"
+        )
+
+
+def _default_session() -> Recorder | Replayer | None:
+    # FINROBOT_RECORD=run.jsonl.gz / FINROBOT_REPLAY=run.jsonl.gz, for the whole process
+    if os.environ.get("FINROBOT_REPLAY"):
+        return Replayer(os.environ["FINROBOT_REPLAY"])
+    if os.environ.get("FINROBOT_RECORD"):
+        return Recorder(os.environ["FINROBOT_RECORD"])
+    return None
+
+
+# per run, like budgets and traces: concurrent runs (threads, tasks) keep their own session
+_current_session = contextvars.ContextVar("finrobot_replay_session", default=_default_session())
+_current_checkpoint = contextvars.ContextVar("finrobot_checkpoint", default=None)
+
+
+def get_session() -> Recorder | Replayer | None:
+    return _current_session.get()
+
+
+def _call(kind: str, name: str, request: Any, func: Callable[[], Any]):
+    session = _current_session.get()
+    if session is None:
+        return func()
+    return session.call(kind, name, request, func)
+
+
+async def _a_call(kind: str, name: str, request: Any, func: Callable[[], Any]):
+    session = _current_session.get()
+    if session is None:
+        return await func()
+    return await session.a_call(kind, name, request, func)
+
+
+def replay_call(kind: str, name: str, request: Any, func: Callable[[], Any]):
+    """Call `func()`, recording its output or replaying a recorded one when a session is active."""
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is None:
+        return _call(kind, name, request, func)
+    return checkpoint.call(
+        kind, name, request, lambda: _call(kind, name, request, func)
+    )
+
+
+async def a_replay_call(kind: str, name: str, request: Any, func: Callable[[], Any]):
+    """Async counterpart of replay_call, `func()` returns an awaitable."""
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is None:
+        return await _a_call(kind, name, request, func)
+    return await checkpoint.a_call(
+        kind, name, request, lambda: _a_call(kind, name, request, func)
+    )
+
+
+def checkpoint_call(kind: str, name: str, request: Any, func: Callable[[], Any]):
+    """Like replay_call, for steps that are only journaled by a checkpoint, not recorded."""
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is None:
+        return func()
+    return checkpoint.call(kind, name, request, func)
+
+
+async def a_checkpoint_call(kind: str, name: str, request: Any, func: Callable[[], Any]):
+    """Async counterpart of checkpoint_call."""
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is None:
+        return await func()
+    return await checkpoint.a_call(kind, name, request, func)
+
+
+@contextmanager
+def checkpoint_run(path: str | None):
+    """
+    Journal the run in the block to `path`, resuming from it if it exists (see Checkpoint).
+    Yields the Checkpoint, or None without a path.
+    """
+    if path is None:
+        yield None
+        return
+    try:
+        checkpoint = Checkpoint(path)
+    except CheckpointInUse as e:
+        logger.warning("%s This run is not journaled.", e)
+        yield None
+        return
+    if checkpoint.resumed:
+        logger.info("Resuming from checkpoint %s (%d calls recorded).", path, checkpoint.resumed)
+    token = _current_checkpoint.set(checkpoint)
+    try:
+        yield checkpoint
+    finally:
+        _current_checkpoint.reset(token)
+        checkpoint.close()
+
+
+def run_checkpoint_path(checkpoint_dir: str | None, *key: str | None) -> str | None:
+    """
+    Journal file of a run in `checkpoint_dir`, the same for the same key (e.g. agent, task
+    and run id, None parts are left out).
+    """
+    if checkpoint_dir is None:
+        return None
+    digest = hashlib.sha1("\x00".join(k for k in key if k is not None).encode()).hexdigest()[:16]
+    return os.path.join(checkpoint_dir, f"{digest}.jsonl")
+
+
+@contextmanager
+def _activate(session):
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+        session.close()
+
+
+def record_run(path: str):
+    """
+    Record every LLM completion, tool result and code execution in the block to `path`.
+
+        with record_run("runs/annual_report.jsonl.gz"):
+            assistant.chat(message)
+    """
+    return _activate(Recorder(path))
+
+
+def replay_run(path: str, realtime: bool = False, strict: bool = True):
+    """Replay a recording made with record_run, see Replayer for the arguments."""
+    return _activate(Replayer(path, realtime=realtime, strict=strict))
+
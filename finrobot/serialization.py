@@ -0,0 +1,179 @@
+import math
+import numpy as np
+import pandas as pd
+from typing import Annotated, Any, Dict, List
+
+from .artifacts import artifact_store
+from .utils import count_tokens
+
+
+DEFAULT_SERIALIZER_CONFIG = {
+    "max_tokens": 1500,  # token budget of one tool output, None for no limit
+    "format": "csv",  # csv / markdown
+    "precision": 6,  # significant digits of floats
+    "columns": None,  # explicit column selection
+    "prune_columns": True,  # drop empty and all-zero columns
+    "head": 5,  # rows kept on each end in head/tail mode
+    "tail": 5,
+    "store": True,  # keep the full output retrievable by handle, and usable as tool input
+}
+
+# aggregation of OHLCV columns when downsampling price series
+_DOWNSAMPLE_AGG = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Close": "last",
+    "Adj Close": "last",
+    "Volume": "sum",
+    "Dividends": "sum",
+    "Stock Splits": "max",
+}
+
+
+def _format_index(index: pd.Index) -> pd.Index:
+    if isinstance(index, pd.DatetimeIndex):
+        if (index == index.normalize()).all():
+            return pd.Index(index.strftime("%Y-%m-%d"), name=index.name)
+        return pd.Index(index.strftime("%Y-%m-%d %H:%M"), name=index.name)
+    return index
+
+
+def _compact(df: pd.DataFrame, config: dict) -> pd.DataFrame:
+    df = df.copy()
+    df.index = _format_index(df.index)
+    df.columns = _format_index(df.columns)
+    if config["columns"]:
+        df = df[[c for c in config["columns"] if c in df.columns]]
+    if config["prune_columns"]:
+        df = df.dropna(axis=0, how="all").dropna(axis=1, how="all")
+        numeric = df.select_dtypes("number")
+        zero_cols = numeric.columns[(numeric.fillna(0) == 0).all()]
+        if len(zero_cols) < df.shape[1]:
+            df = df.drop(columns=zero_cols)
+    return df
+
+
+def _render(df: pd.DataFrame, config: dict) -> str:
+    float_format = f"%.{config['precision']}g"
+    if config["format"] == "markdown":
+
+        def fmt(v):
+            return float_format % v if isinstance(v, (float, np.floating)) else str(v)
+
+        header = [str(df.index.name or "")] + [str(c) for c in df.columns]
+        lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+        for idx, row in zip(df.index, df.itertuples(index=False)):
+            lines.append("| " + " | ".join([str(idx)] + [fmt(v) for v in row]) + " |")
+        return "\n".join(lines)
+    if config["format"] == "csv":
+        return df.to_csv(float_format=float_format).strip()
+    raise ValueError(f"Unknown serializer format {config['format']}.")
+
+
+def _downsample(df: pd.DataFrame, step: int) -> pd.DataFrame:
+    buckets = np.arange(len(df)) // step
+    agg = {
+        c: _DOWNSAMPLE_AGG.get(c, "mean" if pd.api.types.is_numeric_dtype(df[c]) else "last")
+        for c in df.columns
+    }
+    sampled = df.groupby(buckets).agg(agg)
+    # label each bucket with its last row, so the last value stays exact
+    sampled.index = df.index[np.minimum((sampled.index + 1) * step, len(df)) - 1]
+    return sampled
+
+
+def _head_tail(df: pd.DataFrame, head: int, tail: int, config: dict) -> str:
+    parts = [
+        _render(df.head(head), config),
+        f"... {len(df) - head - tail} rows omitted ...",
+        _render(df.tail(tail), config).split("\n", 2 if config["format"] == "markdown" else 1)[-1],
+    ]
+    numeric = df.select_dtypes("number")
+    if not numeric.empty:
+        stats = numeric.describe().loc[["mean", "std", "min", "max"]]
+        parts.append("Summary statistics:\n" + _render(stats, config))
+    return "\n".join(parts)
+
+
+def serialize_dataframe(
+    df: pd.DataFrame | pd.Series, config: Dict[str, Any] | None = None
+) -> str:
+    """
+    Serialize a DataFrame within a token budget.
+    Reductions are tried in order: column pruning, downsampling of long time
+    series, head/tail with summary statistics. The full frame stays
+    retrievable through the handle reported in the footer.
+    """
+    config = {**DEFAULT_SERIALIZER_CONFIG, **(config or {})}
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    max_tokens = config["max_tokens"]
+
+    frame = _compact(df, config)
+    text = _render(frame, config)
+    handle = artifact_store.put(df) if config["store"] else None
+    if max_tokens is None or count_tokens(text) <= max_tokens:
+        # the handle lets other tools take the frame as input without it transiting the chat
+        return text + (f"\n[artifact {handle}]" if handle else "")
+
+    footer = f"\n[{df.shape[0]} rows x {df.shape[1]} columns shortened to fit {max_tokens} tokens"
+    footer += f', full data: get_artifact("{handle}")]' if handle else "]"
+    budget = max(max_tokens - count_tokens(footer), 0)
+
+    if isinstance(df.index, pd.DatetimeIndex) and len(frame) > 2:
+        tokens_per_row = count_tokens(text) / (len(frame) + 1)
+        step = math.ceil(len(frame) / max(budget / tokens_per_row - 1, 1))
+        sampled = _render(_downsample(frame, step), config)
+        if count_tokens(sampled) <= budget:
+            return f"Downsampled to every {step} rows:\n{sampled}{footer}"
+
+    head, tail = config["head"], config["tail"]
+    while head + tail < len(frame):
+        text = _head_tail(frame, head, tail, config)
+        if count_tokens(text) <= budget or (head <= 1 and tail <= 1):
+            break
+        head, tail = max(head // 2, 1), max(tail // 2, 1)
+
+    if count_tokens(text) > budget:
+        text = _first_lines(text, budget)
+    return text + footer if text else footer.lstrip("\n")
+
+
+def _first_lines(text: str, max_tokens: int) -> str:
+    """The longest run of whole leading lines of `text` within `max_tokens`."""
+    lines = text.split("\n")
+    low, high = 0, len(lines)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens("\n".join(lines[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return "\n".join(lines[:low])
+
+
+def serialize_output(result: Any, config: Dict[str, Any] | None = None) -> str:
+    """Convert a tool result to the string handed back to the LLM."""
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return serialize_dataframe(result, config)
+    return str(result)
+
+
+def get_artifact(
+    handle: Annotated[str, "handle of a shortened tool output, e.g. 'df_1a2b3c4d'"],
+    start: Annotated[int, "first row to return, default to 0"] = 0,
+    end: Annotated[int | None, "row to stop before, default to the last row"] = None,
+    columns: Annotated[
+        List[str] | None, "list of columns to return, default to all columns"
+    ] = None,
+) -> str:
+    """Retrieve rows and columns of a full tool output that was shortened to fit the token budget."""
+    try:
+        df = artifact_store.get(handle)
+    except KeyError as e:
+        return str(e)
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    df = df.iloc[start:end]
+    return serialize_dataframe(df, {"columns": columns, "store": False})
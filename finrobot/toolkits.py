@@ -1,36 +1,167 @@
 from autogen import register_function, ConversableAgent
-from .data_source import *
-from .functional.coding import CodingUtils
+from .serialization import serialize_output, get_artifact
+from .artifacts import resolve_artifact, ARTIFACT_HANDLE
+from .tracing import trace_span
+from .replay import replay_call, a_replay_call
+from .budget import get_budget
+from .prefetch import lookup_prefetched
+from .utils import count_tokens
 
-from typing import List, Callable
+import inspect
+import importlib
+from typing import List, Callable, get_type_hints
 from functools import wraps
-from pandas import DataFrame
 
 
-def stringify_output(func):
+def _record_tool_call(span, args, kwargs, result, output):
+    if span.recording:
+        span.set(
+            args_chars=len(str(args)) + len(str(kwargs)),
+            result_type=type(result).__name__,
+            output_chars=len(output),
+            output_tokens=count_tokens(output),
+        )
+
+
+def _refused_tool_call() -> str | None:
+    budget = get_budget()
+    return budget.charge_tool_call() if budget is not None else None
+
+
+def _handle_parameters(func) -> List[str]:
+    """Names of the parameters of `func` annotated with ARTIFACT_HANDLE."""
+    try:
+        hints = get_type_hints(func, include_extras=True)
+    except Exception:  # unresolvable annotations
+        return []
+    return [
+        name
+        for name, hint in hints.items()
+        if any(m is ARTIFACT_HANDLE for m in getattr(hint, "__metadata__", ()))
+    ]
+
+
+def _resolve_handles(func, handle_parameters, args: tuple, kwargs: dict) -> tuple:
+    # artifact handles given for ARTIFACT_HANDLE parameters are replaced by the stored objects
+    if not handle_parameters:
+        return args, kwargs
+    bound = inspect.signature(func).bind_partial(*args, **kwargs)
+    for name in handle_parameters:
+        if name in bound.arguments:
+            bound.arguments[name] = resolve_artifact(bound.arguments[name])
+    return bound.args, bound.kwargs
+
+
+def stringify_output(func, serializer_config: dict | None = None):
+    handle_parameters = _handle_parameters(func)
+
+    # coroutine functions stay coroutine functions, so autogen awaits them in async chats
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            refusal = _refused_tool_call()
+            if refusal:
+                return refusal
+            prefetched = lookup_prefetched(func, args, kwargs)
+            if prefetched is not None:
+                return prefetched
+            with trace_span("tool", func.__name__) as span:
+
+                async def call():
+                    call_args, call_kwargs = _resolve_handles(func, handle_parameters, args, kwargs)
+                    result = await func(*call_args, **call_kwargs)
+                    output = serialize_output(result, serializer_config)
+                    _record_tool_call(span, args, kwargs, result, output)
+                    return output
+
+                return await a_replay_call("tool", func.__name__, [args, kwargs], call)
+
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        result = func(*args, **kwargs)
-        if isinstance(result, DataFrame):
-            return result.to_string()
-        else:
-            return str(result)
+        refusal = _refused_tool_call()
+        if refusal:
+            return refusal
+        prefetched = lookup_prefetched(func, args, kwargs)
+        if prefetched is not None:
+            return prefetched
+        with trace_span("tool", func.__name__) as span:
+
+            def call():
+                call_args, call_kwargs = _resolve_handles(func, handle_parameters, args, kwargs)
+                result = func(*call_args, **call_kwargs)
+                output = serialize_output(result, serializer_config)
+                _record_tool_call(span, args, kwargs, result, output)
+                return output
+
+            return replay_call("tool", func.__name__, [args, kwargs], call)
 
     return wrapper
 
 
+def resolve_tool(path: str):
+    """Import a tool from its dotted path, e.g. "finrobot.data_source.FinnHubUtils.get_company_news"."""
+    module_path, attrs = path, []
+    while module_path:
+        try:
+            obj = importlib.import_module(module_path)
+            break
+        except ModuleNotFoundError as e:
+            if not (module_path + ".").startswith(f"{e.name}."):
+                raise  # missing dependency of the tool module
+            module_path, _, attr = module_path.rpartition(".")
+            attrs.insert(0, attr)
+    else:
+        raise ValueError(f"Tool {path} not found.")
+    try:
+        for attr in attrs:
+            obj = getattr(obj, attr)
+    except AttributeError:
+        raise ValueError(f"Tool {path} not found.")
+    return obj
+
+
+def resolve_toolkits(config: List[str | dict | Callable | type]) -> list:
+    """Replace the dotted paths of a configuration list by the tools they refer to."""
+    resolved = []
+    for tool in config:
+        if isinstance(tool, str):
+            tool = resolve_tool(tool)
+        elif isinstance(tool, dict) and isinstance(tool.get("function"), str):
+            tool = {**tool, "function": resolve_tool(tool["function"])}
+        resolved.append(tool)
+    return resolved
+
+
+def _has_tool(caller: ConversableAgent, name: str) -> bool:
+    tools = caller.llm_config.get("tools", []) if caller.llm_config else []
+    return any(t["function"]["name"] == name for t in tools)
+
+
 def register_toolkits(
-    config: List[dict | Callable | type],
+    config: List[str | dict | Callable | type],
     caller: ConversableAgent,
     executor: ConversableAgent,
+    serializer_config: dict | None = None,
     **kwargs
 ):
-    """Register tools from a configuration list."""
+    """
+    Register tools from a configuration list of functions, classes, dicts or dotted paths.
+    Coroutine functions are registered as async tools and awaited on the event loop in
+    async chats (achat).
+    DataFrame outputs are serialized within a token budget, which can be set per tool
+    with a "serializer" entry (see finrobot.serialization.DEFAULT_SERIALIZER_CONFIG)
+    or for all tools with `serializer_config`.
+    """
 
-    for tool in config:
+    for tool in resolve_toolkits(config):
 
         if isinstance(tool, type):
-            register_tookits_from_cls(caller, executor, tool, **kwargs)
+            register_tookits_from_cls(
+                caller, executor, tool, serializer_config=serializer_config, **kwargs
+            )
             continue
 
         tool_dict = {"function": tool} if callable(tool) else tool
@@ -42,17 +173,32 @@ def register_toolkits(
         tool_function = tool_dict["function"]
         name = tool_dict.get("name", tool_function.__name__)
         description = tool_dict.get("description", tool_function.__doc__)
+        tool_serializer_config = {
+            **(serializer_config or {}),
+            **tool_dict.get("serializer", {}),
+        }
         register_function(
-            stringify_output(tool_function),
+            stringify_output(tool_function, tool_serializer_config),
             caller=caller,
             executor=executor,
             name=name,
             description=description,
         )
 
+    # shortened outputs can be read back by handle
+    if config and not _has_tool(caller, "get_artifact"):
+        register_function(
+            get_artifact,
+            caller=caller,
+            executor=executor,
+            name="get_artifact",
+            description=get_artifact.__doc__,
+        )
+
 
 def register_code_writing(caller: ConversableAgent, executor: ConversableAgent):
     """Register code writing tools."""
+    from .functional.coding import CodingUtils
 
     register_toolkits(
         [
@@ -87,6 +233,7 @@ def register_tookits_from_cls(
     executor: ConversableAgent,
     cls: type,
     include_private: bool = False,
+    serializer_config: dict | None = None,
 ):
     """Register all methods of a class as tools."""
     if include_private:
@@ -103,4 +250,9 @@ def register_tookits_from_cls(
             and not func.startswith("__")
             and not func.startswith("_")
         ]
-    register_toolkits([getattr(cls, func) for func in funcs], caller, executor)
+    register_toolkits(
+        [getattr(cls, func) for func in funcs],
+        caller,
+        executor,
+        serializer_config=serializer_config,
+    )
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+import requests
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+
+logger = logging.getLogger(__name__)
+
+
+_current_span = contextvars.ContextVar("finrobot_current_span", default=None)
+
+
+class Span:
+    """A timed unit of work (chat, llm, tool, nested_chat, summary) with attributes."""
+
+    recording = True
+
+    def __init__(self, kind: str, name: str, parent: "Span | None" = None, **attributes):
+        self.kind = kind
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start_time": self.start_time / 1e9,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NullSpan:
+    """Stand-in yielded while tracing is disabled."""
+
+    recording = False
+
+    def set(self, **attributes):
+        pass
+
+
+class JSONLinesExporter:
+    """Append finished spans to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+
+
+class OTLPExporter:
+    """
+    Send finished spans to an OpenTelemetry collector with OTLP/HTTP (JSON encoding).
+    Batches are posted by a background thread, failures are logged and the batch dropped.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "finrobot",
+        timeout: float = 5,
+    ):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _attribute(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _otlp_span(self, span: Span) -> Dict[str, Any]:
+        attributes = {"finrobot.kind": span.kind, **span.attributes}
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": f"{span.kind} {span.name}",
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_time),
+            "endTimeUnixNano": str(span.end_time),
+            "attributes": [self._attribute(k, v) for k, v in attributes.items()],
+            "status": (
+                {"code": 2, "message": span.error} if span.error else {"code": 1}
+            ),
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return otlp_span
+
+    def export(self, spans: List[Span]):
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            self._attribute("service.name", self.service_name)
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "finrobot"},
+                            "spans": [self._otlp_span(s) for s in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._send, daemon=True)
+                self._thread.start()
+        self._queue.put((len(spans), payload))
+
+    def _send(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                count, payload = item
+                try:
+                    response = self.session.post(
+                        self.endpoint, json=payload, timeout=self.timeout
+                    )
+                    response.raise_for_status()
+                except requests.RequestException as e:
+                    logger.warning("Failed to export %d spans to %s: %s", count, self.endpoint, e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Wait until the queued batches are sent."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Send the queued batches and stop the sender thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+
+
+class Tracer:
+    """
+    Collects finished spans and hands them to the exporters in batches.
+    A batch is flushed when it is full and whenever a root span finishes.
+    """
+
+    def __init__(self, exporters: List[Any], batch_size: int = 64):
+        self.exporters = exporters
+        self.batch_size = batch_size
+        self._finished = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attributes):
+        span = Span(kind, name, parent=_current_span.get(), **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time_ns()
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._finished.append(span)
+            full = len(self._finished) >= self.batch_size
+        if full or span.parent_id is None:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._finished = self._finished, []
+        if spans:
+            for exporter in self.exporters:
+                exporter.export(spans)
+
+
+_tracer = None
+
+
+def configure_tracing(
+    jsonl_path: str | None = None,
+    otlp_endpoint: str | None = None,
+    exporters: List[Any] | None = None,
+    **kwargs,
+) -> Tracer | None:
+    """
+    Enable tracing of agent runs. Spans are written to a JSON lines file, sent to an
+    OTLP/HTTP collector (e.g. http://localhost:4318/v1/traces), or passed to custom exporters.
+    Call without arguments to disable tracing again.
+    """
+    global _tracer
+    exporters = list(exporters or [])
+    if jsonl_path:
+        exporters.append(JSONLinesExporter(jsonl_path))
+    if otlp_endpoint:
+        exporters.append(OTLPExporter(otlp_endpoint))
+    if _tracer is not None:
+        _tracer.flush()
+        for exporter in _tracer.exporters:
+            if hasattr(exporter, "close"):
+                exporter.close()
+    _tracer = Tracer(exporters, **kwargs) if exporters else None
+    return _tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+@atexit.register
+def _flush_at_exit():
+    tracer = _tracer
+    if tracer is not None:
+        tracer.flush()
+        for exporter in tracer.exporters:
+            if hasattr(exporter, "flush"):
+                exporter.flush()
+
+
+@contextmanager
+def trace_span(kind: str, name: str, **attributes):
+    """Record a span if tracing is enabled, otherwise yield a no-op span."""
+    if _tracer is None:
+        yield _NullSpan()
+    else:
+        with _tracer.span(kind, name, **attributes) as span:
+            yield span
+
+
+# FINROBOT_TRACE_JSONL=traces.jsonl / FINROBOT_TRACE_OTLP=http://localhost:4318/v1/traces
+if os.environ.get("FINROBOT_TRACE_JSONL") or os.environ.get("FINROBOT_TRACE_OTLP"):
+    configure_tracing(
+        jsonl_path=os.environ.get("FINROBOT_TRACE_JSONL"),
+        otlp_endpoint=os.environ.get("FINROBOT_TRACE_OTLP"),
+    )
@@ -2,6 +2,7 @@ import os
 import json
 import pandas as pd
 from datetime import date, timedelta, datetime
+from functools import lru_cache
 from typing import Annotated
 
 
@@ -45,6 +46,25 @@ def decorate_all_methods(decorator):
     return class_decorator
 
 
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # unknown model, tiktoken missing, or encoding files not downloadable
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Count the tokens of a text, estimating 4 characters per token if tiktoken is unavailable."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
 def get_next_weekday(date):
 
     if not isinstance(date, datetime):
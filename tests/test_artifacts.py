@@ -0,0 +1,100 @@
+from typing import Annotated
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from finrobot.artifacts import ARTIFACT_HANDLE, ArtifactStore, artifact_store
+from finrobot.toolkits import stringify_output
+
+
+def frame(rows=1000):
+    return pd.DataFrame({"Close": np.arange(rows, dtype=float)})
+
+
+def test_evicts_least_recently_used_by_count():
+    store = ArtifactStore(max_items=2)
+    first, second = store.put("a"), store.put("b")
+    store.get(first)
+    third = store.put("c")
+    assert first in store and third in store and second not in store
+    with pytest.raises(KeyError):
+        store.get(second)
+
+
+def test_evicts_by_size():
+    size = int(frame().memory_usage(deep=True).sum())
+    store = ArtifactStore(max_bytes=int(2.5 * size))
+    handles = [store.put(frame()) for _ in range(4)]
+    assert len(store) == 2 and store.nbytes == 2 * size
+    assert [h in store for h in handles] == [False, False, True, True]
+    # a single artifact over the bound is kept until the next one
+    store = ArtifactStore(max_bytes=size // 2)
+    handle = store.put(frame())
+    assert store.get(handle).equals(frame())
+
+
+def test_spills_evicted_frames(tmp_path):
+    pytest.importorskip("pyarrow")
+    store = ArtifactStore(max_items=1, spill_dir=str(tmp_path), max_spill_bytes=None)
+    first = store.put(frame())
+    store.put(frame(10))
+    assert len(store) == 1 and first in store
+    assert store.get(first)["Close"].tolist() == frame()["Close"].tolist()
+    store.clear()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spilled_files_are_bounded(tmp_path):
+    pytest.importorskip("pyarrow")
+    store = ArtifactStore(max_items=1, spill_dir=str(tmp_path / "a"), max_spill_bytes=None)
+    store.put(frame())
+    store.put(frame())
+    file_size = sum(f.stat().st_size for f in (tmp_path / "a").iterdir())
+
+    store = ArtifactStore(
+        max_items=1, spill_dir=str(tmp_path / "b"), max_spill_bytes=int(1.5 * file_size)
+    )
+    handles = [store.put(frame()) for _ in range(3)]
+    assert [f.stem for f in (tmp_path / "b").glob("*.parquet")] == [handles[1]]
+    assert handles[0] not in store
+
+
+def test_only_marked_parameters_are_resolved():
+    calls = []
+
+    def tool(
+        data: Annotated[str, "handle of the stock data", ARTIFACT_HANDLE],
+        label: Annotated[str, "a label"],
+    ) -> str:
+        calls.append((data, label))
+        return "done"
+
+    handle = artifact_store.put(frame(3), prefix="df")
+    other = artifact_store.put(frame(2), prefix="df")
+    try:
+        assert stringify_output(tool)(handle, label=other) == "done"
+        data, label = calls[0]
+        assert isinstance(data, pd.DataFrame) and len(data) == 3
+        assert label == other
+        # not a handle, or an unknown one, is passed on as is
+        stringify_output(tool)("AAPL", "df_00000000")
+        assert calls[1] == ("AAPL", "df_00000000")
+    finally:
+        artifact_store.clear()
+
+
+def test_failed_spill_does_not_fail_put(tmp_path, monkeypatch, caplog):
+    def to_parquet(self, *args, **kwargs):
+        raise TypeError("mixed-type object column")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", to_parquet)
+    store = ArtifactStore(max_items=1)
+    store.spill_dir = str(tmp_path)  # as if pyarrow were installed
+    persisted = store.put(frame(), persist=True)
+    assert store.get(persisted).equals(frame())  # kept in memory
+    newest = store.put(frame(5))
+    # the evicted frame could not be written, it is dropped
+    assert persisted not in store and store.get(newest).equals(frame(5))
+    assert "could not be written" in caplog.text
+    assert list(tmp_path.iterdir()) == []
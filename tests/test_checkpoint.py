@@ -0,0 +1,81 @@
+import pytest
+
+from finrobot.replay import (
+    Checkpoint,
+    CheckpointInUse,
+    fcntl,
+    checkpoint_call,
+    checkpoint_run,
+    run_checkpoint_path,
+)
+
+
+class Crash(Exception):
+    pass
+
+
+def run(path, steps, crash_at=None):
+    """Steps of a run through checkpoint_call, returns the calls made live."""
+    live = []
+
+    def step(kind, i):
+        def call():
+            if i == crash_at:
+                raise Crash()
+            live.append((kind, i))
+            return f"{kind} output {i}"
+
+        return call
+
+    with checkpoint_run(path):
+        outputs = [checkpoint_call(kind, "step", {"i": i}, step(kind, i)) for kind, i in steps]
+    return live, outputs
+
+
+def test_resumes_after_a_crash(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    steps = [("llm", 0), ("code", 1), ("tool", 2), ("llm", 3)]
+    with pytest.raises(Crash):
+        run(path, steps, crash_at=2)
+
+    live, outputs = run(path, steps)
+    # recorded completions and tool calls are not repeated, code blocks run again
+    assert live == [("code", 1), ("tool", 2), ("llm", 3)]
+    assert outputs == [f"{kind} output {i}" for kind, i in steps]
+
+
+def test_changed_request_runs_live(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    run(path, [("llm", 0), ("llm", 1)])
+    live, _ = run(path, [("llm", 0), ("llm", 2)])
+    assert live == [("llm", 2)]
+
+
+def test_discard(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    run(path, [("llm", 0)])
+    checkpoint = Checkpoint(path)
+    assert checkpoint.resumed == 1
+    checkpoint.discard()
+    assert run(path, [("llm", 0)])[0] == [("llm", 0)]
+
+
+@pytest.mark.skipif(fcntl is None, reason="journals are not locked without fcntl")
+def test_journal_is_used_by_one_run_at_a_time(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    with checkpoint_run(path) as checkpoint:
+        assert checkpoint is not None
+        with pytest.raises(CheckpointInUse):
+            Checkpoint(path)
+        with checkpoint_run(path) as concurrent:
+            assert concurrent is None
+    with checkpoint_run(path) as checkpoint:
+        assert checkpoint is not None
+
+
+def test_run_checkpoint_path():
+    path = run_checkpoint_path("ckpt", "Analyst", "task")
+    assert path == run_checkpoint_path("ckpt", "Analyst", "task", None)
+    assert path != run_checkpoint_path("ckpt", "Analyst", "task", "run-2")
+    assert path != run_checkpoint_path("ckpt", "Analyst", "other task")
+    assert run_checkpoint_path(None, "Analyst", "task") is None
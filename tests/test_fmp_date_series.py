@@ -0,0 +1,34 @@
+from finrobot.data_source.fmp_utils import DateSeries
+
+
+RECORDS = [
+    {"date": "2024-03-31", "v": 3},
+    {"date": "2023-12-31T00:00:00", "v": 2},
+    {"date": "2024-06-30", "v": 4},
+    {"date": None, "v": 0},
+    {"date": "2023-09-30", "v": 1},
+]
+
+
+def test_from_records_sorts_and_skips_undated():
+    series = DateSeries.from_records(RECORDS, "v")
+    assert len(series) == 4
+    assert list(series.values) == [1, 2, 3, 4]
+
+
+def test_nearest():
+    series = DateSeries.from_records(RECORDS, "v")
+    assert series.nearest("2024-03-31") == 3
+    assert series.nearest("2024-02-01") == 2
+    assert series.nearest("2023-01-01") == 1
+    assert series.nearest("2030-01-01") == 4
+    # 2023-11-15 is 46 days from both neighbours, the later one wins
+    assert series.nearest("2023-11-15") == 2
+    assert DateSeries([], []).nearest("2024-01-01") is None
+
+
+def test_window_includes_both_ends():
+    series = DateSeries.from_records(RECORDS, "v")
+    assert series.window("2023-12-31", "2024-03-31") == [2, 3]
+    assert series.window("2024-01-01", "2024-03-30") == []
+    assert series.window("2000-01-01", "2100-01-01") == [1, 2, 3, 4]
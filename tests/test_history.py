@@ -0,0 +1,33 @@
+from finrobot.agents.history import HistoryCompressor, _message_tokens
+
+
+def tool_call(arguments):
+    return [{"id": "1", "type": "function", "function": {"name": "f", "arguments": arguments}}]
+
+
+def test_oversized_message_is_cut_to_the_budget():
+    compressor = HistoryCompressor(keep_last=2, max_prompt_tokens=200)
+    message = {"role": "assistant", "content": "word " * 1000, "tool_calls": tool_call("{}")}
+    compressed = compressor.compress("analyst", [message])
+    tokens = sum(_message_tokens(m) for m in compressed)
+    assert tokens <= 200
+    assert compressor.stats[-1]["prompt_tokens_after"] == tokens
+    assert compressed[-1]["tool_calls"] == message["tool_calls"]
+
+
+def test_tokens_after_are_counted_not_assumed():
+    # the tool call arguments alone are over the ceiling, the prompt cannot fit
+    compressor = HistoryCompressor(keep_last=2, max_prompt_tokens=100)
+    message = {"role": "assistant", "content": "text", "tool_calls": tool_call("x " * 500)}
+    compressed = compressor.compress("analyst", [message])
+    tokens = sum(_message_tokens(m) for m in compressed)
+    assert compressed[-1]["content"] == ""
+    assert compressor.stats[-1]["prompt_tokens_after"] == tokens > 100
+
+
+def test_folds_are_bounded():
+    compressor = HistoryCompressor(summarizer=lambda summary, messages: "summary")
+    compressor.max_folds = 3
+    for i in range(10):
+        compressor._fold("", [{"role": "user", "content": f"message {i}"}]).result()
+    assert len(compressor._folds) == 3
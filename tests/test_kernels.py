@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from finrobot.kernels import Kernel, KernelPool
+
+
+@pytest.fixture
+def pool():
+    pool = KernelPool({"preload": [], "warm": 0, "max_sessions": 1, "max_memory_mb": None})
+    yield pool
+    pool.shutdown()
+
+
+def test_state_is_kept_per_session(pool):
+    pool.execute("a", "x = 41")
+    assert pool.execute("a", "x + 1")["result"] == "42"
+
+
+def test_running_kernels_are_not_evicted(pool):
+    results = {}
+    running = threading.Thread(
+        target=lambda: results.update(a=pool.execute("a", "import time; time.sleep(1); 'done'"))
+    )
+    running.start()
+    time.sleep(0.3)
+    kernel = pool.get("a")
+    assert kernel.busy
+    pool.get("b")  # over max_sessions, but "a" runs a cell
+    running.join()
+    assert results["a"]["status"] == "ok" and results["a"]["result"] == "'done'"
+    assert kernel.alive
+
+    pool.get("c")  # now "a" and "b" are idle and evicted
+    assert not kernel.alive
+
+
+def test_shut_down_kernel_is_not_restarted():
+    kernel = Kernel(max_memory_mb=None)
+    kernel.shutdown()
+    result = kernel.execute("1 + 1")
+    assert result["status"] == "error" and "shut down" in result["error"]
+    assert not kernel.alive
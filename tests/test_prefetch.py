@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+
+from finrobot.prefetch import detect_date_range, detect_tickers
+
+
+def test_detect_tickers():
+    assert detect_tickers("Analyze AAPL and compare it with $MSFT and BRK.B") == [
+        "AAPL",
+        "MSFT",
+        "BRK.B",
+    ]
+    assert detect_tickers("Write a report on NVDA, then NVDA's peers AMD and INTC", 2) == [
+        "NVDA",
+        "AMD",
+    ]
+
+
+def test_detect_tickers_skips_common_words():
+    text = "Use the SEC 10-K and the EPS in USD. I need a BUY or SELL call, reply TERMINATE."
+    assert detect_tickers(text) == []
+    assert detect_tickers("compare aapl with msft") == []
+    assert detect_tickers("the file report.PDF") == []
+
+
+def test_detect_date_range():
+    assert detect_date_range("TSLA from 2024-01-01 to 2024-03-31") == ("2024-01-01", "2024-03-31")
+    assert detect_date_range("TSLA in the past 3 months up to 2024-06-30") == (
+        "2024-04-01",
+        "2024-06-30",
+    )
+    start, end = detect_date_range("TSLA news", default_days=28)
+    assert date.fromisoformat(end) - date.fromisoformat(start) == timedelta(days=28)
+
+
+def test_detect_tickers_skips_finance_acronyms():
+    text = (
+        "Compare the ROIC, EV/EBITDA, FCF yield and DCF value of MSFT with its 5-year CAGR, "
+        "list the KPI table (EPS, BVPS, WACC, CAPEX, LTM and NTM figures) as HTML with a URL "
+        "to the source, and report the PEG and YTD return."
+    )
+    assert detect_tickers(text) == ["MSFT"]
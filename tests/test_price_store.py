@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from finrobot.data_source.price_store import PriceStore, _NYSE_SESSIONS, _WEEKDAYS
+
+
+def bars(start, end, dividends=None):
+    index = pd.bdate_range(start, end, inclusive="left", tz="America/New_York", name="Date")
+    index = index.as_unit("ns")
+    frame = pd.DataFrame(
+        {
+            "Close": np.arange(len(index), dtype=float) + 0.1,
+            "Volume": 100,
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        },
+        index=index,
+    )
+    for day, amount in (dividends or {}).items():
+        frame.loc[pd.Timestamp(day, tz="America/New_York"), "Dividends"] = amount
+    return frame
+
+
+def test_gaps():
+    ranges = [["2024-01-10", "2024-01-20"], ["2024-02-01", "2024-02-10"]]
+    assert PriceStore._gaps(ranges, "2024-01-01", "2024-03-01") == [
+        ("2024-01-01", "2024-01-10"),
+        ("2024-01-20", "2024-02-01"),
+        ("2024-02-10", "2024-03-01"),
+    ]
+    assert PriceStore._gaps(ranges, "2024-01-12", "2024-01-18") == []
+    assert PriceStore._gaps(ranges, "2024-01-15", "2024-02-05") == [("2024-01-20", "2024-02-01")]
+    assert PriceStore._gaps([], "2024-01-01", "2024-01-05") == [("2024-01-01", "2024-01-05")]
+
+
+def test_covered_records_fetched_gaps_up_to_today():
+    fetched = [(("2024-01-01", "2024-02-01"), bars("2024-01-01", "2024-02-01"))]
+    assert PriceStore._covered([], fetched, "2024-01-15") == [["2024-01-01", "2024-01-15"]]
+    assert PriceStore._covered([["2023-12-01", "2024-01-01"]], fetched, "2024-06-01") == [
+        ["2023-12-01", "2024-02-01"]
+    ]
+
+
+@pytest.mark.parametrize(
+    "gap, sessions, covered",
+    [
+        (("2024-02-24", "2024-02-26"), _WEEKDAYS, True),  # weekend
+        (("2024-03-29", "2024-03-30"), _NYSE_SESSIONS, True),  # Good Friday
+        (("2024-03-29", "2024-03-30"), _WEEKDAYS, False),  # a weekday elsewhere
+        (("2024-04-02", "2024-04-04"), _NYSE_SESSIONS, False),  # failed download
+    ],
+)
+def test_covered_empty_gaps_only_without_sessions(gap, sessions, covered):
+    fetched = [(gap, bars(*gap).iloc[:0])]
+    expected = [list(gap)] if covered else []
+    assert PriceStore._covered([], fetched, "2025-01-01", sessions) == expected
+
+
+def test_new_events():
+    stored = bars("2024-01-01", "2024-03-01", {"2024-02-01": 0.24})
+    assert not PriceStore._new_events(stored, bars("2024-03-01", "2024-04-01"))
+    # a dividend already stored is not new
+    assert not PriceStore._new_events(stored, bars("2024-01-15", "2024-02-15", {"2024-02-01": 0.24}))
+    assert PriceStore._new_events(stored, bars("2024-03-01", "2024-04-01", {"2024-03-15": 0.25}))
+    # nor is one before the stored history, it does not change its adjustment
+    assert not PriceStore._new_events(stored, bars("2023-12-01", "2024-01-01", {"2023-12-15": 0.2}))
+
+
+def test_get_fetches_only_missing_ranges(tmp_path):
+    full = bars("2024-01-01", "2024-06-01")
+    calls = []
+
+    def fetch(start, end):
+        calls.append((start, end))
+        index = full.index.tz_localize(None)
+        return full[(index >= start) & (index < end)]
+
+    store = PriceStore(str(tmp_path))
+    first = store.get("aapl", "2024-01-01", "2024-03-01", fetch)
+    second = store.get("AAPL", "2024-02-01", "2024-04-01", fetch)
+    assert calls == [("2024-01-01", "2024-03-01"), ("2024-03-01", "2024-04-01")]
+    pd.testing.assert_frame_equal(first, full.loc[:"2024-02-29"], check_freq=False)
+    pd.testing.assert_frame_equal(second, full.loc["2024-02-01":"2024-03-31"], check_freq=False)
+    assert second["Close"].dtype == np.float64
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from finrobot.ratelimit import RateLimiter, rate_limited, rate_limits
+
+
+def test_burst_then_rate():
+    limiter = RateLimiter(per_minute=600, burst=3)  # 10 per second
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    # three from the burst, then two waits of 0.1 second
+    assert 0.15 <= time.monotonic() - start < 0.5
+
+
+def test_nested_calls_take_one_token():
+    limiter = RateLimiter(per_minute=60, burst=3)
+    with limiter.limit():
+        with limiter.limit():
+            with limiter.limit():
+                pass
+    assert 1.9 <= limiter.tokens < 2.1
+
+
+def test_concurrency():
+    limiter = RateLimiter(concurrency=2)
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def request():
+        with limiter.limit():
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def test_rate_limited_uses_the_limiters_of_the_block():
+    with rate_limited("fmp"):
+        pass
+    with rate_limits({"fmp": {"per_minute": 60, "burst": 1}}) as limiters:
+        with rate_limited("fmp"):
+            assert limiters["fmp"].tokens < 0.1
+        with rate_limited("finnhub"):  # not configured
+            pass
+
+
+def test_clients_count_a_request_once(monkeypatch):
+    import finnhub
+
+    from finrobot.data_source.finnhub_utils import PooledFinnhubClient
+
+    monkeypatch.setattr(finnhub.Client, "_request", lambda self, method, path, **kwargs: {})
+    client = PooledFinnhubClient("key", per_minute=60, burst=5)
+    client._request("get", "/stock/profile2")
+    assert 3.9 <= client.limiter.tokens < 4.1
+    with rate_limits({"finnhub": {"per_minute": 60, "burst": 5}}) as limiters:
+        client._request("get", "/stock/profile2")
+        # the batch's limiter replaces the client's own
+        assert 3.9 <= limiters["finnhub"].tokens < 4.1
+        assert client.limiter.tokens > 3.9  # not charged again
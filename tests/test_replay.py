@@ -0,0 +1,40 @@
+import gzip
+
+import pytest
+
+from finrobot.replay import Recorder, Replayer, record_run, replay_call, replay_run
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    with record_run(path) as recorder:
+        assert replay_call("llm", "analyst", {"prompt": "a"}, lambda: "answer a") == "answer a"
+        assert replay_call("tool", "get_data", [["AAPL"], {}], lambda: "data") == "data"
+    assert recorder.recorded == 2
+
+    def not_called():
+        raise AssertionError("replayed calls are not made")
+
+    with replay_run(path) as replayer:
+        assert replay_call("llm", "analyst", {"prompt": "a"}, not_called) == "answer a"
+        assert replay_call("tool", "get_data", [["AAPL"], {}], not_called) == "data"
+    assert replayer.stats["hits"] == 2
+
+
+def test_records_are_written_as_they_happen(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    recorder = Recorder(path)
+    recorder.call("llm", "analyst", {"prompt": "a"}, lambda: "answer a")
+    recorder.call("llm", "analyst", {"prompt": "b"}, lambda: "answer b")
+    # the run crashes before close(): the recording is readable up to the last call
+    assert len(Replayer(path).records) == 2
+
+    # a recording cut in the middle of a record keeps the complete ones
+    recorder.close()
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-12])
+    with gzip.open(path, "rt") as f, pytest.raises(EOFError):
+        f.read()
+    assert len(Replayer(path).records) >= 1
@@ -0,0 +1,77 @@
+import os
+import time
+
+from finrobot.data_source.section_cache import SectionCache
+
+
+def object_files(cache):
+    objects = os.path.join(cache.root, "objects")
+    return [name for prefix in os.listdir(objects) for name in os.listdir(os.path.join(objects, prefix))]
+
+
+def test_put_get(tmp_path):
+    cache = SectionCache(str(tmp_path))
+    assert cache.get("AAPL_2023_7") is None
+    cache.put("AAPL_2023_7", "Management's discussion " * 100)
+    assert cache.get("AAPL_2023_7") == "Management's discussion " * 100
+    assert cache.stats == {"hits": 1, "misses": 1}
+    # a second process sees the entry
+    assert SectionCache(str(tmp_path)).get("AAPL_2023_7") == "Management's discussion " * 100
+
+
+def test_identical_contents_are_stored_once(tmp_path):
+    cache = SectionCache(str(tmp_path))
+    cache.put("AAPL_2023_1A", "risk factors")
+    cache.put("AAPL_2023_1A_copy", "risk factors")
+    info = cache.info()
+    assert (info["entries"], info["contents"]) == (2, 1)
+    assert len(object_files(cache)) == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = SectionCache(str(tmp_path), max_bytes=None)
+    texts = {f"K{i}": os.urandom(2000).hex() for i in range(3)}
+    for i, (key, text) in enumerate(texts.items()):
+        cache.put(key, text)
+        with cache._connect() as db:  # distinct access times
+            db.execute(
+                "UPDATE blobs SET last_access = ?"
+                " WHERE digest = (SELECT digest FROM entries WHERE key = ?)",
+                (i, key),
+            )
+    cache.access_resolution = 0
+    cache.get("K0")  # K1 is now the least recently used
+    stored = cache.info()["stored_bytes"]
+    assert cache.evict(stored - 1) > 0
+    assert cache.get("K1") is None
+    assert cache.get("K0") == texts["K0"] and cache.get("K2") == texts["K2"]
+    assert len(object_files(cache)) == 2
+
+
+def test_gc(tmp_path):
+    cache = SectionCache(str(tmp_path), max_bytes=None)
+    cache.put("K1", "first")
+    cache.put("K2", "second")
+    # an interrupted write left an old file, another process removed a content's file
+    orphan = os.path.join(cache.root, "objects", "ab", "cdef")
+    os.makedirs(os.path.dirname(orphan))
+    open(orphan, "wb").close()
+    os.utime(orphan, (time.time() - 2 * 60 * 60,) * 2)
+    fresh = os.path.join(cache.root, "objects", "ab", "cd01")
+    open(fresh, "wb").close()
+    digest = cache._connect().execute("SELECT digest FROM entries WHERE key = 'K1'").fetchone()[0]
+    os.remove(cache._path(digest))
+
+    assert cache.gc() == {"evicted_bytes": 0, "missing_files": 1, "removed_files": 1}
+    assert not os.path.exists(orphan) and os.path.exists(fresh)
+    assert cache.info()["entries"] == 1
+
+
+def test_clear_removes_all_files(tmp_path):
+    cache = SectionCache(str(tmp_path))
+    cache.put("K1", "first")
+    cache.clear()
+    assert cache.info()["entries"] == 0
+    assert object_files(cache) == []
+    cache.put("K2", "second")
+    assert cache.get("K2") == "second"
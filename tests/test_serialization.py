@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from finrobot.serialization import serialize_dataframe
+from finrobot.utils import count_tokens
+
+
+def test_fits_budget_unchanged():
+    df = pd.DataFrame({"Close": [1.5, 2.5]}, index=pd.Index(["a", "b"], name="k"))
+    text = serialize_dataframe(df, {"store": False})
+    assert text == "k,Close\na,1.5\nb,2.5"
+
+
+def test_tiny_max_tokens():
+    df = pd.DataFrame(np.random.default_rng(0).random((200, 4)), columns=list("abcd"))
+    text = serialize_dataframe(df, {"max_tokens": 5, "store": False})
+    # only the footer is left, it cannot be shortened
+    assert text == "[200 rows x 4 columns shortened to fit 5 tokens]"
+
+
+def test_short_wide_frame_is_cut_on_line_boundaries():
+    df = pd.DataFrame(
+        np.random.default_rng(0).random((5, 60)), columns=[f"metric_{i}" for i in range(60)]
+    )
+    full = serialize_dataframe(df, {"max_tokens": None, "store": False})
+    text = serialize_dataframe(df, {"max_tokens": 400, "store": False})
+    body = text[: text.rindex("\n[")]
+    assert count_tokens(text) <= 400
+    assert body and full.startswith(body + "\n")
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from finrobot.data_source import yfinance_utils
+from finrobot.data_source.yfinance_utils import YFinanceUtils
+from finrobot.toolkits import stringify_output
+
+
+class FakeTicker:
+    def __init__(self, symbol):
+        self.ticker = symbol.upper()
+
+    def history(self, start=None, end=None):
+        if self.ticker == "BAD":
+            raise ValueError("delisted")
+        index = pd.bdate_range(start, end, inclusive="left", tz="America/New_York", name="Date")
+        return pd.DataFrame({"Close": np.arange(len(index), dtype=float)}, index=index)
+
+
+@pytest.fixture(autouse=True)
+def fake_yfinance(monkeypatch):
+    monkeypatch.setattr(yfinance_utils.yf, "Ticker", FakeTicker)
+    monkeypatch.delenv("FINROBOT_PRICE_STORE", raising=False)
+    yfinance_utils.clear_ticker_cache()
+    yield
+    yfinance_utils.clear_ticker_cache()
+
+
+def test_keyword_calls():
+    # autogen calls tools with keyword arguments only
+    data = YFinanceUtils.get_stock_data(
+        symbol="AAPL", start_date="2024-01-01", end_date="2024-01-08"
+    )
+    assert len(data) == 5
+    panel = YFinanceUtils.get_stock_data_multi(
+        symbols=["AAPL", "MSFT"], start_date="2024-01-01", end_date="2024-01-08"
+    )
+    assert list(panel.columns) == ["AAPL", "MSFT"] and len(panel) == 5
+
+
+def test_keyword_call_through_stringify_output():
+    output = stringify_output(YFinanceUtils.get_stock_data_multi)(
+        symbols=["AAPL"], start_date="2024-01-01", end_date="2024-01-08"
+    )
+    assert "AAPL" in output
+
+
+def test_multi_empty_and_failed_symbols(caplog):
+    assert YFinanceUtils.get_stock_data_multi([], "2024-01-01", "2024-01-08").empty
+    panel = YFinanceUtils.get_stock_data_multi(
+        ["AAPL", "BAD"], "2024-01-01", "2024-01-08", fields=["Close"]
+    )
+    assert panel["BAD"].isna().all() and panel["AAPL"].notna().all()
+    assert "Failed to retrieve stock data for BAD" in caplog.text